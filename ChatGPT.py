@@ -1,11 +1,15 @@
 import streamlit as st
 from utils2 import llm_call, prompt_chain_workflow, run_router_workflow
-from utils2 import llm_call_async, run_Parallelization, orchestrate_task
+from utils2 import llm_call_async, run_Parallelization, orchestrate_task_stream
 from openai.types.responses import ResponseTextDeltaEvent
 import asyncio
 import json
-from agents.mcp import MCPServerStdio
+from agents.mcp import MCPServer
 from agents.agent import Agent
+from services.mcp_manager import get_mcp_manager
+from services.transcript_store import get_transcript_store
+from utils.chat_history import get_session_id, render_history
+from utils.stream_renderer import StreamRenderer
 import sys
 
 # Windows 호환성
@@ -13,31 +17,47 @@ if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
 # MCP 서버 설정
-async def setup_mcp_servers():
-    servers = []
-    
-    # mcp.json 파일에서 설정 읽기
-    with open('mcp.json', 'r') as f:
-        config = json.load(f)
-    
-    # 구성된 MCP 서버들을 순회
-    for server_name, server_config in config.get('mcpServers', {}).items():
-        mcp_server = MCPServerStdio(
-            params={
-                "command": server_config.get("command"),
-                "args": server_config.get("args", [])
-            },
-            cache_tools_list=True
-        )
-        await mcp_server.connect()
-        servers.append(mcp_server)
-
-    return servers
+# 서버 프로세스는 프로세스 공용 관리자가 한 번만 실행/유지하고, Agent에는 관리자에 위임하는 얇은 래퍼만 전달
+class SharedMCPServer(MCPServer):
+    def __init__(self, manager, server_name):
+        super().__init__(use_structured_content=False)
+        self.manager = manager
+        self.server_name = server_name
+
+    @property
+    def name(self):
+        return self.server_name
+
+    async def connect(self):
+        await self.manager.connect(self.server_name)
+
+    async def cleanup(self):
+        # 연결 종료는 관리자가 프로세스 종료 시 처리
+        pass
+
+    async def list_tools(self, *args, **kwargs):
+        return await self.manager.list_tools(self.server_name)
+
+    async def call_tool(self, tool_name, arguments):
+        return await self.manager.call_tool(self.server_name, tool_name, arguments or {})
+
+    async def list_prompts(self):
+        return await self.manager.list_prompts(self.server_name)
+
+    async def get_prompt(self, name, arguments=None):
+        return await self.manager.get_prompt(self.server_name, name, arguments)
+
+
+@st.cache_resource
+def setup_mcp_servers():
+    manager = get_mcp_manager()
+    # 첫 실행 때 백그라운드에서 서버를 미리 띄워 둠 (이후 스크립트 재실행에서는 그대로 재사용)
+    manager.warm_up()
+    return [SharedMCPServer(manager, name) for name in manager.server_names()]
 
 # 에이전트 설정
-async def setup_agent():
-    # 서버가 이미 존재하는지 확인하고, 없으면 생성
-    mcp_servers = await setup_mcp_servers()
+def setup_agent():
+    mcp_servers = setup_mcp_servers()
     
     agent = Agent(
         name="Assistant",
@@ -47,6 +67,14 @@ async def setup_agent():
     )
     return agent,mcp_servers
 
+# 스트리밍 응답을 container에 표시하고 전체 응답을 반환
+# (app.py와 같이 StreamRenderer로 약 50ms 단위로 모아서 그리고, 완성된 블록은 확정하여 마지막 블록만 다시 그림)
+async def render_stream(tokens, container):
+    renderer = StreamRenderer(container, interval=0.05)
+    async for token in tokens:
+        renderer.feed(token)
+    return renderer.close()
+
 # 페이지 설정
 st.set_page_config(page_title="ChatGPT", layout="wide")
 
@@ -67,9 +95,12 @@ SYSTEM_MESSAGE = [
     }    
 ]
 
-# 세션 상태에서 대화 기록을 관리
-if "messages" not in st.session_state:
-    st.session_state.messages = SYSTEM_MESSAGE  # 시스템 메시지 포함
+# 대화 기록은 SQLite에 저장 (새로고침해도 같은 세션 ID로 이어서 표시)
+session_id = get_session_id()
+transcripts = get_transcript_store()
+
+# 모델에 함께 보내는 이전 대화 메시지 수 (화면 표시와 별개)
+PROMPT_HISTORY_LIMIT = 50
 
 
 # 사이드바에 OpenAI 모델 설정 옵션 추가
@@ -81,24 +112,21 @@ temperature = st.sidebar.slider("Temperature", 0.0, 1.0, 0.7)
 # 채팅 인터페이스 UI
 st.title("💬 ChatGPT")
 
-# 기존 대화 표시
-for message in st.session_state.messages:
-    if message["role"] != "system":
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+# 기존 대화 표시 (최근 20개, 이전 메시지는 요청 시 추가로 불러옴)
+render_history(transcripts, session_id, page_size=20, intro=SYSTEM_MESSAGE)
 
 # 사용자 입력
 user_input = st.chat_input("메시지를 입력하세요...")
 
 if user_input:
     # 사용자 메시지 저장 및 출력
-    st.session_state.messages.append({"role": "user", "content": user_input})
+    transcripts.append(session_id, "user", user_input)
     with st.chat_message("user"):
         st.markdown(user_input)
 
     # GPT 응답 요청
     promt = []
-    for message in st.session_state.messages:
+    for message in SYSTEM_MESSAGE + transcripts.page(session_id, limit=PROMPT_HISTORY_LIMIT):
         role = message["role"]
         content = message["content"]
         promt.append({
@@ -124,16 +152,20 @@ if user_input:
         elif AI_model == "Parallelization":
             responses = asyncio.run(run_Parallelization(promt))
 
-        elif AI_model == "Orchestrator":
-            response = asyncio.run(orchestrate_task(promt))
+    if AI_model == "Orchestrator":
+        # 최종 응답은 aggregator가 생성하는 대로 화면에 표시
+        with st.chat_message("assistant"):
+            response_container = st.container()
+            response = asyncio.run(render_stream(orchestrate_task_stream(promt), response_container))
+        transcripts.append(session_id, "assistant", response)
 
     # GPT 응답 저장 및 출력
-    if len(responses) == 0:        
-        st.session_state.messages.append({"role": "assistant", "content": response})
+    elif len(responses) == 0:        
+        transcripts.append(session_id, "assistant", response)
         with st.chat_message("assistant"):
             st.markdown(response)
     else:
         for response in responses:
-            st.session_state.messages.append({"role": "assistant", "content": response})
+            transcripts.append(session_id, "assistant", response)
             with st.chat_message("assistant"):
                 st.markdown(response)
@@ -14,148 +14,507 @@ def time_it(description):
     return decorator
 
 
-# ① pythonnet load
-from pythonnet import load          # ① 먼저 load 함수만 가져옵니다
+import os, sys, pathlib, json, threading, asyncio
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Optional
 
-import os, sys, pathlib             # ② clr 는 아직 import 하지 않습니다
+_T0 = time.perf_counter()   # 프로세스 시작 기준 시각 (startup 리포트용)
 
 base = pathlib.Path(r"D:\SW\GearDesign\GearDesign\bin\Release\net8.0-windows")
 dll  = base / "GearDesign.dll"
 cfg  = base / "GearDesign.runtimeconfig.json"
 
-# ③ .NET 8 CoreCLR + WindowsDesktop 런타임을 ‘가장 먼저’ 올립니다
-load("coreclr", runtime_config=str(cfg))
-
-# ④ 이제 의존 DLL 경로 추가
-os.add_dll_directory(str(base))
-sys.path.append(str(base))
-os.chdir(str(base)) 
-
-import clr                           # ⑤ 이 시점에야 clr 를 import!
-
-# ⑥ 어셈블리 로드 & 타입 확인
-asm = clr.AddReference(str(dll))    # 여기서 불러온 dll이 참고하고 있는 Nuget을 Pyhonnet을 통해 자동으로 참조가능
-
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import System.Windows.Forms as WinForms
-from GearDesign import GearDesignForm
-import System.Threading as Th
-import json
-from Newtonsoft.Json.Linq import JObject
-from utils import llm_call, remove_code_block_llm  # LLM 호출 함수 임포트
-
-# WinForms는 STA(Single-Threaded Apartment) 모드여야 함
-Th.Thread.CurrentThread.TrySetApartmentState(Th.ApartmentState.STA)
+# Default.json 경로 (항상 현재 파일 위치 기준, 런타임 로드 시 chdir 하므로 절대경로로 고정)
+default_json_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "schema", "Default.json")
 
-form = GearDesignForm(str(base))                 # ← 인스턴스 생성
-form.Initial_Load() # 초기 로드
-
-# 1. Default.json 로드 (항상 현재 파일 위치 기준)   
-default_json_path = os.path.join(os.path.dirname(__file__), "data", "schema", "Default.json")
+from mcp.server.fastmcp import FastMCP, Context
+mcp = FastMCP("GearDesign_agent")
 
-with open(default_json_path, "r", encoding="utf-8") as f:
-    gear_data = json.load(f)
+# ---- 지연 초기화 ----
+# 서버는 바로 mcp.run()으로 tool 목록에 응답하고, .NET 런타임/form 생성은 백그라운드 스레드에서 진행
+# - _design_ready: Default.json, key 인덱스, 설계 상태 저장소 준비 완료 (edit_gear_data 사용 가능)
+# - _form_ready: CoreCLR 로드, GearDesignForm 생성 및 Initial_Load 완료 (계산 tool 사용 가능)
+_design_ready: Future = Future()
+_form_ready: Future = Future()
+_startup_lock = threading.Lock()
+_startup_thread: Optional[threading.Thread] = None
+_startup_report = {"status": "not started", "phases": {}, "design_ready_s": None, "form_ready_s": None, "error": None}
+
+@contextmanager
+def _phase(name: str):
+    """startup 단계별 소요 시간 기록"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _startup_report["phases"][name] = round(time.perf_counter() - start, 4)
+
+def _load_design():
+    global llm_call_async, PromptBuilder, count_tokens, log_prompt_report
+    global json_schema_format, parse_structured, drop_nulls, span
+    global gear_data, gear_index, design_store, _geometry_cache
+    with _phase("python_modules"):
+        from utils import llm_call_async  # LLM 호출 함수 임포트
+        from utils.prompt_builder import PromptBuilder, count_tokens, log_prompt_report
+        from utils.structured_output import json_schema_format, parse_structured, drop_nulls
+        from utils.tracing import span
+
+    with _phase("design_data"):
+        from utils.gear_index import GearKeyIndex
+        from utils.design_state import DesignStateStore
+
+        # 1. Default.json 로드
+        with open(default_json_path, "r", encoding="utf-8") as f:
+            gear_data = json.load(f)
+
+        # key 경로 인덱스: 사용자 요청과 관련된 항목만 프롬프트에 포함하고, 반환된 patch를 검증
+        gear_index = GearKeyIndex(gear_data)
+
+        # MCP 세션별 설계 상태: 세션마다 Default.json 위에 patch를 누적하고, form별로 로드된 문서를 기록
+        design_store = DesignStateStore(gear_data)
+
+        # 세션별 마지막 치형 계산 결과 (revision, Result_Geo_py, Result_Geo) - calc_load_case에서 재변환 방지
+        _geometry_cache = {}
+
+def _load_dotnet():
+    global GearDesignForm, Th, JObject, dispatcher
+    # ① pythonnet load
+    with _phase("dotnet_runtime"):
+        from pythonnet import load          # ① 먼저 load 함수만 가져옵니다 (clr 는 아직 import 하지 않습니다)
+
+        # ③ .NET 8 CoreCLR + WindowsDesktop 런타임을 ‘가장 먼저’ 올립니다
+        load("coreclr", runtime_config=str(cfg))
+        # ④ 의존 DLL 경로/작업 디렉토리는 start_background_init()에서 미리 설정 (_prepare_dotnet_paths)
+
+    with _phase("dotnet_assembly"):
+        import clr                           # ⑤ 이 시점에야 clr 를 import!
+
+        # ⑥ 어셈블리 로드 & 타입 확인
+        clr.AddReference(str(dll))    # 여기서 불러온 dll이 참고하고 있는 Nuget을 Pyhonnet을 통해 자동으로 참조가능
+
+        from GearDesign import GearDesignForm
+        import System.Threading as Th
+        from Newtonsoft.Json.Linq import JObject
+
+    with _phase("form"):
+        from utils.form_dispatcher import FormDispatcher
+
+        # form 접근은 모두 디스패처 큐를 통해 직렬화 (GEARDESIGN_NUM_FORMS 개의 form으로 확장 가능)
+        dispatcher = FormDispatcher(_create_form, num_forms=int(os.getenv("GEARDESIGN_NUM_FORMS", "1")), name="GearDesignForm")
+        dispatcher.warm_up()
+
+def _create_form():
+    """워커 스레드에서 form 인스턴스를 생성 (WinForms는 STA(Single-Threaded Apartment) 모드여야 함)"""
+    Th.Thread.CurrentThread.TrySetApartmentState(Th.ApartmentState.STA)
+    form = GearDesignForm(str(base))                 # ← 인스턴스 생성
+    form.Initial_Load() # 초기 로드
+    return form
+
+def _startup():
+    _startup_report["status"] = "starting"
+    try:
+        _load_design()
+        _startup_report["design_ready_s"] = round(time.perf_counter() - _T0, 4)
+        _design_ready.set_result(True)
+        _load_dotnet()
+        _startup_report["form_ready_s"] = round(time.perf_counter() - _T0, 4)
+        _startup_report["status"] = "ready"
+        _form_ready.set_result(True)
+    except BaseException as e:
+        _startup_report["status"] = "failed"
+        _startup_report["error"] = repr(e)
+        for future in (_design_ready, _form_ready):
+            if not future.done():
+                future.set_exception(e)
+    finally:
+        # stdout은 MCP stdio 통신에 사용되므로 리포트는 stderr/파일로 출력
+        print("[startup]", json.dumps(_startup_report, ensure_ascii=False), file=sys.stderr)
+        report_path = os.getenv("GEARDESIGN_STARTUP_REPORT")
+        if report_path:
+            with open(report_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"time": time.time(), **_startup_report}, ensure_ascii=False) + "\n")
+
+def _prepare_dotnet_paths():
+    """
+    의존 DLL 경로 추가 및 작업 디렉토리 변경 (.NET 쪽은 base 기준 상대 경로를 사용)
+    os.chdir는 프로세스 전체에 적용되므로 백그라운드 스레드가 아니라 초기화 스레드를 시작하기 전에 실행
+    (__main__에서는 서버가 요청을 받기 전, Python 쪽 파일 경로는 모두 절대 경로)
+    """
+    os.add_dll_directory(str(base))
+    sys.path.append(str(base))
+    os.chdir(str(base))
+
+def start_background_init():
+    """백그라운드 초기화 스레드를 (한 번만) 시작합니다."""
+    global _startup_thread
+    with _startup_lock:
+        if _startup_thread is None:
+            _prepare_dotnet_paths()
+            _startup_thread = threading.Thread(target=_startup, name="GearDesign-startup", daemon=True)
+            _startup_thread.start()
+
+async def _await_design():
+    start_background_init()
+    await asyncio.shield(asyncio.wrap_future(_design_ready))
+
+async def _await_form():
+    start_background_init()
+    await asyncio.shield(asyncio.wrap_future(_form_ready))
+
+def _session_id(ctx: Optional[Context]) -> str:
+    """MCP 요청 컨텍스트에서 세션 식별자를 구합니다. (컨텍스트 밖에서 호출되면 default)"""
+    if ctx is None:
+        return "default"
+    try:
+        return ctx.client_id or f"session-{id(ctx.session)}"
+    except Exception:
+        return "default"
 
-from mcp.server.fastmcp import FastMCP
-mcp = FastMCP("GearDesign_agent")
+def _trace_parent(ctx: Optional[Context]) -> Optional[dict]:
+    """클라이언트가 요청 meta로 전달한 trace 컨텍스트 (없으면 None -> 서버에서 새 trace 시작)"""
+    try:
+        meta = ctx.request_context.meta
+    except Exception:
+        return None
+    if meta is None:
+        return None
+    trace = getattr(meta, "trace", None)
+    if trace is None:
+        trace = (getattr(meta, "model_extra", None) or {}).get("trace")
+    return trace if isinstance(trace, dict) else None
+
+def _traced_tool(fn):
+    """도구 실행 전체를 trace 구간으로 기록 (클라이언트의 mcp.call_tool 구간 아래에 연결)"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        await _await_design()
+        ctx = kwargs.get("ctx")
+        with span(f"tool.{fn.__name__}", parent=_trace_parent(ctx), session=_session_id(ctx)):
+            return await fn(*args, **kwargs)
+    return wrapper
+
+def _patch_key(patch: dict) -> str:
+    return json.dumps(patch, sort_keys=True, ensure_ascii=False)
 
 @mcp.tool()
-def initial_load() -> dict:
-    """초기 로드, 초기 데이터 반환"""
-    form.Initial_Load()
-    jGear = form.SaveDataInput_Json(True)       # 현 상태 저장
-    jGear_py = json.loads(jGear.ToString())    # json -> dict
-    return jGear_py
+@_traced_tool
+async def initial_load(ctx: Context = None) -> dict:
+    """초기 로드, 초기 데이터 반환 (세션의 설계 상태도 Default로 되돌림)"""
+    await _await_form()
+    session_id = _session_id(ctx)
+
+    def job(slot):
+        slot.form.Initial_Load()
+        design_store.invalidate(slot.key)
+        design_store.session(session_id).reset(gear_data)
+        jGear = slot.form.SaveDataInput_Json(True)       # 현 상태 저장
+        return json.loads(jGear.ToString())    # json -> dict
+
+    return await dispatcher.run(job, affinity=session_id)
+
+
+# edit_gear_data 프롬프트: 고정 지침은 모든 호출에서 동일해야 prefix 캐시가 적용됨
+EDIT_MODEL = "gpt-4o-mini"
+EDIT_PROMPT_BUDGET = int(os.getenv("GEARDESIGN_EDIT_PROMPT_BUDGET", 8000))
+EDIT_SYSTEM_PROMPT = (
+    "너는 기어 설계 데이터의 JSON을 수정하는 AI야.\n"
+    "아래의 사용자 요청에 따라 현재 JSON 데이터의 값을 적절히 변경해야 해.\n"
+    "현재 JSON 데이터는 사용자 요청과 관련된 항목만 발췌한 것이며, 발췌된 KEY 경로만 변경할 수 있어.\n"
+    "현재 JSON 데이터의 메타데이터는 Key 값 앞에 $가 붙어있으니 반드시 참고해서 데이터를 올바르게 변경해.\n"
+    "반환 시 변경해야할 정확한 JSON KEY 값과 Value만 반환해.\n"
+    "매크로 기어 제원 (잇수, 모듈, 헬리컬각, 압력각, 전위계수 등)이 바뀌어 기어 사이의 중심거리가 변경되어야 하는 경우는 CDMethod를 1로 변경하여 중심거리를 자동계산하도록 해야 함\n"
+    "반환하는 데이터 형태는 반드시 JSON의 표준 중첩구조를 따라야 해."
+)
 
 @mcp.tool()
-def edit_gear_data(user_message: str) -> dict:
+@_traced_tool
+async def edit_gear_data(user_message: str, ctx: Context = None) -> dict:
     """사용자 메시지를 전달받아 기어 데이터로 전환하여 반환"""   
-
-    # 2. LLM 프롬프트 구성
-    system_prompt = (
-        "너는 기어 설계 데이터의 JSON을 수정하는 AI야.\n"
-        "아래의 사용자 요청에 따라 현재 JSON 데이터의 값을 적절히 변경해야 해.\n"
-        "현재 JSON 데이터의 메타데이터는 Key 값 앞에 $가 붙어있으니 반드시 참고해서 데이터를 올바르게 변경해.\n"
-        "반환 시 변경해야할 정확한 JSON KEY 값과 Value만 반환해.\n"    
-        "매크로 기어 제원 (잇수, 모듈, 헬리컬각, 압력각, 전위계수 등)이 바뀌어 기어 사이의 중심거리가 변경되어야 하는 경우는 CDMethod를 1로 변경하여 중심거리를 자동계산하도록 해야 함\n"
-        "반환하는 데이터 형태는 반드시 JSON의 표준 중첩구조를 따라야 해."
+    await _await_design()
+    session = design_store.session(_session_id(ctx))
+
+    # 2. LLM 프롬프트 구성 (고정 지침 -> 발췌 데이터 -> 사용자 요청 순서로 배치하여 prefix 캐시 활용)
+    # 발췌한 경로는 응답 schema에도 그대로 사용 (발췌되지 않은 key는 출력할 수 없음)
+    selected = {"paths": gear_index.retrieve(user_message)}
+
+    def design_context(paths) -> str:
+        return "현재 데이터: " + json.dumps(gear_index.subset(paths, session.document), ensure_ascii=False, indent=1)
+
+    def shrink_context(max_tokens: int) -> str:
+        # 예산 안에 들어올 때까지 발췌 항목 수를 절반씩 줄임
+        limit = 20
+        selected["paths"] = gear_index.retrieve(user_message, limit)
+        context = design_context(selected["paths"])
+        while limit > 1 and count_tokens(context, EDIT_MODEL) > max_tokens:
+            limit //= 2
+            selected["paths"] = gear_index.retrieve(user_message, limit)
+            context = design_context(selected["paths"])
+        return context
+
+    built = (
+        PromptBuilder(model=EDIT_MODEL, budget=EDIT_PROMPT_BUDGET)
+        .system("instructions", EDIT_SYSTEM_PROMPT)
+        .add("design_data", design_context(selected["paths"]), stability="session", shrink=shrink_context)
+        .add("user_request", f"사용자 요청: {user_message}", required=True)
+        .build()
     )
-    prompt = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"사용자 요청: {user_message}\n현재 데이터: {json.dumps(gear_data, ensure_ascii=False)}"}
-    ]
-
-    # 3. LLM 호출 및 결과 파싱
-    try:
-        response = llm_call(prompt=prompt, model="gpt-4o-mini")
-        edited_gear_data = remove_code_block_llm(response)
-        edited_gear_data = json.loads(edited_gear_data)
-        return edited_gear_data
-    except Exception as e:
-        print("LLM 응답 파싱 오류:", e)
-        return {}  # 실패 시 null 반환
-
-# 재귀적으로 dict를 업데이트하는 함수
-def recursive_update(d, u):
-    for k, v in u.items():
-        if isinstance(v, dict) and k in d and isinstance(d[k], dict):
-            recursive_update(d[k], v)
+    log_prompt_report("edit_gear_data", built.report)
+    response_format = json_schema_format("gear_patch", gear_index.patch_schema(selected["paths"]))
+
+    # 3. LLM 호출 (strict schema 제약 출력은 완성된 JSON으로만 받으므로 스트리밍하지 않음)
+    completion = None
+    async for completion in llm_call_async(prompt=built.messages, model=EDIT_MODEL, temperature=0,
+                                           cache=True, response_format=response_format):
+        break
+    if completion is None:
+        raise RuntimeError("LLM 응답이 없습니다.")
+
+    # 4. 파싱(실패하면 빈 patch 대신 오류) 후 null(변경 없음) 제거, 인덱스에 존재하는 경로만 채택
+    patch, rejected = gear_index.validate_patch(drop_nulls(parse_structured(completion)))
+    if rejected:
+        print("존재하지 않는 KEY 경로 제외:", rejected, file=sys.stderr)
+    return patch
+
+def _load_session(slot, session) -> None:
+    """세션의 현재 문서가 form에 로드되어 있지 않을 때만 .NET으로 전달합니다."""
+    if design_store.is_loaded(slot.key, session):
+        return
+    with span("solver.LoadDataInput_Json", form=slot.key):
+        jGear = JObject.Parse(session.serialized())
+        slot.form.LoadDataInput_Json(jGear)
+    design_store.mark_loaded(slot.key, session)
+
+def _calc_geometry(slot, session):
+    """치형 계산 후 (Result_Geo, Result_Geo_py)를 반환하고 세션 캐시에 저장"""
+    _load_session(slot, session)
+    with span("solver.CalcGeometry", form=slot.key):
+        Result_Geo = slot.form.CalcGeometry()
+    with span("json.marshal", result="geometry"):
+        Result_Geo_py = json.loads(Result_Geo.ToString())    # json -> dict
+    _geometry_cache[session.session_id] = (session.revision, Result_Geo_py, Result_Geo)
+    return Result_Geo, Result_Geo_py
+
+def _geometry_jobject(session, Result_Geo_py):
+    """치형 계산 결과 dict에 해당하는 JObject 반환 (직전 계산 결과와 같으면 JSON 재변환 생략)"""
+    cached = _geometry_cache.get(session.session_id)
+    if cached and cached[0] == session.revision and cached[1] == Result_Geo_py:
+        return cached[2]
+    with span("json.unmarshal", result="geometry"):
+        return JObject.Parse(json.dumps(Result_Geo_py))
+
+def _calc_load_case(slot, session, Result_Geo, to_dict: bool = True):
+    _load_session(slot, session)
+    with span("solver.CalcLoadCase", form=slot.key):
+        Result_Rating = slot.form.CalcLoadCase(Result_Geo)
+    if not to_dict:
+        return Result_Rating
+    with span("json.marshal", result="rating"):
+        return json.loads(Result_Rating.ToString())    # json -> dict
+
+async def _run_geometry(session_id: str, jGear_py: dict):
+    """세션에 patch를 적용하고 치형 계산 (Result_Geo, Result_Geo_py) 반환. 동일한 대기 요청은 병합됨"""
+    def job(slot):
+        session = design_store.session(session_id)
+        session.apply(jGear_py)
+        return _calc_geometry(slot, session)
+
+    return await dispatcher.run(job, key=("calc_geometry", session_id, _patch_key(jGear_py)), affinity=session_id)
+
+def _summarize_geometry(Result_Geo_py: dict, max_items: int = 40) -> dict:
+    """치형 계산 결과 중 스칼라 값만 추린 요약 ($ 메타데이터와 큰 배열 제외)"""
+    source = Result_Geo_py.get("Geometry", Result_Geo_py) if isinstance(Result_Geo_py, dict) else {}
+    summary = {}
+    for key, value in source.items():
+        if key.startswith("$"):
+            continue
+        if isinstance(value, (str, int, float, bool)) or value is None:
+            summary[key] = value
+        elif isinstance(value, dict):
+            scalars = {k: v for k, v in value.items() if not k.startswith("$") and isinstance(v, (str, int, float, bool))}
+            if scalars:
+                summary[key] = scalars
+        if len(summary) >= max_items:
+            break
+    return summary
+
+async def _iter_calc(session_id: str, jGear_py: Optional[dict] = None, Result_Geo_py: Optional[dict] = None):
+    """
+    계산 결과를 준비되는 대로 반환하는 비동기 제너레이터
+    - ("geometry", 요약): CalcGeometry 직후 (jGear_py가 주어진 경우)
+    - ("rating", (섹션 이름, 섹션 dict, JSON 길이)): CalcLoadCase 결과의 최상위 섹션별로 변환되는 대로
+    """
+    if Result_Geo_py is None:
+        Result_Geo, Result_Geo_py = await _run_geometry(session_id, jGear_py or {})
+        yield "geometry", _summarize_geometry(Result_Geo_py)
+    else:
+        Result_Geo = None
+
+    def job(slot):
+        session = design_store.session(session_id)
+        geo = Result_Geo if Result_Geo is not None else _geometry_jobject(session, Result_Geo_py)
+        # .NET 객체 접근은 이벤트 루프 밖(form 스레드)에서 수행
+        return list(_calc_load_case(slot, session, geo, to_dict=False).Properties())
+
+    props = await dispatcher.run(job, affinity=session_id)
+
+    def convert(prop):
+        text = prop.Value.ToString()
+        return str(prop.Name), json.loads(text), len(text)
+
+    # 전체 결과를 한 번에 dict로 바꾸지 않고 섹션 단위로 변환하여 바로 전달
+    for prop in props:
+        yield "rating", await asyncio.to_thread(convert, prop)
+
+async def _stream_calc(ctx: Optional[Context], session_id: str, **kwargs) -> dict:
+    """
+    _iter_calc 결과를 MCP 진행 알림(progress)과 로그 메시지로 전달하고 전체 결과를 반환
+    (평가 섹션 내용은 반환값으로만 전달하고, 알림에는 섹션 이름과 크기만 포함)
+    """
+    result = {}
+    step = 0
+    async for stage, payload in _iter_calc(session_id, **kwargs):
+        step += 1
+        if stage == "geometry":
+            message = json.dumps({"stage": "geometry", "summary": payload}, ensure_ascii=False)
         else:
-            d[k] = v
-    return 
+            name, data, size = payload
+            result[name] = data
+            message = json.dumps({"stage": "rating", "section": name, "size": size}, ensure_ascii=False)
+        if ctx is not None:
+            try:
+                await ctx.report_progress(step, None)
+                await ctx.info(message)
+            except Exception as e:
+                print("진행 알림 전송 실패:", e, file=sys.stderr)
+    return result
 
 # MCP
 @mcp.tool()
-def calc_geometry(jGear_py: dict) -> dict:
+@_traced_tool
+async def calc_geometry(jGear_py: dict, ctx: Context = None) -> dict:
     """기어 치형의 기하학적 계산, 치형 계산 결과 반환"""
+    """jGear_py는 세션의 현재 설계 상태에 누적 적용되는 변경분(patch)이며, 빈 dict이면 현재 상태로 계산"""
     """반환결과의 ["Geometry"] 키 값에 치형 계산 결과가 저장되며, 메타데이터는 내부 key값 앞에 $로 시작하는 키 값으로 저장됨"""    
-    new = gear_data.copy()
-    recursive_update(new, jGear_py)    
-    jGear = JObject.Parse(json.dumps(new))
-
-    form.LoadDataInput_Json(jGear)
-    Result_Geo = form.CalcGeometry()
+    await _await_form()
+    session_id = _session_id(ctx)
 
-    Result_Geo_py = json.loads(Result_Geo.ToString())    # json -> dict
+    _, Result_Geo_py = await _run_geometry(session_id, jGear_py)
     return Result_Geo_py
 
 @mcp.tool()
-def calc_load_case(Result_Geo_py: dict) -> dict:
+@_traced_tool
+async def calc_load_case(Result_Geo_py: dict, ctx: Context = None) -> dict:
     """기어 강도평가, 효율, LTCA(Loaded Tooth Contact Analysis) 계산"""
-    Result_Geo = JObject.Parse(json.dumps(Result_Geo_py))
-    Result_Rating = form.CalcLoadCase(Result_Geo)
+    await _await_form()
+    session_id = _session_id(ctx)
 
-    Result_Rating_py = json.loads(Result_Rating.ToString())    # json -> dict
-    return Result_Rating_py
+    def job(slot):
+        session = design_store.session(session_id)
+        return _calc_load_case(slot, session, _geometry_jobject(session, Result_Geo_py))
+
+    return await dispatcher.run(job, affinity=session_id)
 
 @mcp.tool()
-def calc_all(jGear_py: dict) -> dict:
+@_traced_tool
+async def calc_all(jGear_py: dict, ctx: Context = None) -> dict:
     """기어 치형의 기하학적 계산, 기어 강도평가, 효율, LTCA(Loaded Tooth Contact Analysis) 계산"""
-    Result_Geo_py = calc_geometry(jGear_py)
-    Result_Rating_py = calc_load_case(Result_Geo_py)
-    return Result_Rating_py
+    await _await_form()
+    session_id = _session_id(ctx)
+
+    def job(slot):
+        session = design_store.session(session_id)
+        session.apply(jGear_py)
+        Result_Geo, _ = _calc_geometry(slot, session)
+        return _calc_load_case(slot, session, Result_Geo)
+
+    return await dispatcher.run(job, key=("calc_all", session_id, _patch_key(jGear_py)), affinity=session_id)
+
+@mcp.tool()
+@_traced_tool
+async def calc_all_stream(jGear_py: dict, ctx: Context = None) -> dict:
+    """calc_all의 스트리밍 버전. 치형 계산 요약을 먼저 알림으로 보내고, 강도/LTCA 결과는 섹션별로 준비되는 대로 알림 전송"""
+    """최종 반환값은 calc_all과 동일"""
+    await _await_form()
+    return await _stream_calc(ctx, _session_id(ctx), jGear_py=jGear_py)
+
+@mcp.tool()
+@_traced_tool
+async def calc_load_case_stream(Result_Geo_py: dict, ctx: Context = None) -> dict:
+    """calc_load_case의 스트리밍 버전. 강도/LTCA 결과를 섹션별로 준비되는 대로 알림 전송, 최종 반환값은 calc_load_case와 동일"""
+    await _await_form()
+    return await _stream_calc(ctx, _session_id(ctx), Result_Geo_py=Result_Geo_py)
+
+@mcp.tool()
+@_traced_tool
+async def undo_gear_data(steps: int = 1, ctx: Context = None) -> dict:
+    """세션의 설계 변경을 steps 단계 되돌림"""
+    await _await_form()
+    session_id = _session_id(ctx)
+
+    def job(slot):
+        session = design_store.session(session_id)
+        version = session.undo(steps)
+        return {"version": version, "history": session.history()}
+
+    return await dispatcher.run(job, affinity=session_id)
 
 @mcp.tool()
-def get_messages() -> dict:
+async def get_design_history(ctx: Context = None) -> dict:
+    """세션의 현재 설계 버전과 누적된 변경(patch) 이력 반환"""
+    await _await_design()
+    session = design_store.session(_session_id(ctx))
+    return {"version": session.version, "history": session.history()}
+
+@mcp.tool()
+async def get_messages(ctx: Context = None) -> dict:
     """정보, 경고, 오류 메시지 출력"""
-    Result_Message = form.GetMessages()
+    await _await_form()
+    def job(slot):
+        Result_Message = slot.form.GetMessages()
+        return json.loads(Result_Message.ToString())    # json -> dict
 
-    results = json.loads(Result_Message.ToString())    # json -> dict
-    return results
+    return await dispatcher.run(job, affinity=_session_id(ctx))
 
 @mcp.tool()
-def clear_messages() -> dict:
+async def clear_messages(ctx: Context = None) -> dict:
     """메시지 초기화"""
-    form.ClearMessages()
+    await _await_form()
+    await dispatcher.run(lambda slot: slot.form.ClearMessages(), affinity=_session_id(ctx))
     return {"message": "메시지가 초기화되었습니다."}
 
-if __name__ == "__main__":
-    print("---- 시작 ----")
-    jgear = edit_gear_data("모듈 3으로 바꿔줘")
-    jgeo = calc_geometry(jgear)
-    print("---- 종료 ----")
-    print(jgear)
-    mcp.run()
+@mcp.tool()
+def get_dispatcher_stats() -> dict:
+    """form 요청 큐 상태 (큐 길이, 대기/실행 시간, 병합된 요청 수) 반환"""
+    if not _form_ready.done():
+        return {"status": _startup_report["status"]}
+    return dispatcher.metrics()
 
+@mcp.tool()
+def get_startup_status() -> dict:
+    """서버 초기화 상태와 단계별 소요 시간(초) 반환"""
+    return _startup_report
 
+if __name__ == "__main__":
+    # 사용법: python GearDesign_agent.py [--eager | --startup-benchmark | --demo]
+    #   (기본) tool 목록에 바로 응답하고 .NET 초기화는 백그라운드에서 진행
+    #   --eager: 초기화 완료 후 서버 시작
+    #   --startup-benchmark: 초기화만 수행하고 단계별 소요 시간을 JSON으로 출력 후 종료
+    #   --demo: 초기화 후 예제 요청(모듈 변경 + 치형 계산) 실행
+    args = sys.argv[1:]
+    start_background_init()
+    if "--startup-benchmark" in args:
+        _startup_thread.join()
+        print(json.dumps(_startup_report, ensure_ascii=False))
+        sys.exit(0 if _startup_report["status"] == "ready" else 1)
+    if "--eager" in args:
+        _form_ready.result()
+    if "--demo" in args:
+        print("---- 시작 ----", file=sys.stderr)
+        jgear = asyncio.run(edit_gear_data("모듈 3으로 바꿔줘"))
+        jgeo = asyncio.run(calc_geometry(jgear))
+        print("---- 종료 ----", file=sys.stderr)
+        print(jgear, file=sys.stderr)
+    mcp.run()
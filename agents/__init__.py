@@ -1,4 +1,5 @@
 from .base_agent import BaseAgent
 from .gpt_agent import GPTAgent
+from .gear_agent import GearDesignAgent
 
-__all__ = ['BaseAgent', 'GPTAgent'] 
\ No newline at end of file
+__all__ = ['BaseAgent', 'GPTAgent', 'GearDesignAgent'] 
\ No newline at end of file
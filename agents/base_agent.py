@@ -2,31 +2,56 @@ from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional, AsyncGenerator, Callable
 import asyncio
 
+from .memory import ConversationMemory
+
 class BaseAgent(ABC):
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.messages: List[Dict[str, str]] = []
+        # 전체 대화 기록 + 토큰 예산 안으로 압축한 LLM 전송용 메시지
+        self.memory = ConversationMemory(**config.get("memory", {}))
+
+    @property
+    def messages(self) -> List[Dict[str, str]]:
+        """전체 대화 기록"""
+        return self.memory.history
 
     @abstractmethod
     async def process_with_callback(self, input_text: str, callback: Callable[[str], None]) -> str:
         """에이전트의 주요 처리 로직. 입력을 받아 콜백으로 스트리밍 응답을 전달한다."""
         pass
     
-    def add_message(self, role: str, content: str):
-        """대화 기록에 메시지를 추가합니다."""
-        self.messages.append({"role": role, "content": content})
+    def add_message(self, role: str, content: str) -> Dict[str, str]:
+        """대화 기록에 메시지를 추가하고 추가한 메시지를 반환합니다."""
+        return self.memory.add(role, content)
+
+    def remove_message(self, message: Dict[str, str]):
+        """add_message로 추가한 메시지를 대화 기록에서 제거합니다."""
+        self.memory.remove(message)
     
     def get_messages(self) -> List[Dict[str, str]]:
-        """현재까지의 대화 기록을 반환합니다."""
-        return self.messages
+        """LLM에 보낼 메시지를 반환합니다. (고정 메시지 + 이전 대화 요약 + 최근 대화)"""
+        return self.memory.view()
+    
+    def pin_message(self, name: str, content: str, role: str = "system"):
+        """항상 포함할 메시지를 설정합니다. (예: 현재 설계 상태)"""
+        self.memory.pin(name, content, role)
     
     def clear_messages(self):
         """대화 기록을 초기화합니다."""
-        self.messages = []
+        self.memory.clear()
     
     def update_config(self, new_config: Dict[str, Any]):
         """에이전트 설정을 업데이트합니다."""
         self.config.update(new_config)
+
+    def state_dict(self) -> Dict[str, Any]:
+        """디스크 저장용 상태 (설정 + 대화 메모리)"""
+        return {"config": self.config, "memory": self.memory.to_dict()}
+
+    def load_state(self, state: Dict[str, Any]):
+        """state_dict()로 저장한 상태를 복원합니다."""
+        self.update_config(state.get("config", {}))
+        self.memory.load_dict(state.get("memory", {}))
     
     async def stream_response(self, response: Any) -> str:
         """스트리밍 응답을 처리합니다."""
@@ -0,0 +1,312 @@
+from typing import Dict, Any, List, Callable, Optional
+import sys
+import os
+import json
+import time
+import asyncio
+
+# 프로젝트 루트 디렉토리를 Python 경로에 추가
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from .base_agent import BaseAgent
+from utils.providers import get_provider_router
+from utils.tracing import span, traced, current_context
+
+GEAR_SYSTEM_PROMPT = (
+    "너는 GearDesign 도구를 사용해 기어 설계를 돕는 엔지니어링 에이전트야.\n"
+    "설계 값 변경 요청은 edit_gear_data로 patch를 만든 뒤 calc_geometry 또는 calc_all로 계산해.\n"
+    "서로 독립적인 계산(예: 여러 설계안 비교)은 한 번에 여러 도구를 호출해도 돼.\n"
+    "계산 결과의 수치는 단위와 함께 정확히 인용하고, 도구 결과에 없는 값은 추측하지 마."
+)
+
+# 모델에 다시 전달하는 도구 결과 최대 길이 (계산 결과 JSON은 매우 클 수 있음)
+MAX_TOOL_RESULT_CHARS = 12000
+
+# edit_gear_data 직후 미리 시작한 계산 결과를 사용할 수 있는 시간(초)
+SPECULATION_TTL = 60.0
+
+
+def _args_key(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+class SpeculativeCalc:
+    """
+    edit_gear_data가 반환한 patch로 미리 시작한 calc_geometry -> calc_load_case 실행
+    - 모델이 같은 patch로 calc_geometry/calc_all을 요청하거나, 그 뒤 미리 계산한 치형 결과 그대로
+      calc_load_case를 요청하면 이 결과를 사용
+    - calc_geometry는 세션 설계 상태에 patch를 적용하므로 시작 전 설계 버전을 기록해 두고,
+      결과가 사용되지 않으면 discard()에서 그만큼 undo_gear_data로 되돌림
+    """
+
+    def __init__(self, invoke: Callable[[str, Dict[str, Any]], Any], patch: Dict[str, Any], ttl: float):
+        self.invoke = invoke
+        self.patch_key = _args_key(patch)
+        self.expires = time.monotonic() + ttl
+        self.base_version: Optional[int] = None
+        self.geometry_used = False
+        self._geometry_value: Optional[Any] = None
+        self.geometry = asyncio.ensure_future(self._geometry(patch))
+        self.rating = asyncio.ensure_future(self._rating())
+
+    async def _geometry(self, patch: Dict[str, Any]) -> str:
+        with span("speculation.calc_geometry"):
+            history = json.loads(await self.invoke("get_design_history", {}))
+            self.base_version = history["version"]
+            return await self.invoke("calc_geometry", {"jGear_py": patch})
+
+    async def _rating(self) -> str:
+        # 치형 계산이 오류 문자열이면 JSON 파싱에서 실패하여 강도 계산은 미리 실행하지 않음
+        geometry = json.loads(await asyncio.shield(self.geometry))
+        with span("speculation.calc_load_case"):
+            return await self.invoke("calc_load_case", {"Result_Geo_py": geometry})
+
+    def match(self, name: str, arguments: Dict[str, Any]) -> Optional[asyncio.Future]:
+        """요청된 도구 호출에 해당하는 미리 계산 작업을 반환합니다. 없으면 None"""
+        if time.monotonic() > self.expires:
+            return None
+        same_patch = _args_key(arguments.get("jGear_py")) == self.patch_key
+        if name == "calc_geometry" and same_patch:
+            self.geometry_used = True
+            return self.geometry
+        if name == "calc_all" and same_patch:
+            self.geometry_used = True
+            return self.rating
+        if name == "calc_load_case" and self.geometry_used and self._same_geometry(arguments.get("Result_Geo_py")):
+            return self.rating
+        return None
+
+    def _same_geometry(self, Result_Geo_py: Any) -> bool:
+        """모델이 전달한 치형 계산 결과가 미리 계산한 결과와 같은지 확인 (모델이 값을 수정했으면 다시 계산)"""
+        if not self.geometry.done() or self.geometry.cancelled() or self.geometry.exception() is not None:
+            return False
+        if self._geometry_value is None:
+            try:
+                self._geometry_value = json.loads(self.geometry.result())
+            except json.JSONDecodeError:
+                return False
+        return Result_Geo_py == self._geometry_value
+
+    async def discard(self):
+        """남은 미리 계산을 취소하고, 사용되지 않은 patch 적용은 되돌립니다."""
+        self.rating.cancel()
+        if self.geometry_used:
+            return
+        # 서버에서 이미 시작된 patch 적용은 취소할 수 없으므로 끝날 때까지 기다린 뒤 되돌림
+        await asyncio.gather(self.geometry, return_exceptions=True)
+        if self.base_version is None:
+            return
+        history = json.loads(await self.invoke("get_design_history", {}))
+        steps = history["version"] - self.base_version
+        if steps > 0:
+            await self.invoke("undo_gear_data", {"steps": steps})
+
+
+class GearDesignAgent(BaseAgent):
+    """
+    GearDesign MCP 도구를 사용하는 function calling 에이전트
+    - 모델이 한 턴에 요청한 여러 도구 호출은 동시에 실행 (asyncio.gather)
+    - 모델 응답과 도구 실행 결과를 콜백으로 스트리밍
+    - edit_gear_data 직후 calc_geometry/calc_load_case를 미리 실행하여 다음 계산 요청에 바로 응답 (speculate)
+    """
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.model = config.get("model", "gpt-4o-mini")
+        self.temperature = config.get("temperature", 0.2)
+        self.max_steps = config.get("max_steps", 8)
+        self.server_name = config.get("mcp_server", "GearDesign_agent")
+        self.session_id = config.get("session_id")
+        self.speculate = config.get("speculate", True)
+        self.speculation_ttl = config.get("speculation_ttl", SPECULATION_TTL)
+        self._speculation: Optional[SpeculativeCalc] = None
+        self._cleanup: Optional[asyncio.Future] = None
+        self.pin_message("instructions", config.get("system_prompt", GEAR_SYSTEM_PROMPT))
+
+    def update_config(self, new_config: Dict[str, Any]):
+        """설정을 업데이트하고 내부 변수를 갱신합니다."""
+        super().update_config(new_config)
+        self.model = self.config.get("model", "gpt-4o-mini")
+        self.temperature = self.config.get("temperature", 0.2)
+        self.max_steps = self.config.get("max_steps", 8)
+        self.speculate = self.config.get("speculate", True)
+        self.speculation_ttl = self.config.get("speculation_ttl", SPECULATION_TTL)
+
+    @property
+    def mcp(self):
+        """프로세스 공용 MCP 연결 관리자 (서버는 프로세스당 한 번만 실행)"""
+        from services.mcp_manager import get_mcp_manager
+        return get_mcp_manager()
+
+    async def _invoke(self, name: str, arguments: Dict[str, Any]) -> str:
+        """도구를 호출하고 텍스트 결과를 반환합니다."""
+        with span("mcp.call_tool", tool=name) as trace:
+            result = await self.mcp.call_tool(self.server_name, name, arguments, client_id=self.session_id,
+                                              trace=current_context())
+            text = "\n".join(getattr(item, "text", "") for item in result.content)
+            trace.set(chars=len(text), is_error=bool(result.isError))
+        if result.isError:
+            return f"도구 실행 오류: {text}"
+        return text
+
+    async def _call_tool(self, tool_call: Dict[str, Any], callback: Callable[[str], None]) -> str:
+        name = tool_call["function"]["name"]
+        try:
+            arguments = json.loads(tool_call["function"]["arguments"] or "{}")
+        except json.JSONDecodeError as e:
+            return f"도구 인자 JSON 파싱 오류: {e}"
+        text = None
+        speculative = self._speculation.match(name, arguments) if self._speculation else None
+        with span("tool", tool=name, speculative=speculative is not None):
+            if speculative is not None:
+                try:
+                    text = await asyncio.shield(speculative)
+                except Exception:
+                    # 미리 계산이 실패했으면 일반 호출로 다시 실행
+                    text = None
+            try:
+                if text is None:
+                    text = await self._invoke(name, arguments)
+            except Exception as e:
+                text = f"도구 실행 오류: {e}"
+        callback(f"\n\n> 🔧 `{name}` 완료{' (미리 계산됨)' if speculative is not None else ''}\n\n")
+        if len(text) > MAX_TOOL_RESULT_CHARS:
+            text = text[:MAX_TOOL_RESULT_CHARS] + "\n...(이하 생략)"
+        return text
+
+    async def _discard_speculation(self, wait: bool = True):
+        """
+        미리 계산을 버립니다.
+        - wait=False이면 정리(patch 되돌리기)를 백그라운드로 넘기고, 다음 턴 시작 전에 끝날 때까지 기다림
+        """
+        speculation, self._speculation = self._speculation, None
+        if speculation is None:
+            return
+
+        async def discard():
+            try:
+                await speculation.discard()
+            except Exception as e:
+                print("미리 계산 정리 실패:", e, file=sys.stderr)
+
+        if wait:
+            await discard()
+        else:
+            self._cleanup = asyncio.ensure_future(discard())
+
+    async def _wait_cleanup(self):
+        cleanup, self._cleanup = self._cleanup, None
+        if cleanup is not None:
+            await cleanup
+
+    async def _settle_speculation(self, tool_calls: List[Dict[str, Any]]):
+        """이번에 실행할 도구 호출 중 미리 계산과 일치하는 것이 없으면 미리 계산을 버립니다."""
+        speculation = self._speculation
+        if speculation is None:
+            return
+        for call in tool_calls:
+            try:
+                arguments = json.loads(call["function"]["arguments"] or "{}")
+            except json.JSONDecodeError:
+                continue
+            if speculation.match(call["function"]["name"], arguments) is not None:
+                return
+        await self._discard_speculation()
+
+    async def _start_speculation(self, tool_calls: List[Dict[str, Any]], results: List[str]):
+        """edit_gear_data가 patch를 반환했으면 그 patch로 계산을 미리 시작합니다."""
+        patches = []
+        for call, result in zip(tool_calls, results):
+            if call["function"]["name"] != "edit_gear_data":
+                continue
+            try:
+                patches.append(json.loads(result))
+            except json.JSONDecodeError:
+                return
+        # 한 번에 여러 patch를 만든 경우는 어느 것을 계산할지 알 수 없으므로 미리 실행하지 않음
+        if len(patches) != 1 or not isinstance(patches[0], dict) or not patches[0]:
+            return
+        await self._discard_speculation()
+        self._speculation = SpeculativeCalc(self._invoke, patches[0], self.speculation_ttl)
+
+    async def _stream_turn(self, messages: List[Dict[str, Any]], tools: List[Dict[str, Any]],
+                           callback: Callable[[str], None]):
+        """모델 응답 1회를 스트리밍하며 (본문, 도구 호출 목록)을 반환"""
+        with span("llm.request", model=self.model, messages=len(messages)) as trace:
+            # tools를 지원하는 공급자 중 가장 빠른 정상 공급자로 스트리밍
+            options = {"tools": tools} if tools else {}
+            response = get_provider_router().stream(
+                self.model, messages, self.temperature, priority=0, trace_parent=trace, **options
+            )
+            content = ""
+            tool_calls: Dict[int, Dict[str, Any]] = {}
+            try:
+                async for chunk in response:
+                    trace.mark("response")
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        trace.mark("first_token")
+                        content += delta.content
+                        callback(delta.content)
+                    for call in delta.tool_calls or []:
+                        trace.mark("first_token")
+                        entry = tool_calls.setdefault(
+                            call.index, {"id": "", "type": "function", "function": {"name": "", "arguments": ""}}
+                        )
+                        if call.id:
+                            entry["id"] = call.id
+                        if call.function and call.function.name:
+                            entry["function"]["name"] += call.function.name
+                        if call.function and call.function.arguments:
+                            entry["function"]["arguments"] += call.function.arguments
+            finally:
+                await response.aclose()
+            trace.set(chars=len(content), tool_calls=len(tool_calls))
+        return content, [tool_calls[i] for i in sorted(tool_calls)]
+
+    @traced("agent.gear_design")
+    async def process_with_callback(self, input_text: str, callback: Callable[[str], None]) -> str:
+        """도구 호출이 없는 응답이 나올 때까지 모델 호출과 도구 실행을 반복합니다."""
+        user_message = self.add_message("user", input_text)
+        try:
+            # 이전 턴에서 버린 미리 계산의 정리가 끝난 뒤에 설계 상태를 사용
+            await self._wait_cleanup()
+            tools = await self.mcp.openai_tools(self.server_name)
+            # 이번 턴의 도구 호출/결과 메시지는 턴 안에서만 사용하고 메모리에는 최종 응답만 저장
+            messages: List[Dict[str, Any]] = list(self.get_messages())
+            full_response = ""
+            for _ in range(self.max_steps):
+                content, tool_calls = await self._stream_turn(messages, tools, callback)
+                full_response += content
+                if not tool_calls:
+                    break
+                messages.append({"role": "assistant", "content": content or None, "tool_calls": tool_calls})
+                await self._settle_speculation(tool_calls)
+                results = await asyncio.gather(*(self._call_tool(call, callback) for call in tool_calls))
+                for call, result in zip(tool_calls, results):
+                    messages.append({"role": "tool", "tool_call_id": call["id"], "content": result})
+                if self.speculate:
+                    await self._start_speculation(tool_calls, results)
+            else:
+                full_response += "\n\n(도구 호출 횟수 제한에 도달했습니다.)"
+                callback("\n\n(도구 호출 횟수 제한에 도달했습니다.)")
+
+            self.add_message("assistant", full_response)
+            return full_response
+
+        except asyncio.CancelledError:
+            # 취소된 턴은 응답 없이 사용자 메시지만 남지 않도록 되돌림
+            self.remove_message(user_message)
+            raise
+
+        except Exception as e:
+            error_msg = f"오류 발생: {str(e)}"
+            callback(error_msg)
+            self.add_message("assistant", error_msg)
+            return error_msg
+
+        finally:
+            # 이번 턴에서 사용되지 않은 미리 계산은 버림 (적용된 patch 되돌리기는 응답을 막지 않도록 백그라운드로)
+            await self._discard_speculation(wait=False)
@@ -9,14 +9,10 @@ sys.path.insert(0, project_root)
 
 from .base_agent import BaseAgent
 from utils.llm import llm_call, llm_call_stream
-from openai import AsyncOpenAI
-import os
+from utils.providers import get_provider_router
 import streamlit as st
 import time
-from langsmith import traceable
-
-# OpenAI 클라이언트 초기화
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from utils.tracing import span, traced
 
 class GPTAgent(BaseAgent):
     def __init__(self, config: Dict[str, Any]):
@@ -30,37 +26,45 @@ class GPTAgent(BaseAgent):
         self.model = self.config.get("model", "gpt-4o-mini")
         self.temperature = self.config.get("temperature", 0.7)
     
-    @traceable
+    @traced("agent.gpt")
     async def process_with_callback(self, input_text: str, callback: Callable[[str], None]) -> str:
         """콜백 방식으로 처리합니다. 청크가 도착할 때마다 콜백 함수를 호출합니다."""
+        # 사용자 메시지 추가
+        user_message = self.add_message("user", input_text)
         try:
-            # 사용자 메시지 추가
-            self.add_message("user", input_text)
-            
             full_response = ""
             
-            # 직접 OpenAI API 호출
-            response = await client.chat.completions.create(
-                model=self.model,
-                messages=self.get_messages(),
-                temperature=self.temperature,
-                stream=True
-            )
-            
-            # 스트림 응답 처리
-            async for chunk in response:
-                if chunk.choices and len(chunk.choices) > 0:
-                    if chunk.choices[0].delta and chunk.choices[0].delta.content:
-                        content = chunk.choices[0].delta.content
-                        if content:
-                            full_response += content
-                            # 콜백으로 청크 전달
-                            callback(content)
+            with span("llm.request", model=self.model) as trace:
+                # 가장 빠른 정상 공급자로 스트리밍 (사용자 대면 요청이므로 우선순위 0)
+                response = get_provider_router().stream(
+                    self.model, self.get_messages(), self.temperature, priority=0, trace_parent=trace
+                )
+                
+                # 스트림 응답 처리
+                try:
+                    async for chunk in response:
+                        trace.mark("response")
+                        if chunk.choices and len(chunk.choices) > 0:
+                            if chunk.choices[0].delta and chunk.choices[0].delta.content:
+                                content = chunk.choices[0].delta.content
+                                if content:
+                                    trace.mark("first_token")
+                                    full_response += content
+                                    # 콜백으로 청크 전달
+                                    callback(content)
+                finally:
+                    await response.aclose()
+                trace.set(chars=len(full_response))
             
             # 최종 응답을 메시지에 추가
             self.add_message("assistant", full_response)
             return full_response
-        
+
+        except asyncio.CancelledError:
+            # 취소된 턴은 응답 없이 사용자 메시지만 남지 않도록 되돌림
+            self.remove_message(user_message)
+            raise
+
         except Exception as e:
             error_msg = f"오류 발생: {str(e)}"
             callback(error_msg)
@@ -0,0 +1,193 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from utils.prompt_builder import count_tokens
+
+Message = Dict[str, str]
+
+SUMMARY_PROMPT = (
+    "너는 대화 기록을 요약하는 AI야.\n"
+    "기존 요약과 이어지는 대화를 합쳐서 하나의 요약으로 갱신해.\n"
+    "사용자의 요청, 결정된 설계 값, 계산 결과 수치, 남아 있는 질문은 빠짐없이 유지하고 인사말 등은 생략해.\n"
+    "요약만 출력해."
+)
+
+
+async def _llm_summarize(summary: str, messages: List[Message], model: str) -> str:
+    """기존 요약 + 밀려난 대화 -> 갱신된 요약 (백그라운드 우선순위로 호출)"""
+    from utils.llm import llm_call_async
+
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    prompt = [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"기존 요약:\n{summary or '(없음)'}\n\n이어지는 대화:\n{transcript}"},
+    ]
+    async for completion in llm_call_async(prompt=prompt, model=model, temperature=0, priority=2):
+        return completion.choices[0].message.content
+    return summary
+
+
+class ConversationMemory:
+    """
+    토큰 예산 안에서 대화 맥락을 유지하는 메모리
+    - 전체 기록(history)은 그대로 보관하고, LLM에 보낼 메시지(view)는 따로 미리 구성해 둠
+    - view = 고정 메시지(pinned) + 이전 대화 요약 + 최근 대화(window)
+    - window가 예산을 넘으면 오래된 메시지부터 밀어내고, 밀려난 메시지는 백그라운드에서 요약에 합침
+      (요약이 끝나기 전까지 밀려난 메시지는 view에서 빠져 있으므로 응답 경로를 막지 않음)
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = 6000,
+        keep_recent: int = 4,
+        model: str = "gpt-4o-mini",
+        summarizer: Optional[Callable[[str, List[Message]], Awaitable[str]]] = None,
+    ):
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.model = model
+        self.summarizer = summarizer or (lambda summary, messages: _llm_summarize(summary, messages, model))
+        self.history: List[Message] = []
+        self.pinned: Dict[str, Tuple[Message, int]] = {}
+        self.summary = ""
+        self._summary_tokens = 0
+        self._window: Deque[Tuple[Message, int]] = deque()
+        self._window_tokens = 0
+        self._evicted: List[Message] = []
+        self._summary_task: Optional[asyncio.Task] = None
+        self._view: List[Message] = []
+
+    def _tokens(self, message: Message) -> int:
+        # 메시지 구분 토큰 근사 4 포함
+        return count_tokens(message["content"], self.model) + 4
+
+    @property
+    def tokens(self) -> int:
+        """현재 view의 토큰 수"""
+        return sum(t for _, t in self.pinned.values()) + self._summary_tokens + self._window_tokens
+
+    def _rebuild(self):
+        view = [message for message, _ in self.pinned.values()]
+        if self.summary:
+            view.append({"role": "system", "content": f"이전 대화 요약:\n{self.summary}"})
+        view.extend(message for message, _ in self._window)
+        self._view = view
+
+    def _trim(self):
+        limit = self.budget_tokens - sum(t for _, t in self.pinned.values()) - self._summary_tokens
+        while self._window_tokens > limit and len(self._window) > self.keep_recent:
+            message, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+            self._evicted.append(message)
+        if self._evicted:
+            self._schedule_summary()
+
+    def add(self, role: str, content: str) -> Message:
+        message = {"role": role, "content": content}
+        self.history.append(message)
+        tokens = self._tokens(message)
+        self._window.append((message, tokens))
+        self._window_tokens += tokens
+        self._trim()
+        self._rebuild()
+        return message
+
+    def remove(self, message: Message):
+        """
+        add()로 추가한 메시지를 제거합니다. (취소된 턴의 사용자 메시지 되돌리기)
+        이미 요약에 반영된 메시지는 요약에서 빼낼 수 없으므로 기록(history)에서만 제거
+        """
+        self.history = [m for m in self.history if m is not message]
+        for i, (m, tokens) in enumerate(self._window):
+            if m is message:
+                del self._window[i]
+                self._window_tokens -= tokens
+                break
+        else:
+            self._evicted = [m for m in self._evicted if m is not message]
+        self._rebuild()
+
+    def pin(self, name: str, content: str, role: str = "system"):
+        """항상 view 앞에 포함할 메시지를 설정합니다. (같은 name이면 교체, 예: 현재 설계 상태)"""
+        message = {"role": role, "content": content}
+        self.pinned[name] = (message, self._tokens(message))
+        self._trim()
+        self._rebuild()
+
+    def unpin(self, name: str):
+        if self.pinned.pop(name, None) is not None:
+            self._rebuild()
+
+    def view(self) -> List[Message]:
+        """LLM에 보낼 메시지 목록 (미리 구성된 리스트를 그대로 반환)"""
+        return self._view
+
+    def clear(self):
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+            self._summary_task = None
+        self.history = []
+        self.summary = ""
+        self._summary_tokens = 0
+        self._window.clear()
+        self._window_tokens = 0
+        self._evicted = []
+        self._rebuild()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """디스크 저장용 상태 (요약 대기 중인 메시지 포함)"""
+        return {
+            "history": self.history,
+            "summary": self.summary,
+            "pinned": {name: message for name, (message, _) in self.pinned.items()},
+            "window": [message for message, _ in self._window],
+            "evicted": self._evicted,
+        }
+
+    def load_dict(self, state: Dict[str, Any]):
+        """to_dict()로 저장한 상태를 복원합니다."""
+        self.clear()
+        self.history = list(state.get("history", []))
+        self.summary = state.get("summary", "")
+        self._summary_tokens = count_tokens(self.summary, self.model) + 4 if self.summary else 0
+        for name, message in state.get("pinned", {}).items():
+            self.pinned[name] = (message, self._tokens(message))
+        for message in state.get("window", []):
+            tokens = self._tokens(message)
+            self._window.append((message, tokens))
+            self._window_tokens += tokens
+        self._evicted = list(state.get("evicted", []))
+        self._trim()
+        self._rebuild()
+
+    def _schedule_summary(self):
+        if self._summary_task is not None and not self._summary_task.done():
+            return  # 진행 중인 요약이 끝나면 남은 메시지를 이어서 요약
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # 이벤트 루프 밖에서는 다음 비동기 호출 때 요약
+        self._summary_task = loop.create_task(self._summarize())
+
+    async def _summarize(self):
+        while self._evicted:
+            batch, self._evicted = self._evicted, []
+            try:
+                summary = await self.summarizer(self.summary, batch)
+            except Exception as e:
+                print(f"Error in ConversationMemory summary: {e}")
+                self._evicted = batch + self._evicted
+                return
+            self.summary = summary
+            self._summary_tokens = count_tokens(summary, self.model) + 4
+            # 요약이 길어진 만큼 window 예산이 줄어듦
+            self._trim()
+            self._rebuild()
+
+    async def flush(self):
+        """대기 중인 요약을 모두 반영할 때까지 기다립니다."""
+        if self._evicted and (self._summary_task is None or self._summary_task.done()):
+            self._schedule_summary()
+        if self._summary_task is not None:
+            await asyncio.shield(self._summary_task)
@@ -5,6 +5,7 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from utils.llm import llm_call
+from utils.prompt_builder import PromptBuilder, log_prompt_report
 
 
 default_json_path = os.path.join(os.path.dirname(__file__), "data", "schema", "Default.json")
@@ -20,10 +21,16 @@ system_prompt = (
     "반환 시 변경해야할 정확한 JSON KEY 값과 Value만 반환해.\n"    
     "반환하는 데이터 형태는 반드시 JSON의 표준 중첩구조를 따라야 해."
 )
-prompt = [
-    {"role": "system", "content": system_prompt},
-    {"role": "user", "content": f"사용자 요청: 모듈 3으로 바꿔줘. 잇수도 기어비 2:1에 맞게 바꿔줘\n현재 데이터: {json.dumps(gear_data, ensure_ascii=False)}"}
-]
+# 고정 지침 -> 현재 데이터 -> 사용자 요청 순서 (edit_gear_data와 같은 배치로 prefix 캐시 공유)
+built = (
+    PromptBuilder(model="gpt-4o")
+    .system("instructions", system_prompt)
+    .add("design_data", f"현재 데이터: {json.dumps(gear_data, ensure_ascii=False)}", stability="session")
+    .add("user_request", "사용자 요청: 모듈 3으로 바꿔줘. 잇수도 기어비 2:1에 맞게 바꿔줘", required=True)
+    .build()
+)
+log_prompt_report("test", built.report)
+prompt = built.messages
 # prompt = [
 #     {"role": "system", "content": system_prompt},
 #     {"role": "user", "content": f"사용자 요청: 모듈 3으로 바꿔줘"}
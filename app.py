@@ -1,44 +1,30 @@
 import streamlit as st
 from services.agent_service import AgentService
-import asyncio
-import nest_asyncio
+from services.transcript_store import get_transcript_store
+from utils.stream_renderer import StreamRenderer
+from utils.chat_history import get_session_id, render_history
 import os
 import time
 
 # 1. Streamlit 초기화
-# asyncio 중첩 실행 허용
-nest_asyncio.apply()
-
 # 페이지 설정
 st.set_page_config(page_title="Gear AI Agent Chat", layout="wide")
 
 # Session state 설정 (사용할 변수 선언과 유사, dict 형태로 사용)
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-
 if "agent_settings" not in st.session_state:
     st.session_state.agent_settings = {}
 
-# 2. 에이전트 서비스 초기화 - 캐시 방지를 위해 수정
-@st.cache_resource
-def get_cached_agent_service():
-    return AgentService()
+# 브라우저 세션별 ID (에이전트 인스턴스와 대화 기록을 세션마다 분리, 새로고침해도 유지)
+session_id = get_session_id()
+
+# 대화 기록은 SQLite에 저장하고 화면에는 최근 메시지만 표시
+transcripts = get_transcript_store()
 
-# 설정이 변경되었을 때만 새로 생성
+# 2. 에이전트 서비스 초기화 (프로세스 공용, 세션별 에이전트는 서비스 내부 풀에서 관리)
+@st.cache_resource
 def get_agent_service():
-    # 설정 변경 감지
-    current_settings = st.session_state.get('agent_settings', {})
-    
-    if 'last_settings' not in st.session_state or \
-       st.session_state.last_settings != current_settings:
-        
-        # 설정이 변경되었으면 캐시 무효화
-        get_cached_agent_service.clear()
-        st.session_state.last_settings = current_settings.copy()
-    
-    return get_cached_agent_service()
+    return AgentService()
 
-# 캐시를 피하기 위한 타임스탬프 추가
 agent_service = get_agent_service()
 
 # 사이드바 설정
@@ -88,20 +74,18 @@ if agent_config:
     # 설정 업데이트
     st.session_state.agent_settings[agent_type].update(updated_config)
     
-    agent_service.agents[agent_type].update_config(st.session_state.agent_settings[agent_type])
+    agent_service.update_agent_config(agent_type, st.session_state.agent_settings[agent_type], session_id)
     
 # 메인 채팅 인터페이스
 st.title("AI Agent Chat")
 
-# 기존 대화 표시
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# 기존 대화 표시 (최근 20개, 이전 메시지는 요청 시 추가로 불러옴)
+render_history(transcripts, session_id, page_size=20)
 
 # 사용자 입력 처리
 if user_input := st.chat_input("메시지를 입력하세요..."):
     # 사용자 메시지 표시
-    st.session_state.messages.append({"role": "user", "content": user_input})
+    transcripts.append(session_id, "user", user_input)
     with st.chat_message("user"):
         st.markdown(user_input)
         
@@ -110,7 +94,7 @@ if user_input := st.chat_input("메시지를 입력하세요..."):
         # 어시스턴트 메시지 컨테이너 생성
         with st.chat_message("assistant"):
             # 응답 컨테이너 생성
-            response_placeholder = st.empty()
+            response_container = st.container()
             
             # 스피너와 응답 표시
             with st.spinner("AI가 응답을 생성하고 있습니다..."):
@@ -118,27 +102,23 @@ if user_input := st.chat_input("메시지를 입력하세요..."):
                 current_config = st.session_state.agent_settings[agent_type]
                 
                 try:
-                    # 결과를 누적할 변수를 리스트로 변경 (파이썬에서 리스트는 가변객체라 nonlocal 없이도 변경 가능)
-                    response_parts = []
-                    
-                    # 콜백 함수 정의
-                    def update_response(chunk):
-                        response_parts.append(chunk)
-                        # 현재까지의 전체 응답 표시
-                        response_placeholder.markdown("".join(response_parts))
+                    # 청크를 약 50ms 단위로 모아서 표시하고, 완성된 블록은 확정하여 마지막 블록만 다시 그림
+                    renderer = StreamRenderer(response_container, interval=0.05)
                     
-                    # 비동기 함수를 동기적으로 실행
-                    loop = asyncio.get_event_loop()
-                    loop.run_until_complete(
-                        agent_service.process_with_callback(
-                            agent_type, 
-                            user_input, 
-                            update_response
-                        )
-                    )
+                    # 응답 생성은 AgentService의 백그라운드 루프에서 실행 (이 세션의 이전 응답은 자동 취소)
+                    stream = agent_service.start_chat(agent_type, user_input, session_id)
+                    completed = False
+                    try:
+                        while (chunks := stream.drain(timeout=renderer.interval)) is not None:
+                            renderer.feed_many(chunks)
+                        completed = True
+                    finally:
+                        # 새 메시지 입력 등으로 스크립트가 중단되면 진행 중인 응답도 취소
+                        if not completed:
+                            stream.cancel()
                     
                     # 최종 응답 조합
-                    response_text = "".join(response_parts)
+                    response_text = renderer.close()
                     
                 except Exception as e:
                     st.error(f"처리 중 오류 발생: {str(e)}")
@@ -146,10 +126,8 @@ if user_input := st.chat_input("메시지를 입력하세요..."):
                     st.error(traceback.format_exc())
                     response_text = f"오류가 발생했습니다: {str(e)}"
             
-            # 최종 응답을 세션 상태에 추가
-            st.session_state.messages.append(
-                {"role": "assistant", "content": response_text}
-            )
+            # 최종 응답을 대화 기록에 저장
+            transcripts.append(session_id, "assistant", response_text)
         
     except Exception as e:
         st.error(f"에러 발생: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from agents.base_agent import BaseAgent
+
+# 유휴 세션 저장 위치 (프로젝트 루트의 .cache/sessions)
+DEFAULT_SPILL_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "sessions"
+)
+
+SessionKey = Tuple[str, str]
+
+
+@dataclass
+class _Entry:
+    agent: BaseAgent
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    last_used: float = field(default_factory=time.monotonic)
+    active: int = 0
+
+
+class AgentPool:
+    """
+    세션별 에이전트 인스턴스 풀
+    - (세션 ID, 에이전트 이름)마다 별도의 에이전트를 처음 사용할 때 생성
+    - 같은 세션의 요청은 세션 lock으로 순서대로 처리 (대화 기록이 섞이지 않도록)
+    - 메모리에 유지하는 세션 수(max_active)를 넘거나 idle_ttl 동안 사용되지 않은 세션은
+      디스크에 저장한 뒤 메모리에서 제거하고, 다시 요청되면 복원
+    - 디스크에 저장된 세션은 spill_ttl이 지나거나 max_spilled개를 넘으면 오래된 것부터 삭제
+    """
+
+    def __init__(
+        self,
+        factories: Dict[str, Callable[[Dict[str, Any]], BaseAgent]],
+        default_configs: Dict[str, Dict[str, Any]],
+        max_active: int = 64,
+        idle_ttl: float = 30 * 60,
+        spill_dir: Optional[str] = DEFAULT_SPILL_DIR,
+        spill_ttl: float = 7 * 24 * 3600,
+        max_spilled: int = 10000,
+        prune_interval: float = 60.0,
+    ):
+        self.factories = factories
+        self.default_configs = default_configs
+        self.max_active = max_active
+        self.idle_ttl = idle_ttl
+        self.spill_dir = spill_dir
+        self.spill_ttl = spill_ttl
+        self.max_spilled = max_spilled
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._entries: "OrderedDict[SessionKey, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "restored": 0, "spilled": 0, "pruned": 0}
+
+    def _spill_path(self, key: SessionKey) -> str:
+        digest = hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.spill_dir, f"{digest}.json")
+
+    def _create(self, key: SessionKey) -> BaseAgent:
+        session_id, agent_name = key
+        config = json.loads(json.dumps(self.default_configs.get(agent_name, {})))
+        config["session_id"] = session_id
+        agent = self.factories[agent_name](config)
+        if self.spill_dir:
+            path = self._spill_path(key)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    agent.load_state(json.load(f))
+                os.remove(path)
+                self.stats["restored"] += 1
+                return agent
+        self.stats["created"] += 1
+        return agent
+
+    def _entry(self, session_id: str, agent_name: str, acquire: bool = False) -> _Entry:
+        """세션 항목을 반환합니다. acquire=True이면 같은 lock 안에서 사용 중(active)으로 표시"""
+        if agent_name not in self.factories:
+            raise KeyError(agent_name)
+        key = (session_id, agent_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(self._create(key))
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            entry.last_used = time.monotonic()
+            if acquire:
+                entry.active += 1
+            self._evict(keep=key)
+            return entry
+
+    def get(self, session_id: str, agent_name: str) -> BaseAgent:
+        """세션의 에이전트를 반환합니다. (없으면 생성 또는 디스크에서 복원)"""
+        return self._entry(session_id, agent_name).agent
+
+    async def run(self, session_id: str, agent_name: str, fn: Callable[[BaseAgent], Any]) -> Any:
+        """세션 lock을 잡은 상태로 fn(agent)를 실행합니다. 실행 중인 세션은 제거되지 않음"""
+        entry = self._entry(session_id, agent_name, acquire=True)
+        try:
+            async with entry.lock:
+                return await fn(entry.agent)
+        finally:
+            entry.active -= 1
+            entry.last_used = time.monotonic()
+
+    def _evict(self, keep: Optional[SessionKey] = None):
+        """LRU 순서로 유휴 세션을 디스크에 저장하고 제거합니다. (self._lock 보유 상태에서 호출)"""
+        now = time.monotonic()
+        for key in list(self._entries):
+            entry = self._entries[key]
+            over_capacity = len(self._entries) > self.max_active
+            if not over_capacity and now - entry.last_used < self.idle_ttl:
+                break
+            if key == keep or entry.active or entry.lock.locked():
+                continue
+            self._spill(key, entry)
+            del self._entries[key]
+
+    def _spill(self, key: SessionKey, entry: _Entry):
+        if not self.spill_dir:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = self._spill_path(key)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entry.agent.state_dict(), f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+        self.stats["spilled"] += 1
+        if time.monotonic() - self._last_prune >= self.prune_interval:
+            self._prune_spilled()
+
+    def _prune_spilled(self):
+        """만료되었거나 개수 제한을 넘은 저장 세션 파일을 삭제합니다. (self._lock 보유 상태에서 호출)"""
+        self._last_prune = time.monotonic()
+        cutoff = time.time() - self.spill_ttl
+        files = []
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            files.append((mtime, path))
+        files.sort()
+        excess = len(files) - self.max_spilled
+        for i, (mtime, path) in enumerate(files):
+            if mtime >= cutoff and i >= excess:
+                break
+            try:
+                os.remove(path)
+                self.stats["pruned"] += 1
+            except OSError:
+                pass
+
+    def prune_spilled(self):
+        """디스크에 저장된 세션 중 spill_ttl이 지났거나 max_spilled개를 넘는 오래된 세션을 삭제합니다."""
+        if not self.spill_dir or not os.path.isdir(self.spill_dir):
+            return
+        with self._lock:
+            self._prune_spilled()
+
+    def drop(self, session_id: str, agent_name: Optional[str] = None):
+        """세션의 에이전트를 메모리와 디스크에서 삭제합니다."""
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == session_id and agent_name in (None, key[1]):
+                    del self._entries[key]
+            if self.spill_dir:
+                for name in self.factories:
+                    if agent_name in (None, name):
+                        path = self._spill_path((session_id, name))
+                        if os.path.exists(path):
+                            os.remove(path)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"active_sessions": len(self._entries), **self.stats}
@@ -1,9 +1,12 @@
 # AgentService: 여러 에이전트 인스턴스를 관리하고, 선택하여 호출하는 관리자/중개자 역할
 # 각 에이전트는 BaseAgent를 상속받아, 실제 처리 로직(process_with_callback 등)을 구현함
-from typing import Dict, Any, Optional, AsyncGenerator, Callable, List
+from typing import Dict, Any, Optional, AsyncGenerator, Callable, Iterator, List
 import sys
 import os
 import asyncio
+import queue
+import threading
+from concurrent.futures import Future
 
 # 프로젝트 루트 디렉토리를 Python 경로에 추가
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -11,16 +14,78 @@ sys.path.insert(0, project_root)
 
 from agents.base_agent import BaseAgent
 from agents.gpt_agent import GPTAgent
+from agents.gear_agent import GearDesignAgent
+from services.agent_pool import AgentPool
+from services.loop_thread import BackgroundLoop
+from utils.tracing import span
+
+_DONE = object()
+
+class ChatStream:
+    """
+    백그라운드 루프에서 실행 중인 응답 스트림
+    - 에이전트 콜백이 넣은 청크를 스레드 안전한 큐로 전달하고, UI 스레드는 이를 순회하며 표시
+    - cancel()로 진행 중인 LLM 요청까지 취소
+    """
+    def __init__(self):
+        self.queue: "queue.Queue[Any]" = queue.Queue()
+        self.future: Optional[Future] = None
+        self.cancelled = False
+
+    def put(self, chunk: str):
+        self.queue.put(chunk)
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            chunk = self.queue.get()
+            if chunk is _DONE:
+                return
+            yield chunk
+
+    def drain(self, timeout: Optional[float] = None) -> Optional[List[str]]:
+        """도착한 청크를 모두 꺼냅니다. (없으면 timeout까지 기다림, 스트림이 끝났으면 None)"""
+        chunks = []
+        try:
+            item = self.queue.get(timeout=timeout)
+            while True:
+                if item is _DONE:
+                    if not chunks:
+                        self.queue.put(_DONE)
+                        return None
+                    self.queue.put(_DONE)  # 남은 청크를 반환한 뒤 다음 호출에서 종료
+                    return chunks
+                chunks.append(item)
+                item = self.queue.get_nowait()
+        except queue.Empty:
+            return chunks
+
+    @property
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def result(self, timeout: Optional[float] = None) -> str:
+        return self.future.result(timeout)
 
 class AgentService:
     """
     역할:
-    - 여러 에이전트 인스턴스(GPT, DeepResearch 등)를 관리
+    - 여러 에이전트(GPT, DeepResearch 등)를 등록하고, 사용자 세션마다 별도의 인스턴스를 AgentPool로 관리
     - 사용자가 선택한 에이전트에 입력과 콜백을 전달하여 실제 처리는 각 에이전트가 담당
     - 에이전트의 행동(응답 생성)은 BaseAgent의 process_with_callback에 위임
     """
     def __init__(self):
-        self.agents: Dict[str, BaseAgent] = {}
+        self.agent_types: Dict[str, Callable[[Dict[str, Any]], BaseAgent]] = {}
+        self.default_configs: Dict[str, Dict[str, Any]] = {}
+        self.pool = AgentPool(self.agent_types, self.default_configs)
+        # 모든 세션의 에이전트 작업을 실행하는 전용 이벤트 루프 (스크립트 재실행과 무관하게 유지)
+        self.loop = BackgroundLoop(name="agent-service")
+        self._streams: Dict[str, ChatStream] = {}
+        self._streams_lock = threading.Lock()
         self._initialize_agents()
         
     def _initialize_agents(self):
@@ -29,41 +94,95 @@ class AgentService:
         # GPT 에이전트 설정
         gpt_config = {
             "model": "gpt-4o-mini",
-            "temperature": 0.7
+            "temperature": 0.7,
+            "memory": {"budget_tokens": 6000, "keep_recent": 4}
+        }
+        self.register_agent("Gear Agent", GPTAgent, gpt_config) 
+
+        # GearDesign MCP 도구를 사용하는 설계 에이전트
+        gear_design_config = {
+            "model": "gpt-4o-mini",
+            "temperature": 0.2,
+            "mcp_server": "GearDesign_agent",
+            "memory": {"budget_tokens": 8000, "keep_recent": 6}
         }
-        self.register_agent("Gear Agent", GPTAgent(gpt_config)) 
+        self.register_agent("Gear Design Agent", GearDesignAgent, gear_design_config)
         
-    def register_agent(self, name: str, agent: BaseAgent):
-        """새로운 에이전트를 등록합니다."""
-        self.agents[name] = agent
+    def register_agent(self, name: str, agent_type: Callable[[Dict[str, Any]], BaseAgent], config: Dict[str, Any]):
+        """새로운 에이전트 종류를 등록합니다. (인스턴스는 세션별로 처음 사용할 때 생성)"""
+        self.agent_types[name] = agent_type
+        self.default_configs[name] = config
         
-    async def process_with_callback(self, agent_name: str, input_text: str, callback: Callable[[str], None]) -> str:
+    async def process_with_callback(self, agent_name: str, input_text: str, callback: Callable[[str], None],
+                                    session_id: str = "default") -> str:
         """
         지정된 에이전트로 입력을 처리하고 콜백으로 결과를 반환합니다.
+        - 세션별 에이전트 인스턴스를 사용하며, 같은 세션의 요청은 순서대로 처리
         - 에이전트의 실제 처리 로직은 BaseAgent의 process_with_callback에 위임
-        - AgentService는 에이전트 선택 및 호출만 담당
         """
-        if agent_name not in self.agents:
+        if agent_name not in self.agent_types:
             error_msg = f"알 수 없는 에이전트 타입: {agent_name}"
             callback(error_msg)
             return error_msg
             
-        try:
-            agent = self.agents[agent_name]
-            return await agent.process_with_callback(input_text, callback)
-        except Exception as e:
-            import traceback
-            error_detail = traceback.format_exc()
-            error_msg = f"에이전트 처리 중 오류 발생: {str(e)}\n{error_detail}"
-            callback(error_msg)
-            return error_msg
+        with span("chat", agent=agent_name, session=session_id) as trace:
+            def run(agent: BaseAgent):
+                # 같은 세션의 이전 요청이 끝나기를 기다린 시간은 agent_start 이벤트로 확인
+                trace.mark("agent_start")
+                return agent.process_with_callback(input_text, callback)
+
+            try:
+                response = await self.pool.run(session_id, agent_name, run)
+                trace.set(chars=len(response or ""))
+                return response
+            except Exception as e:
+                trace.record_exception(e)
+                import traceback
+                error_detail = traceback.format_exc()
+                error_msg = f"에이전트 처리 중 오류 발생: {str(e)}\n{error_detail}"
+                callback(error_msg)
+                return error_msg
                
+    def start_chat(self, agent_name: str, input_text: str, session_id: str = "default") -> ChatStream:
+        """
+        백그라운드 루프에서 응답 생성을 시작하고 즉시 ChatStream을 반환합니다.
+        같은 세션에서 진행 중이던 응답은 취소합니다. (다른 세션의 응답은 동시에 진행)
+        """
+        stream = ChatStream()
+        with self._streams_lock:
+            previous = self._streams.get(session_id)
+            if previous is not None and not previous.done:
+                previous.cancel()
+            self._streams[session_id] = stream
+
+        stream.future = self.loop.submit(self.process_with_callback(agent_name, input_text, stream.put, session_id))
+        # 정상 종료/오류/취소(시작 전 취소 포함) 모두 스트림 종료 표시
+        stream.future.add_done_callback(lambda _: stream.queue.put(_DONE))
+        return stream
+
+    def cancel_chat(self, session_id: str):
+        """세션에서 진행 중인 응답을 취소합니다."""
+        with self._streams_lock:
+            stream = self._streams.get(session_id)
+        if stream is not None and not stream.done:
+            stream.cancel()
+
     def get_available_agents(self) -> list:
         """사용 가능한 에이전트 목록을 반환합니다."""
-        return list(self.agents.keys())
+        return list(self.agent_types.keys())
         
-    def get_agent_config(self, agent_name: str) -> Optional[Dict[str, Any]]:
-        """에이전트의 설정을 반환합니다."""
-        if agent_name in self.agents:
-            return self.agents[agent_name].config
-        return None 
\ No newline at end of file
+    def get_agent_config(self, agent_name: str, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """에이전트의 설정을 반환합니다. (session_id가 없으면 기본 설정)"""
+        if agent_name not in self.agent_types:
+            return None
+        if session_id is None:
+            return self.default_configs[agent_name]
+        return self.pool.get(session_id, agent_name).config
+
+    def update_agent_config(self, agent_name: str, config: Dict[str, Any], session_id: str = "default"):
+        """세션의 에이전트 설정을 업데이트합니다."""
+        self.pool.get(session_id, agent_name).update_config(config)
+
+    def clear_session(self, session_id: str):
+        """세션의 모든 에이전트와 저장된 대화 기록을 삭제합니다."""
+        self.pool.drop(session_id)
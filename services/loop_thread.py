@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Optional
+
+
+class BackgroundLoop:
+    """
+    전용 스레드에서 실행되는 asyncio 이벤트 루프
+    - Streamlit처럼 스크립트가 매번 다시 실행되는 환경에서도 루프를 한 번만 만들고 계속 재사용
+    - 다른 스레드에서 submit()으로 코루틴을 넣고 concurrent.futures.Future로 결과를 받음
+    """
+
+    def __init__(self, name: str = "asyncio-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self.start()
+        return self._loop
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            ready = threading.Event()
+
+            def run():
+                self._loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self._loop)
+                ready.set()
+                self._loop.run_forever()
+                # asyncio.run과 같이 남은 태스크를 취소하고 정리가 끝난 뒤 루프를 닫음
+                # (루프별 리소스가 태스크 취소 시점에 연결을 닫을 수 있도록)
+                loop = self._loop
+                tasks = asyncio.all_tasks(loop)
+                for task in tasks:
+                    task.cancel()
+                if tasks:
+                    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.close()
+
+            self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def submit(self, coro: Awaitable[Any]) -> Future:
+        """코루틴을 루프에서 실행합니다. 반환된 Future를 cancel()하면 루프 안의 작업도 취소됨"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, fn, *args):
+        """루프 스레드에서 fn(*args)를 실행합니다."""
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        with self._lock:
+            if self._loop is None or self._thread is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,344 @@
+import asyncio
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Awaitable, Dict, List, Optional
+
+from services.loop_thread import BackgroundLoop
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG_PATH = os.path.join(project_root, "mcp.json")
+
+
+def load_mcp_config(path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """mcp.json의 서버 실행 설정 전체를 읽습니다."""
+    with open(path or DEFAULT_CONFIG_PATH, "r", encoding="utf-8") as f:
+        return json.load(f).get("mcpServers", {})
+
+
+def load_mcp_server_config(name: str, path: Optional[str] = None) -> Dict[str, Any]:
+    """mcp.json에서 서버 실행 설정을 읽습니다."""
+    return load_mcp_config(path)[name]
+
+
+def to_openai_tools(tools: List[Any]) -> List[Dict[str, Any]]:
+    """MCP 도구 목록을 OpenAI function calling tools 형식으로 변환"""
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description or "",
+                "parameters": tool.inputSchema,
+            },
+        }
+        for tool in tools
+    ]
+
+
+def _is_connection_lost(error: BaseException) -> bool:
+    """서버 프로세스 종료/파이프 끊김으로 인한 오류인지 확인합니다. (도구 자체 오류는 제외)"""
+    import anyio
+    from mcp.shared.exceptions import McpError
+    from mcp.types import CONNECTION_CLOSED
+
+    if isinstance(error, (OSError, EOFError, ConnectionError, anyio.BrokenResourceError,
+                          anyio.ClosedResourceError, anyio.EndOfStream)):
+        return True
+    return isinstance(error, McpError) and error.error.code == CONNECTION_CLOSED
+
+
+async def _call_tool_with_meta(session: Any, tool_name: str, arguments: Dict[str, Any], meta: Dict[str, Any]):
+    """
+    요청 params._meta에 meta를 담아 tools/call을 보냅니다.
+    (mcp 1.13의 ClientSession.call_tool은 meta 인자가 없으므로 요청을 직접 구성)
+    """
+    from mcp import types
+
+    request = types.ClientRequest(
+        types.CallToolRequest(
+            method="tools/call",
+            params=types.CallToolRequestParams(name=tool_name, arguments=arguments, _meta=meta),
+        )
+    )
+    return await session.send_request(request, types.CallToolResult)
+
+
+class MCPConnection:
+    """
+    stdio MCP 서버 연결 1개 (관리자 루프 안에서만 사용)
+    - 감시 태스크가 서버를 실행/초기화하고, 연결된 동안 주기적으로 ping으로 상태를 확인
+    - 서버가 죽거나 ping/도구 호출이 실패하면 지수 backoff로 다시 연결
+    - 도구 목록은 연결할 때 한 번 조회하여 캐시 (재연결 중에도 이전 목록 유지)
+    """
+
+    def __init__(self, name: str, server_config: Dict[str, Any], health_interval: float = 30.0,
+                 ping_timeout: float = 10.0, max_backoff: float = 60.0):
+        self.name = name
+        self.server_config = server_config
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.max_backoff = max_backoff
+        self.session = None
+        self.tools: List[Any] = []
+        self.openai_tools: List[Dict[str, Any]] = []
+        self.state = "idle"
+        self.last_error: Optional[str] = None
+        self.connected_at: Optional[float] = None
+        self.stats = {"connects": 0, "failures": 0, "calls": 0}
+        self._ready = asyncio.Event()
+        self._broken = asyncio.Event()
+        self._closed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _serve_once(self):
+        """서버 1회 실행: 초기화 후 닫히거나 끊어질 때까지 상태를 확인"""
+        from mcp import ClientSession, StdioServerParameters
+        from mcp.client.stdio import stdio_client
+
+        params = StdioServerParameters(
+            command=self.server_config["command"],
+            args=self.server_config.get("args", []),
+            env=self.server_config.get("env"),
+        )
+        async with stdio_client(params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                listed = await session.list_tools()
+                self.tools = list(listed.tools)
+                self.openai_tools = to_openai_tools(self.tools)
+                self.session = session
+                self.state = "connected"
+                self.connected_at = time.time()
+                self.last_error = None
+                self.stats["connects"] += 1
+                self._broken.clear()
+                self._ready.set()
+                try:
+                    while not self._closed.is_set():
+                        waiters = [asyncio.ensure_future(self._closed.wait()),
+                                   asyncio.ensure_future(self._broken.wait())]
+                        done, pending = await asyncio.wait(waiters, timeout=self.health_interval,
+                                                           return_when=asyncio.FIRST_COMPLETED)
+                        for waiter in pending:
+                            waiter.cancel()
+                        if self._closed.is_set():
+                            return
+                        if self._broken.is_set():
+                            raise ConnectionError(self.last_error or "도구 호출 중 연결이 끊어졌습니다.")
+                        await asyncio.wait_for(session.send_ping(), self.ping_timeout)
+                finally:
+                    self._ready.clear()
+                    self.session = None
+
+    async def _supervise(self):
+        backoff = 1.0
+        while not self._closed.is_set():
+            self.state = "connecting"
+            started = time.monotonic()
+            try:
+                await self._serve_once()
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                self.stats["failures"] += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"[mcp] {self.name} 연결 실패: {self.last_error}", file=sys.stderr)
+            if self._closed.is_set():
+                break
+            # 한동안 정상 동작했던 연결이 끊긴 경우는 backoff를 처음부터 다시 시작
+            if time.monotonic() - started > self.max_backoff:
+                backoff = 1.0
+            self.state = "reconnecting"
+            try:
+                await asyncio.wait_for(self._closed.wait(), backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, self.max_backoff)
+        self.state = "closed"
+
+    async def connect(self, timeout: float = 30.0) -> "MCPConnection":
+        """연결되어 있지 않으면 서버를 실행하고 초기화될 때까지 기다립니다."""
+        if self._task is None or self._task.done():
+            self._closed.clear()
+            self._task = asyncio.get_running_loop().create_task(self._supervise())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"MCP 서버 '{self.name}'에 연결하지 못했습니다: {self.last_error}")
+        return self
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], client_id: Optional[str] = None,
+                        trace: Optional[Dict[str, str]] = None):
+        """
+        도구를 호출하고 CallToolResult를 반환합니다.
+        - client_id: 서버에서 세션별 설계 상태를 구분하는 데 사용
+        - trace: 서버 쪽 구간을 호출한 쪽 trace에 연결하기 위한 컨텍스트
+        """
+        await self.connect()
+        session = self.session
+        meta = {}
+        if client_id:
+            meta["client_id"] = client_id
+        if trace:
+            meta["trace"] = trace
+        self.stats["calls"] += 1
+        try:
+            if not meta:
+                return await session.call_tool(tool_name, arguments)
+            return await _call_tool_with_meta(session, tool_name, arguments, meta)
+        except Exception as e:
+            # 서버 프로세스/파이프 문제는 재연결 대상
+            if _is_connection_lost(e):
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._broken.set()
+            raise
+
+    async def list_prompts(self):
+        await self.connect()
+        return await self.session.list_prompts()
+
+    async def get_prompt(self, prompt_name: str, arguments: Optional[Dict[str, Any]] = None):
+        await self.connect()
+        return await self.session.get_prompt(prompt_name, arguments)
+
+    async def close(self):
+        self._closed.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "tools": len(self.tools),
+            "connected_at": self.connected_at,
+            "last_error": self.last_error,
+            **self.stats,
+        }
+
+
+class MCPConnectionManager:
+    """
+    프로세스 전체에서 공유하는 MCP 서버 연결 관리자
+    - mcp.json의 서버는 처음 사용할 때 한 번만 실행하고, 이후 모든 세션/스크립트 재실행에서 재사용
+    - MCP 세션은 자신을 연 이벤트 루프에 묶이므로 연결은 전용 루프 스레드에서만 다루고,
+      다른 루프(Streamlit의 asyncio.run, AgentService 루프 등)에서의 호출은 그 루프로 전달
+    - 프로세스 종료 시 shutdown()으로 모든 서버를 정리
+    """
+
+    def __init__(self, config_path: Optional[str] = None, health_interval: float = 30.0,
+                 connect_timeout: float = 30.0, max_backoff: float = 60.0):
+        self.config_path = config_path
+        self.health_interval = health_interval
+        self.connect_timeout = connect_timeout
+        self.max_backoff = max_backoff
+        self.loop = BackgroundLoop(name="mcp-manager")
+        self._config: Optional[Dict[str, Dict[str, Any]]] = None
+        self._connections: Dict[str, MCPConnection] = {}
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    @property
+    def config(self) -> Dict[str, Dict[str, Any]]:
+        if self._config is None:
+            self._config = load_mcp_config(self.config_path)
+        return self._config
+
+    def server_names(self) -> List[str]:
+        return list(self.config)
+
+    def _connection(self, name: str) -> MCPConnection:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("MCP 연결 관리자가 종료되었습니다.")
+            if name not in self._connections:
+                self._connections[name] = MCPConnection(
+                    name, self.config[name], health_interval=self.health_interval,
+                    max_backoff=self.max_backoff,
+                )
+            return self._connections[name]
+
+    async def _on_loop(self, coro: Awaitable[Any]) -> Any:
+        """관리자 루프에서 coro를 실행하고 결과를 현재 루프에서 기다립니다."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop.loop:
+            return await coro
+        return await asyncio.wrap_future(self.loop.submit(coro))
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """동기 코드에서 관리자 루프의 코루틴 결과를 기다립니다."""
+        return self.loop.submit(coro).result(timeout)
+
+    async def connect(self, name: str) -> MCPConnection:
+        connection = self._connection(name)
+        return await self._on_loop(connection.connect(self.connect_timeout))
+
+    async def list_tools(self, name: str) -> List[Any]:
+        """MCP 도구 목록 (연결 시 캐시한 값)"""
+        return (await self.connect(name)).tools
+
+    async def openai_tools(self, name: str) -> List[Dict[str, Any]]:
+        """OpenAI function calling 형식의 도구 목록 (연결 시 캐시한 값)"""
+        return (await self.connect(name)).openai_tools
+
+    async def call_tool(self, name: str, tool_name: str, arguments: Dict[str, Any],
+                        client_id: Optional[str] = None, trace: Optional[Dict[str, str]] = None):
+        connection = self._connection(name)
+        return await self._on_loop(connection.call_tool(tool_name, arguments, client_id, trace))
+
+    async def list_prompts(self, name: str):
+        connection = self._connection(name)
+        return await self._on_loop(connection.list_prompts())
+
+    async def get_prompt(self, name: str, prompt_name: str, arguments: Optional[Dict[str, Any]] = None):
+        connection = self._connection(name)
+        return await self._on_loop(connection.get_prompt(prompt_name, arguments))
+
+    def warm_up(self, names: Optional[List[str]] = None):
+        """서버들을 미리 실행합니다. (결과를 기다리지 않음)"""
+        for name in names or self.server_names():
+            self.loop.submit(self._connection(name).connect(self.connect_timeout))
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: connection.status() for name, connection in self._connections.items()}
+
+    def shutdown(self, timeout: float = 10.0):
+        """모든 서버 연결을 닫고 루프 스레드를 종료합니다."""
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            connections = list(self._connections.values())
+        if connections:
+            async def close_all():
+                await asyncio.gather(*(c.close() for c in connections), return_exceptions=True)
+            try:
+                self.run(close_all(), timeout)
+            except Exception as e:
+                print(f"[mcp] 연결 종료 중 오류: {e}", file=sys.stderr)
+        self.loop.stop()
+
+
+_manager: Optional[MCPConnectionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_mcp_manager() -> MCPConnectionManager:
+    """프로세스 공용 MCP 연결 관리자 (종료 시 자동 정리)"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = MCPConnectionManager(
+                config_path=os.getenv("MCP_CONFIG_PATH") or None,
+                health_interval=float(os.getenv("MCP_HEALTH_INTERVAL", "30")),
+            )
+            atexit.register(_manager.shutdown)
+        return _manager
@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# 프로젝트 루트의 .cache 디렉토리에 저장 (TRANSCRIPT_DB_PATH로 변경 가능)
+DEFAULT_TRANSCRIPT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "transcripts.sqlite3"
+)
+
+
+class TranscriptStore:
+    """
+    세션별 대화 기록 저장소 (SQLite)
+    - 메시지는 추가만 하고, 화면에는 최근 메시지부터 페이지 단위로 읽음
+    - (session_id, id) 인덱스로 조회하므로 대화가 길어져도 한 페이지 조회 비용은 일정
+    """
+
+    def __init__(self, path: str = DEFAULT_TRANSCRIPT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created REAL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id)")
+        self._conn.commit()
+
+    def append(self, session_id: str, role: str, content: str) -> int:
+        """메시지를 저장하고 메시지 ID를 반환합니다."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO messages (session_id, role, content, created) VALUES (?, ?, ?, ?)",
+                (session_id, role, content, time.time()),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def page(self, session_id: str, limit: int = 20, before_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """before_id 이전(없으면 가장 최근)의 메시지 limit개를 시간 순서로 반환합니다."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, role, content FROM messages WHERE session_id = ? AND id < ? "
+                "ORDER BY id DESC LIMIT ?",
+                (session_id, before_id if before_id is not None else 2 ** 63 - 1, limit),
+            ).fetchall()
+        return [{"id": row[0], "role": row[1], "content": row[2]} for row in reversed(rows)]
+
+    def has_before(self, session_id: str, message_id: int) -> bool:
+        """message_id 이전 메시지가 있는지 확인합니다."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM messages WHERE session_id = ? AND id < ? LIMIT 1", (session_id, message_id)
+            ).fetchone()
+        return row is not None
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+    def clear(self, session_id: str):
+        """세션의 대화 기록을 삭제합니다."""
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[TranscriptStore] = None
+_store_lock = threading.Lock()
+
+
+def get_transcript_store() -> TranscriptStore:
+    """프로세스 공용 대화 기록 저장소"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TranscriptStore(os.getenv("TRANSCRIPT_DB_PATH") or DEFAULT_TRANSCRIPT_PATH)
+        return _store
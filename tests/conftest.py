@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# 프로젝트 루트 디렉토리를 Python 경로에 추가
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from utils import llm_cache, llm_executor, providers, tracing
+
+
+@pytest.fixture(autouse=True)
+def isolated_globals(monkeypatch, tmp_path):
+    """프로세스 공용 객체(실행기, 라우터, 캐시, trace exporter)를 테스트마다 새로 만들고 .cache에 기록하지 않음"""
+    tracing.set_exporter(None)
+    # 재시도 대기 없이 바로 다시 시도 (테스트 시간 단축)
+    monkeypatch.setattr(llm_executor, "_executor", llm_executor.LLMExecutor(base_delay=0.0, max_delay=0.0))
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite3"))
+    monkeypatch.delenv("LLM_CACHE_DISABLED", raising=False)
+    monkeypatch.delenv("LLM_CACHE_SEMANTIC", raising=False)
+    yield
+    providers.set_provider_router(None)
@@ -0,0 +1,130 @@
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from utils.providers import Provider
+
+
+class FakeProviderError(Exception):
+    """FakeProvider가 일부러 발생시키는 오류 (5xx로 취급되어 재시도/전환 대상)"""
+    status_code = 500
+
+
+def _completion(text: str, model: str):
+    from openai.types.chat import ChatCompletion
+
+    return ChatCompletion.model_validate({
+        "id": f"fake-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+    })
+
+
+def _chunk(text: Optional[str], model: str, finish_reason: Optional[str] = None):
+    from openai.types.chat import ChatCompletionChunk
+
+    return ChatCompletionChunk.model_validate({
+        "id": "fake-chunk",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": text} if text else {}, "finish_reason": finish_reason}],
+    })
+
+
+class FakeProvider(Provider):
+    """
+    테스트용 로컬 공급자 (네트워크 없이 지연 시간과 오류를 흉내냄)
+    - latency: 전체 응답 시간(초) 또는 model -> 초 함수
+    - ttft: 스트리밍 첫 청크까지 시간 (None이면 latency의 1/4)
+    - error_rate: 요청 실패 확률, reply: messages -> 응답 문자열
+    """
+
+    def __init__(
+        self,
+        name: str = "fake",
+        latency: Union[float, Callable[[str], float]] = 0.05,
+        ttft: Optional[Union[float, Callable[[str], float]]] = None,
+        error_rate: float = 0.0,
+        reply: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+        capabilities: Iterable[str] = ("stream", "tools", "json_schema"),
+        chunk_size: int = 8,
+        seed: Optional[int] = None,
+    ):
+        self.name = name
+        self.latency = latency
+        self.ttft = ttft
+        self.error_rate = error_rate
+        self.reply = reply
+        self.capabilities = set(capabilities)
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def _seconds(self, value, model: str) -> float:
+        return value(model) if callable(value) else value
+
+    def _timing(self, model: str) -> Tuple[float, float]:
+        total = self._seconds(self.latency, model)
+        first = self._seconds(self.ttft, model) if self.ttft is not None else total / 4
+        return total, min(first, total)
+
+    def _start(self):
+        self.calls += 1
+        if self._random.random() < self.error_rate:
+            raise FakeProviderError(f"{self.name}: 임의 오류")
+
+    def _text(self, messages: List[Dict[str, Any]]) -> str:
+        if self.reply is not None:
+            return self.reply(messages)
+        return f"[{self.name}] {messages[-1].get('content', '') if messages else ''}"
+
+    def _pieces(self, text: str) -> List[str]:
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or [""]
+
+    async def complete(self, model, messages, temperature, **options):
+        total, _ = self._timing(model)
+        await asyncio.sleep(total)
+        self._start()
+        return _completion(self._text(messages), model)
+
+    async def stream(self, model, messages, temperature, **options):
+        total, first = self._timing(model)
+        self._start()
+        pieces = self._pieces(self._text(messages))
+        gap = (total - first) / max(1, len(pieces))
+
+        async def chunks():
+            await asyncio.sleep(first)
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(gap)
+                yield _chunk(piece, model)
+            yield _chunk(None, model, "stop")
+
+        return chunks()
+
+    def complete_sync(self, model, messages, temperature, **options):
+        total, _ = self._timing(model)
+        time.sleep(total)
+        self._start()
+        return _completion(self._text(messages), model)
+
+    def stream_sync(self, model, messages, temperature, **options):
+        total, first = self._timing(model)
+        self._start()
+        pieces = self._pieces(self._text(messages))
+        gap = (total - first) / max(1, len(pieces))
+
+        def chunks():
+            time.sleep(first)
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(gap)
+                yield _chunk(piece, model)
+            yield _chunk(None, model, "stop")
+
+        return chunks()
@@ -0,0 +1,111 @@
+import json
+import os
+from collections import Counter
+
+import pytest
+
+from utils.llm_batch import BatchJob, LocalBatchBackend
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class Interrupted(Exception):
+    """polling 도중 프로세스가 중단된 상황"""
+
+
+class RecordingBackend(LocalBatchBackend):
+    """제출 횟수를 기록하고, interrupt_polls번째 상태 조회까지는 중단을 흉내내는 로컬 백엔드"""
+
+    def __init__(self, call_fn, interrupt_polls: int = 0):
+        super().__init__(call_fn, max_workers=2)
+        self.submitted = []
+        self.interrupt_polls = interrupt_polls
+
+    def submit(self, input_path: str) -> str:
+        with open(input_path, "r", encoding="utf-8") as f:
+            self.submitted.append([json.loads(line)["custom_id"] for line in f])
+        return super().submit(input_path)
+
+    def status(self, batch_id: str) -> str:
+        if self.interrupt_polls:
+            self.interrupt_polls -= 1
+            raise Interrupted()
+        return super().status(batch_id)
+
+
+def make_job(tmp_path, backend, **kwargs) -> BatchJob:
+    return BatchJob("test", backend=backend, directory=str(tmp_path / "test"), poll_interval=0, **kwargs)
+
+
+def add_requests(job: BatchJob, *custom_ids: str):
+    for custom_id in custom_ids:
+        job.add(custom_id, [{"role": "user", "content": custom_id}])
+
+
+def test_run_resumes_active_batch_from_checkpoint(tmp_path):
+    calls = Counter()
+
+    def call_fn(body):
+        calls[body["messages"][0]["content"]] += 1
+        return body["messages"][0]["content"].upper()
+
+    backend = RecordingBackend(call_fn, interrupt_polls=1)
+    job = make_job(tmp_path, backend)
+    add_requests(job, "a", "b")
+    with pytest.raises(Interrupted):
+        job.run()
+    assert job.state["active_batch"] is not None
+
+    # 새 프로세스: 저장된 요청/상태를 읽고 진행 중이던 배치를 재제출하지 않고 결과만 수집
+    resumed = make_job(tmp_path, backend)
+    assert list(resumed.requests) == ["a", "b"]
+    assert resumed.run() == {"a": "A", "b": "B"}
+    assert backend.submitted == [["a", "b"]]
+    assert calls == {"a": 1, "b": 1}
+
+    # 완료된 작업을 다시 실행해도 제출하지 않음
+    assert make_job(tmp_path, backend).run() == {"a": "A", "b": "B"}
+    assert len(backend.submitted) == 1
+
+
+def test_only_retryable_failures_are_resubmitted(tmp_path):
+    calls = Counter()
+
+    def call_fn(body):
+        custom_id = body["messages"][0]["content"]
+        calls[custom_id] += 1
+        if custom_id == "rate_limited" and calls[custom_id] == 1:
+            raise StatusError(429)
+        if custom_id == "bad_request":
+            raise StatusError(400)
+        return f"ok:{custom_id}"
+
+    backend = RecordingBackend(call_fn)
+    job = make_job(tmp_path, backend)
+    add_requests(job, "ok", "rate_limited", "bad_request")
+
+    results = job.run()
+
+    assert results == {"ok": "ok:ok", "rate_limited": "ok:rate_limited", "bad_request": None}
+    assert backend.submitted == [["ok", "rate_limited", "bad_request"], ["rate_limited"]]
+    assert job.state["failed"]["bad_request"]["permanent"]
+    assert "rate_limited" not in job.state["failed"]
+    assert os.path.exists(os.path.join(job.directory, "input_2.jsonl"))
+
+
+def test_retries_stop_at_max_attempts(tmp_path):
+    def call_fn(body):
+        raise StatusError(503)
+
+    backend = RecordingBackend(call_fn)
+    job = make_job(tmp_path, backend, max_attempts=2)
+    add_requests(job, "flaky")
+
+    assert job.run() == {"flaky": None}
+    assert backend.submitted == [["flaky"], ["flaky"]]
+    assert job.state["attempts"]["flaky"] == 2
+    assert job.pending() == []
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from utils.llm import llm_call, llm_call_async
+from utils.llm_cache import LLMCache
+from utils.providers import ProviderRouter, set_provider_router
+from tests.fakes import FakeProvider
+
+MESSAGES = [{"role": "system", "content": "설계 도우미"}, {"role": "user", "content": "모듈을 2로 바꿔줘"}]
+
+
+def make_cache(tmp_path, **kwargs) -> LLMCache:
+    return LLMCache(path=str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_exact_hit_requires_same_request(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("completion", "gpt-4o-mini", 0, MESSAGES, {"answer": 1})
+
+    assert cache.get("completion", "gpt-4o-mini", 0, MESSAGES) == {"answer": 1}
+    assert cache.get("completion", "gpt-4o-mini", 0.7, MESSAGES) is None
+    assert cache.get("completion", "gpt-4o", 0, MESSAGES) is None
+    assert cache.get("stream", "gpt-4o-mini", 0, MESSAGES) is None
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 3
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    cache = make_cache(tmp_path, ttl=0.05)
+    cache.set("completion", "gpt-4o-mini", 0, MESSAGES, "응답")
+    assert cache.get("completion", "gpt-4o-mini", 0, MESSAGES) == "응답"
+
+    time.sleep(0.1)
+    assert cache.get("completion", "gpt-4o-mini", 0, MESSAGES) is None
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    first = [{"role": "user", "content": "first"}]
+    second = [{"role": "user", "content": "second"}]
+    third = [{"role": "user", "content": "third"}]
+    cache.set("completion", "m", 0, first, 1)
+    time.sleep(0.01)
+    cache.set("completion", "m", 0, second, 2)
+    time.sleep(0.01)
+    # first를 다시 사용했으므로 가장 오래 사용되지 않은 항목은 second
+    assert cache.get("completion", "m", 0, first) == 1
+    time.sleep(0.01)
+    cache.set("completion", "m", 0, third, 3)
+
+    assert cache.get("completion", "m", 0, first) == 1
+    assert cache.get("completion", "m", 0, second) is None
+    assert cache.get("completion", "m", 0, third) == 3
+
+
+def test_entries_over_byte_limit_are_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=150)
+    old = [{"role": "user", "content": "old"}]
+    new = [{"role": "user", "content": "new"}]
+    cache.set("completion", "m", 0, old, "x" * 100)
+    time.sleep(0.01)
+    cache.set("completion", "m", 0, new, "y" * 100)
+
+    assert cache.get("completion", "m", 0, old) is None
+    assert cache.get("completion", "m", 0, new) == "y" * 100
+
+
+def test_semantic_hit_within_same_context(tmp_path):
+    vectors = {"모듈을 2로 바꿔줘": [1.0, 0.0], "모듈 2로 변경": [0.99, 0.05], "잇수를 늘려줘": [0.0, 1.0]}
+    cache = make_cache(tmp_path, embed_fn=vectors.__getitem__, similarity_threshold=0.97)
+    cache.set("completion", "m", 0, MESSAGES, "변경함")
+
+    similar = MESSAGES[:-1] + [{"role": "user", "content": "모듈 2로 변경"}]
+    different = MESSAGES[:-1] + [{"role": "user", "content": "잇수를 늘려줘"}]
+    other_context = [{"role": "user", "content": "모듈 2로 변경"}]
+    assert cache.get("completion", "m", 0, similar) == "변경함"
+    assert cache.get("completion", "m", 0, different) is None
+    assert cache.get("completion", "m", 0, other_context) is None
+    assert cache.stats["semantic_hits"] == 1
+
+
+def use_fake_openai(**kwargs) -> FakeProvider:
+    provider = FakeProvider("openai", latency=0.01, chunk_size=3, **kwargs)
+    set_provider_router(ProviderRouter([provider], explore=0.0))
+    return provider
+
+
+async def stream_text(**kwargs) -> str:
+    text = ""
+    async for chunk in llm_call_async(MESSAGES, temperature=0, stream=True, **kwargs):
+        if chunk.choices and chunk.choices[0].delta.content:
+            text += chunk.choices[0].delta.content
+    return text
+
+
+def test_stream_is_replayed_from_cache():
+    provider = use_fake_openai()
+
+    first = asyncio.run(stream_text())
+    second = asyncio.run(stream_text())
+
+    assert first == second == "[openai] 모듈을 2로 바꿔줘"
+    assert provider.calls == 1
+
+
+def test_cache_is_skipped_for_sampled_calls():
+    provider = use_fake_openai()
+
+    llm_call(MESSAGES, temperature=0.7)
+    llm_call(MESSAGES, temperature=0.7)
+    assert provider.calls == 2
+
+    assert llm_call(MESSAGES, temperature=0) == llm_call(MESSAGES, temperature=0)
+    assert provider.calls == 3
@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.providers import Candidate, ProviderRouter
+from tests.fakes import FakeProvider, FakeProviderError
+
+PRIMARY = Candidate("primary", "model-a")
+BACKUP = Candidate("backup", "model-b")
+MESSAGES = [{"role": "user", "content": "안녕"}]
+
+
+def make_router(primary: FakeProvider, backup: FakeProvider, **kwargs) -> ProviderRouter:
+    kwargs.setdefault("explore", 0.0)
+    return ProviderRouter([primary, backup], routes={"model": [PRIMARY, BACKUP]}, **kwargs)
+
+
+async def collect(stream) -> str:
+    text = ""
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            text += chunk.choices[0].delta.content
+    return text
+
+
+def test_complete_fails_over_to_next_candidate():
+    primary = FakeProvider("primary", latency=0.01, error_rate=1.0)
+    backup = FakeProvider("backup", latency=0.01)
+    router = make_router(primary, backup)
+    served = []
+
+    result = asyncio.run(router.complete("model", MESSAGES, on_route=served.append))
+
+    assert result.choices[0].message.content == "[backup] 안녕"
+    assert served == [BACKUP]
+    assert primary.calls == 1
+    assert router.stats()["failovers"] == 1
+    assert router.stats()["routes"]["primary:model-a"]["error_rate"] > 0
+
+
+def test_last_candidate_error_is_raised():
+    primary = FakeProvider("primary", latency=0.0, error_rate=1.0)
+    backup = FakeProvider("backup", latency=0.0, error_rate=1.0)
+    router = make_router(primary, backup)
+
+    with pytest.raises(FakeProviderError):
+        asyncio.run(router.complete("model", MESSAGES))
+
+
+def test_stream_fails_over_before_first_chunk():
+    primary = FakeProvider("primary", latency=0.01, error_rate=1.0)
+    backup = FakeProvider("backup", latency=0.01, chunk_size=2)
+    router = make_router(primary, backup)
+
+    text = asyncio.run(collect(router.stream("model", MESSAGES)))
+
+    assert text == "[backup] 안녕"
+    assert router.stats()["routes"]["backup:model-b"]["stream_samples"] == 1
+
+
+def test_complete_sync_fails_over():
+    primary = FakeProvider("primary", latency=0.0, error_rate=1.0)
+    backup = FakeProvider("backup", latency=0.0)
+    router = make_router(primary, backup)
+
+    result = router.complete_sync("model", MESSAGES)
+
+    assert result.choices[0].message.content == "[backup] 안녕"
+    assert router.stats()["failovers"] == 1
+
+
+def test_failing_candidate_cools_down_then_recovers():
+    primary = FakeProvider("primary", latency=0.0, error_rate=1.0)
+    backup = FakeProvider("backup", latency=0.0)
+    router = make_router(primary, backup, failure_threshold=2, cooldown=0.2)
+
+    # 첫 요청은 primary 실패 -> backup, 이후에는 실패만 한 primary가 뒤로 밀리므로 실패 기록을 직접 추가
+    asyncio.run(router.complete("model", MESSAGES))
+    router.record(PRIMARY, None, False)
+    assert router.stats()["routes"]["primary:model-a"]["cooling_down"]
+    assert router.candidates("model") == [BACKUP, PRIMARY]
+
+    # cooldown 동안에는 primary를 시도하지 않음
+    asyncio.run(router.complete("model", MESSAGES))
+    assert primary.calls == 1
+
+    # cooldown이 끝나면 다시 후보로 사용
+    time.sleep(0.25)
+    assert not router.stats()["routes"]["primary:model-a"]["cooling_down"]
+    primary.error_rate, backup.error_rate = 0.0, 1.0
+    result = asyncio.run(router.complete("model", MESSAGES))
+    assert result.choices[0].message.content == "[primary] 안녕"
+
+
+def test_candidates_skip_providers_without_required_capability():
+    primary = FakeProvider("primary", capabilities=("stream",))
+    backup = FakeProvider("backup")
+    router = make_router(primary, backup)
+
+    assert router.candidates("model", {"tools"}) == [BACKUP]
+    with pytest.raises(RuntimeError):
+        router.candidates("model", {"vision"})
+
+
+def test_slow_primary_is_hedged_with_next_candidate():
+    primary = FakeProvider("primary", latency=2.0)
+    backup = FakeProvider("backup", latency=0.01)
+    router = make_router(primary, backup, hedge_factor=2.0, hedge_min=0.05)
+    # 평소 지연: primary 10ms, backup 20ms -> primary를 먼저 시도하고 50ms 뒤 backup으로 hedge
+    router.record(PRIMARY, 0.01, True)
+    router.record(BACKUP, 0.02, True)
+
+    start = time.perf_counter()
+    result = asyncio.run(router.complete("model", MESSAGES))
+    elapsed = time.perf_counter() - start
+
+    assert result.choices[0].message.content == "[backup] 안녕"
+    assert elapsed < 1.0
+    stats = router.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    # 취소된 primary의 지연도 통계에 반영되어 다음에는 backup이 먼저
+    assert router.candidates("model")[0] == BACKUP
+
+
+def test_hedge_disabled_waits_for_primary():
+    primary = FakeProvider("primary", latency=0.2)
+    backup = FakeProvider("backup", latency=0.01)
+    router = make_router(primary, backup, hedge_min=0.01)
+    router.record(PRIMARY, 0.01, True)
+    router.record(BACKUP, 0.02, True)
+
+    result = asyncio.run(router.complete("model", MESSAGES, hedge=False))
+
+    assert result.choices[0].message.content == "[primary] 안녕"
+    assert backup.calls == 0
@@ -1,3 +1,4 @@
 from .llm import llm_call, llm_call_async, JSON_llm, remove_code_block_llm
+from .gear_index import GearKeyIndex
 
-__all__ = ['llm_call', 'llm_call_async', 'JSON_llm', 'remove_code_block_llm'] 
\ No newline at end of file
+__all__ = ['llm_call', 'llm_call_async', 'JSON_llm', 'remove_code_block_llm', 'GearKeyIndex']
@@ -0,0 +1,63 @@
+import re
+import uuid
+from typing import Any, Dict, List, Optional
+
+import streamlit as st
+
+_CODE_BLOCK = re.compile(r"(```.*?(?:```|$)|`[^`\n]*`)", re.DOTALL)
+_BLOCK_MATH = re.compile(r"\\\[(.+?)\\\]", re.DOTALL)
+_INLINE_MATH = re.compile(r"\\\((.+?)\\\)", re.DOTALL)
+
+
+@st.cache_data(max_entries=5000, show_spinner=False)
+def prepare_markdown(content: str) -> str:
+    """
+    지난 메시지의 표시용 markdown (내용별로 캐시)
+    - 모델이 자주 쓰는 \\[ \\], \\( \\) 수식 구분자를 Streamlit이 인식하는 $$, $로 변환
+    - 코드 블럭/인라인 코드 안은 변환하지 않음
+    """
+    parts = _CODE_BLOCK.split(content)
+    for i in range(0, len(parts), 2):
+        text = _BLOCK_MATH.sub(lambda m: f"$$\n{m.group(1).strip()}\n$$", parts[i])
+        parts[i] = _INLINE_MATH.sub(lambda m: f"${m.group(1).strip()}$", text)
+    return "".join(parts)
+
+
+def get_session_id(param: str = "sid") -> str:
+    """
+    브라우저 세션 ID
+    - URL query parameter에 저장하여 새로고침해도 같은 대화 기록을 이어서 표시
+    """
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = st.query_params.get(param) or uuid.uuid4().hex
+    if st.query_params.get(param) != st.session_state.session_id:
+        st.query_params[param] = st.session_state.session_id
+    return st.session_state.session_id
+
+
+def _load_more(pages_key: str):
+    st.session_state[pages_key] = st.session_state.get(pages_key, 1) + 1
+
+
+@st.fragment
+def render_history(store: Any, session_id: str, page_size: int = 20, key: str = "history",
+                   intro: Optional[List[Dict[str, str]]] = None):
+    """
+    저장된 대화 기록 중 최근 page_size개만 표시하고, 이전 메시지는 버튼으로 한 페이지씩 추가로 불러옴
+    - fragment로 실행되므로 "이전 메시지 더 보기"는 기록 영역만 다시 그림
+    - intro: 대화의 처음에 항상 표시할 메시지 (예: 인사말). 가장 오래된 메시지까지 불러왔을 때만 표시
+    """
+    pages_key = f"{key}_pages"
+    pages = st.session_state.get(pages_key, 1)
+    messages = store.page(session_id, limit=page_size * pages)
+
+    if messages and store.has_before(session_id, messages[0]["id"]):
+        st.button("이전 메시지 더 보기", key=f"{key}_more", on_click=_load_more, args=(pages_key,))
+    else:
+        messages = list(intro or []) + messages
+
+    for message in messages:
+        if message["role"] == "system":
+            continue
+        with st.chat_message(message["role"]):
+            st.markdown(prepare_markdown(message["content"]))
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+# 모델별 연결 풀/타임아웃 설정 (LLM_CLIENT_POOLS 환경 변수(JSON)로 덮어쓰기 가능)
+# 같은 설정을 쓰는 모델은 같은 풀을 공유
+DEFAULT_POOLS: Dict[str, Dict[str, float]] = {
+    "gpt-4o": {"timeout": 120.0},
+    "default": {
+        "max_connections": 50,
+        "max_keepalive_connections": 20,
+        "keepalive_expiry": 60.0,
+        "connect_timeout": 5.0,
+        "timeout": 60.0,
+    },
+}
+
+# OpenAI 호환 API를 제공하는 공급자별 접속 정보 (클라이언트는 모두 openai SDK 사용)
+PROVIDER_ENDPOINTS: Dict[str, Dict[str, Optional[str]]] = {
+    "openai": {"api_key_env": "OPENAI_API_KEY", "base_url": None},
+    "anthropic": {"api_key_env": "ANTHROPIC_API_KEY", "base_url": "https://api.anthropic.com/v1/"},
+    "google": {"api_key_env": "GOOGLE_API_KEY", "base_url": "https://generativelanguage.googleapis.com/v1beta/openai/"},
+}
+
+_env_loaded = False
+_lock = threading.Lock()
+_pools: Optional[Dict[str, Dict[str, float]]] = None
+# 클라이언트 키: (공급자, 풀 설정 이름)
+_sync_clients: Dict[Tuple[str, str], Any] = {}
+# 이벤트 루프마다 별도의 비동기 클라이언트 (연결이 생성된 루프 밖에서 재사용되면 오류 발생)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], Any]]" = weakref.WeakKeyDictionary()
+# 루프가 종료될 때 그 루프의 클라이언트를 닫는 태스크
+_closers: Dict[asyncio.AbstractEventLoop, "asyncio.Task"] = {}
+
+
+def load_env():
+    """.env를 최초 1회만 읽습니다."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _env_loaded = True
+
+
+def _pool_settings() -> Dict[str, Dict[str, float]]:
+    global _pools
+    if _pools is None:
+        pools = {name: dict(settings) for name, settings in DEFAULT_POOLS.items()}
+        override = os.getenv("LLM_CLIENT_POOLS")
+        if override:
+            for name, settings in json.loads(override).items():
+                pools.setdefault(name, {}).update(settings)
+        _pools = pools
+    return _pools
+
+
+def configure_pool(model: str, **settings: float):
+    """모델별 풀 설정을 변경합니다. (이후 새로 만드는 클라이언트부터 적용)"""
+    with _lock:
+        pools = _pool_settings()
+        pools.setdefault(model, {}).update(settings)
+        for clients in [_sync_clients, *_async_clients.values()]:
+            for key in [key for key in clients if key[1] == model]:
+                del clients[key]
+
+
+def _profile(model: Optional[str]) -> str:
+    return model if model in _pool_settings() else "default"
+
+
+def _client_kwargs(profile: str) -> Dict[str, Any]:
+    import httpx
+
+    settings = {**_pool_settings()["default"], **_pool_settings().get(profile, {})}
+    return {
+        "limits": httpx.Limits(
+            max_connections=int(settings["max_connections"]),
+            max_keepalive_connections=int(settings["max_keepalive_connections"]),
+            keepalive_expiry=settings["keepalive_expiry"],
+        ),
+        "timeout": httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"]),
+    }
+
+
+def provider_api_key(provider: str) -> Optional[str]:
+    """공급자 API 키 (환경 변수/.env). 없으면 None"""
+    load_env()
+    return os.getenv(PROVIDER_ENDPOINTS[provider]["api_key_env"])
+
+
+def _endpoint_kwargs(provider: str) -> Dict[str, Any]:
+    endpoint = PROVIDER_ENDPOINTS[provider]
+    kwargs: Dict[str, Any] = {"api_key": os.getenv(endpoint["api_key_env"])}
+    if endpoint["base_url"]:
+        kwargs["base_url"] = endpoint["base_url"]
+    return kwargs
+
+
+def get_sync_client(model: Optional[str] = None, provider: str = "openai"):
+    """프로세스 공용 동기 클라이언트 (공급자/모델 설정별 keep-alive 연결 풀)"""
+    key = (provider, _profile(model))
+    client = _sync_clients.get(key)
+    if client is not None:
+        return client
+    load_env()
+    with _lock:
+        if key not in _sync_clients:
+            import httpx
+            from openai import OpenAI
+
+            # 재시도는 LLMExecutor가 담당하므로 클라이언트 자체 재시도는 끔
+            _sync_clients[key] = OpenAI(
+                **_endpoint_kwargs(provider),
+                max_retries=0,
+                http_client=httpx.Client(**_client_kwargs(key[1])),
+            )
+        return _sync_clients[key]
+
+
+async def _close_with_loop(loop: asyncio.AbstractEventLoop, clients: Dict[Tuple[str, str], Any]):
+    """
+    루프가 끝날 때까지 기다렸다가 그 루프의 비동기 클라이언트 연결을 닫습니다.
+    (asyncio.run/BackgroundLoop.stop은 종료 전에 남은 태스크를 취소하고 완료될 때까지 루프를 실행)
+    """
+    try:
+        await loop.create_future()
+    finally:
+        with _lock:
+            if _async_clients.get(loop) is clients:
+                del _async_clients[loop]
+            _closers.pop(loop, None)
+            pending = list(clients.values())
+            clients.clear()
+        for client in pending:
+            try:
+                await client.close()
+            except Exception:
+                pass
+
+
+def get_async_client(model: Optional[str] = None, provider: str = "openai"):
+    """
+    현재 이벤트 루프용 공용 비동기 클라이언트 (실행 중인 루프 안에서만 호출)
+    같은 루프 안에서는 연결 풀을 공유하고, 루프가 종료될 때 해당 클라이언트의 연결도 함께 닫힘
+    """
+    key = (provider, _profile(model))
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is not None and key in clients:
+        return clients[key]
+    load_env()
+    with _lock:
+        clients = _async_clients.get(loop)
+        if clients is None:
+            clients = _async_clients[loop] = {}
+            _closers[loop] = loop.create_task(_close_with_loop(loop, clients))
+        if key not in clients:
+            import httpx
+            from openai import AsyncOpenAI
+
+            clients[key] = AsyncOpenAI(
+                **_endpoint_kwargs(provider),
+                max_retries=0,
+                http_client=httpx.AsyncClient(**_client_kwargs(key[1])),
+            )
+        return clients[key]
+
+
+def close_clients():
+    """동기 클라이언트의 연결을 닫습니다. (비동기 클라이언트는 루프와 함께 정리)"""
+    with _lock:
+        for client in _sync_clients.values():
+            client.close()
+        _sync_clients.clear()
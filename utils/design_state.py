@@ -0,0 +1,153 @@
+import copy
+import itertools
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+_MISSING = object()
+
+# 문서 내용이 바뀔 때마다 부여하는 전역 revision 번호 (undo 후 같은 버전 번호가 재사용되어도 구분 가능)
+_revision_counter = itertools.count(1)
+
+
+def apply_patch(doc: Dict[str, Any], patch: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    """
+    patch를 적용한 새 문서를 반환합니다. (copy-on-write)
+    변경된 경로의 dict만 새로 만들고 나머지 하위 dict는 이전 버전과 공유하므로
+    기존 문서는 절대 수정되지 않습니다.
+    Returns:
+        (새 문서, 변경 여부) - 변경이 없으면 기존 문서를 그대로 반환
+    """
+    new_doc = None
+    for key, value in patch.items():
+        current = doc.get(key, _MISSING)
+        if isinstance(value, dict) and isinstance(current, dict):
+            child, changed = apply_patch(current, value)
+        else:
+            changed = current is _MISSING or current != value
+            child = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+        if changed:
+            if new_doc is None:
+                new_doc = dict(doc)
+            new_doc[key] = child
+    return (doc, False) if new_doc is None else (new_doc, True)
+
+
+class DesignSession:
+    """세션 하나의 설계 문서 버전 이력 (버전 0은 기본 문서)"""
+
+    def __init__(self, session_id: str, base: Dict[str, Any], max_history: int = 50):
+        self.session_id = session_id
+        self.max_history = max_history
+        self._documents: List[Dict[str, Any]] = [base]
+        self._revisions: List[int] = [next(_revision_counter)]
+        self._patches: List[Dict[str, Any]] = []
+        self._first_version = 0
+        self._serialized: Optional[Tuple[int, str]] = None
+
+    @property
+    def version(self) -> int:
+        return self._first_version + len(self._documents) - 1
+
+    @property
+    def revision(self) -> int:
+        """현재 문서 내용의 고유 번호"""
+        return self._revisions[-1]
+
+    @property
+    def document(self) -> Dict[str, Any]:
+        """현재 버전의 문서 (읽기 전용으로 사용)"""
+        return self._documents[-1]
+
+    def apply(self, patch: Dict[str, Any]) -> Tuple[int, bool]:
+        """patch를 적용하고 (현재 버전, 변경 여부)를 반환합니다. 변경이 없으면 버전이 증가하지 않습니다."""
+        new_doc, changed = apply_patch(self.document, patch)
+        if changed:
+            self._push(new_doc, copy.deepcopy(patch))
+        return self.version, changed
+
+    def undo(self, steps: int = 1) -> int:
+        """최근 patch를 steps개 되돌리고 현재 버전을 반환합니다."""
+        steps = max(0, min(steps, len(self._patches)))
+        for _ in range(steps):
+            self._documents.pop()
+            self._revisions.pop()
+            self._patches.pop()
+        return self.version
+
+    def reset(self, base: Dict[str, Any]) -> int:
+        """기본 문서를 새 버전으로 추가합니다. (undo로 이전 상태 복원 가능)"""
+        self._push(base, {"$reset": True})
+        return self.version
+
+    def _push(self, doc: Dict[str, Any], patch: Dict[str, Any]):
+        self._documents.append(doc)
+        self._revisions.append(next(_revision_counter))
+        self._patches.append(patch)
+        if len(self._patches) > self.max_history:
+            self._documents.pop(0)
+            self._revisions.pop(0)
+            self._patches.pop(0)
+            self._first_version += 1
+
+    def history(self) -> List[Dict[str, Any]]:
+        """적용된 patch 목록을 버전 번호와 함께 반환합니다."""
+        start = self._first_version + 1
+        return [{"version": start + i, "patch": p} for i, p in enumerate(self._patches)]
+
+    def serialized(self) -> str:
+        """현재 버전 문서의 JSON 문자열 (revision별로 한 번만 직렬화)"""
+        if self._serialized is None or self._serialized[0] != self.revision:
+            self._serialized = (self.revision, json.dumps(self.document))
+        return self._serialized[1]
+
+
+class DesignStateStore:
+    """
+    MCP 세션별 설계 상태 저장소
+    - 세션마다 copy-on-write 문서 버전 이력(patch, undo)을 유지
+    - form별로 현재 로드된 (세션, revision)을 기록하여 같은 문서를 .NET으로 다시 보내지 않음
+    """
+
+    def __init__(self, base: Dict[str, Any], max_sessions: int = 32, max_history: int = 50):
+        self.base = base
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+        self._sessions: "OrderedDict[str, DesignSession]" = OrderedDict()
+        self._loaded: Dict[Any, Tuple[str, int]] = {}
+        self.lock = threading.RLock()
+
+    def session(self, session_id: str) -> DesignSession:
+        """세션을 반환합니다. 없으면 기본 문서로 생성하고, 오래된 세션은 제거합니다."""
+        with self.lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = DesignSession(session_id, self.base, self.max_history)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self.drop(next(iter(self._sessions)))
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def drop(self, session_id: str):
+        """세션과 관련된 로드 기록을 제거합니다."""
+        with self.lock:
+            self._sessions.pop(session_id, None)
+            for form_key, (loaded_id, _) in list(self._loaded.items()):
+                if loaded_id == session_id:
+                    del self._loaded[form_key]
+
+    def is_loaded(self, form_key: Any, session: DesignSession) -> bool:
+        """form에 해당 세션의 현재 문서가 이미 로드되어 있는지 확인합니다."""
+        with self.lock:
+            return self._loaded.get(form_key) == (session.session_id, session.revision)
+
+    def mark_loaded(self, form_key: Any, session: DesignSession):
+        with self.lock:
+            self._loaded[form_key] = (session.session_id, session.revision)
+
+    def invalidate(self, form_key: Any):
+        """form 상태가 외부에서 바뀐 경우(Initial_Load 등) 로드 기록을 지웁니다."""
+        with self.lock:
+            self._loaded.pop(form_key, None)
@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+@dataclass
+class FormSlot:
+    """워커 스레드 하나가 소유하는 form 인스턴스"""
+    index: int
+    form: Any = None
+    state: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return f"form-{self.index}"
+
+
+@dataclass
+class _Job:
+    fn: Callable[[FormSlot], Any]
+    key: Optional[Hashable]
+    future: Future
+    enqueued_at: float
+    # 요청한 쪽의 contextvars (trace 구간 등)를 워커 스레드에서도 그대로 사용
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+
+
+class FormDispatcher:
+    """
+    .NET form 접근을 직렬화하는 디스패처
+    - form마다 전용 워커 스레드와 큐를 두고, 해당 form에 대한 호출은 그 스레드에서만 실행
+    - 같은 key로 대기 중인 요청은 하나로 합쳐(coalesce) 같은 결과를 공유
+    - affinity(예: 세션 ID)가 같은 요청은 항상 같은 form으로 전달하여 form 상태를 유지
+    """
+
+    def __init__(self, form_factory: Callable[[], Any], num_forms: int = 1, name: str = "form"):
+        self.form_factory = form_factory
+        self.num_forms = max(1, num_forms)
+        self.name = name
+        self._queues: List["queue.Queue[Optional[_Job]]"] = [queue.Queue() for _ in range(self.num_forms)]
+        self._slots = [FormSlot(i) for i in range(self.num_forms)]
+        self._pending: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._stats = {
+            "submitted": 0,
+            "coalesced": 0,
+            "completed": 0,
+            "failed": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+            "run_total": 0.0,
+        }
+        self._busy = [False] * self.num_forms
+
+    def start(self):
+        """워커 스레드를 시작합니다. (form은 각 워커 스레드에서 생성)"""
+        with self._lock:
+            if self._threads:
+                return
+            for slot in self._slots:
+                thread = threading.Thread(
+                    target=self._worker, args=(slot,), name=f"{self.name}-{slot.index}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def _pick_queue(self, affinity: Optional[Hashable]) -> int:
+        if affinity is not None:
+            return zlib.crc32(repr(affinity).encode("utf-8")) % self.num_forms
+        # affinity가 없으면 대기 작업이 가장 적은 form 선택
+        return min(range(self.num_forms), key=lambda i: self._queues[i].qsize() + self._busy[i])
+
+    def submit(
+        self,
+        fn: Callable[[FormSlot], Any],
+        key: Optional[Hashable] = None,
+        affinity: Optional[Hashable] = None,
+    ) -> Future:
+        """
+        form 작업을 큐에 넣고 Future를 반환합니다.
+        Args:
+            fn: 워커 스레드에서 FormSlot을 인자로 실행될 함수
+            key: 같은 key로 대기 중인 작업이 있으면 그 결과를 공유 (None이면 합치지 않음)
+            affinity: 같은 값이면 항상 같은 form에서 실행
+        """
+        self.start()
+        with self._lock:
+            self._stats["submitted"] += 1
+            if key is not None and key in self._pending:
+                self._stats["coalesced"] += 1
+                return self._pending[key]
+            future: Future = Future()
+            if key is not None:
+                self._pending[key] = future
+            index = self._pick_queue(affinity)
+        self._queues[index].put(_Job(fn, key, future, time.perf_counter()))
+        return future
+
+    def warm_up(self, timeout: Optional[float] = None):
+        """모든 워커에서 form을 미리 생성하고 완료될 때까지 기다립니다."""
+        self.start()
+        futures = []
+        for job_queue in self._queues:
+            future: Future = Future()
+            job_queue.put(_Job(lambda slot: slot.key, None, future, time.perf_counter()))
+            futures.append(future)
+        for future in futures:
+            future.result(timeout)
+
+    async def run(
+        self,
+        fn: Callable[[FormSlot], Any],
+        key: Optional[Hashable] = None,
+        affinity: Optional[Hashable] = None,
+    ) -> Any:
+        """submit의 비동기 버전. 이벤트 루프를 막지 않고 결과를 기다립니다."""
+        # 합쳐진 요청을 함께 기다리는 다른 호출자가 있으므로 취소가 원본 작업으로 전파되지 않게 함
+        return await asyncio.shield(asyncio.wrap_future(self.submit(fn, key, affinity)))
+
+    def call(
+        self,
+        fn: Callable[[FormSlot], Any],
+        key: Optional[Hashable] = None,
+        affinity: Optional[Hashable] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """submit의 동기 버전"""
+        return self.submit(fn, key, affinity).result(timeout)
+
+    def _worker(self, slot: FormSlot):
+        job_queue = self._queues[slot.index]
+        while True:
+            job = job_queue.get()
+            if job is None:
+                break
+            with self._lock:
+                if job.key is not None and self._pending.get(job.key) is job.future:
+                    # 실행이 시작되면 더 이상 합치지 않음 (이후 요청은 새 상태로 다시 계산)
+                    del self._pending[job.key]
+                self._busy[slot.index] = True
+            started = time.perf_counter()
+            wait = started - job.enqueued_at
+            if not job.future.set_running_or_notify_cancel():
+                self._busy[slot.index] = False
+                continue
+            try:
+                if slot.form is None:
+                    slot.form = self.form_factory()
+                result = job.context.run(job.fn, slot)
+            except BaseException as e:
+                job.future.set_exception(e)
+                failed = True
+            else:
+                job.future.set_result(result)
+                failed = False
+            with self._lock:
+                self._busy[slot.index] = False
+                self._stats["failed" if failed else "completed"] += 1
+                self._stats["wait_total"] += wait
+                self._stats["wait_max"] = max(self._stats["wait_max"], wait)
+                self._stats["run_total"] += time.perf_counter() - started
+
+    def metrics(self) -> Dict[str, Any]:
+        """큐 길이, 대기/실행 시간 등 통계를 반환합니다."""
+        with self._lock:
+            stats = dict(self._stats)
+            busy = list(self._busy)
+        done = stats["completed"] + stats["failed"]
+        return {
+            "num_forms": self.num_forms,
+            "queue_depth": [q.qsize() for q in self._queues],
+            "busy": busy,
+            "submitted": stats["submitted"],
+            "coalesced": stats["coalesced"],
+            "completed": stats["completed"],
+            "failed": stats["failed"],
+            "avg_wait_ms": stats["wait_total"] / done * 1000 if done else 0.0,
+            "max_wait_ms": stats["wait_max"] * 1000,
+            "avg_run_ms": stats["run_total"] / done * 1000 if done else 0.0,
+        }
+
+    def shutdown(self, wait: bool = True):
+        """대기 중인 작업을 처리한 뒤 워커 스레드를 종료합니다."""
+        for job_queue in self._queues:
+            job_queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
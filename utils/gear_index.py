@@ -0,0 +1,309 @@
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# 한글 설계 용어 -> 해당 key 경로(섹션/키) 정규표현식
+# 사용자 메시지에 등장하는 용어로 관련 key를 바로 찾기 위한 별칭 테이블
+KEY_ALIASES: Dict[str, List[str]] = {
+    "모듈": [r"^Basic Data/Normal Module$"],
+    "잇수": [r"^Basic Data/z\d$"],
+    "기어비": [r"^Basic Data/z\d$"],
+    "압력각": [r"^Basic Data/Pressure angle$"],
+    "헬리컬": [r"^Basic Data/Helix (angle|direction)$"],
+    "헬릭스": [r"^Basic Data/Helix (angle|direction)$"],
+    "비틀림": [r"^Basic Data/Helix (angle|direction)$"],
+    "전위": [r"^Basic Data/x\d$"],
+    "치폭": [r"^Basic Data/b\d$"],
+    "폭": [r"^Basic Data/b\d$"],
+    "중심거리": [r"^Basic Data/CD", r"^Center distance Tolerance/"],
+    "백래시": [r"^Basic Data/Backlash"],
+    "정밀도": [r"^Basic Data/Q\d$"],
+    "등급": [r"^Basic Data/Q\d$"],
+    "재질": [r"^Basic Data/(GMT\d|Material Type\d)$"],
+    "소재": [r"^Basic Data/(GMT\d|Material Type\d)$"],
+    "윤활": [r"^Basic Data/Lubricant"],
+    "유성": [r"^Basic Data/(GearTypeNum|Num of Planet)$"],
+    "플래닛": [r"^Basic Data/Num of Planet$"],
+    "기어 방식": [r"^Basic Data/GearTypeNum$"],
+    "이끝": [r"^Gear Profile/Coefficient/Addendum\d$"],
+    "이뿌리": [r"^Gear Profile/Coefficient/(Dedendum|Root_R)\d$"],
+    "프로파일": [r"^Gear Profile/RP"],
+    "공차": [r"^Tooth Tolerance/GearTol"],
+    "림": [r"^Detail Geometry/Rim thickness\d$"],
+    "웹": [r"^Detail Geometry/Web thickness\d$"],
+    "조도": [r"^Detail Geometry/R_[az][FH]\d$"],
+    "사용계수": [r"^Rating/K_A$"],
+    "하중": [r"^Rating/Load spectrum$"],
+    "토크": [r"^Rating/Load spectrum$"],
+    "회전수": [r"^Rating/Load spectrum$"],
+    "수명": [r"^Rating/Load spectrum$", r"^Options/Infinity life$"],
+    "안전율": [r"^Options/S[FHB]min"],
+    "크라우닝": [r"^LTCA/(Profile crowning|Crowning)"],
+    "릴리프": [r"^LTCA/(Relief|EndRelief|LeadRelief)"],
+    "효율": [r"^Eff/"],
+    "오일": [r"^Eff/(OilLev|Oil volume|CalcOilMethod)$"],
+}
+
+# 요청과 무관하게 항상 프롬프트에 포함되는 key (시스템 프롬프트의 규칙에서 참조)
+PINNED_PATHS: List[Tuple[str, ...]] = [
+    ("Basic Data", "GearTypeNum"),
+    ("Basic Data", "CDMethod"),
+]
+
+# 설명문에 흔히 등장해 검색 점수를 왜곡하는 일반 용어
+STOPWORDS = {"기어", "입력", "설정", "계산", "경우", "사용", "값", "선택", "방법"}
+
+Path = Tuple[str, ...]
+
+
+def _tokenize(text: str) -> List[str]:
+    """key/설명/메시지를 소문자 토큰으로 분해합니다. (영문, 숫자, 한글 단위)"""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    return [t for t in re.findall(r"[a-z]+|[0-9]+|[가-힣]+", text.lower()) if t]
+
+
+def _stem(key: str) -> str:
+    """key 끝의 기어 번호를 제거합니다. 예: 'z1' -> 'z', 'Tip form dia.2' -> 'Tip form dia.'"""
+    return re.sub(r"\d+$", "", key)
+
+
+def format_path(path: Iterable[str]) -> str:
+    """경로 튜플을 로그 출력용 문자열로 변환합니다."""
+    return "/".join(path)
+
+
+class GearKeyIndex:
+    """
+    기어 설계 JSON(GD1) 문서의 key 경로 인덱스
+    - 모든 leaf 값의 경로와 $ 설명을 미리 색인해 두고
+    - 사용자 메시지와 관련된 경로만 골라 프롬프트용 부분 문서를 만들며
+    - LLM이 반환한 patch가 실제 존재하는 경로만 수정하는지 검증함
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.entries: Dict[Path, Dict[str, Any]] = {}
+        self.section_descriptions: Dict[Path, str] = {}
+        self.sections: Set[Path] = set()
+        self._build(data, ())
+        self._by_stem: Dict[Tuple[Path, str], List[Path]] = {}
+        for path in self.entries:
+            self._by_stem.setdefault((path[:-1], _stem(path[-1])), []).append(path)
+
+    def _build(self, obj: Dict[str, Any], prefix: Path):
+        for key, value in obj.items():
+            if key.startswith("$"):
+                continue
+            path = prefix + (key,)
+            description = obj.get(f"${key}")
+            if isinstance(value, dict):
+                self.sections.add(path)
+                if description:
+                    self.section_descriptions[path] = description
+                self._build(value, path)
+                continue
+            tokens = {t for t in _tokenize(key) if len(t) > 1}
+            desc_tokens = set(_tokenize(description)) - STOPWORDS if description else set()
+            self.entries[path] = {
+                "value": value,
+                "description": description,
+                "key_tokens": tokens,
+                "desc_tokens": desc_tokens,
+                "key_regex": re.compile(r"(?<![a-z0-9_])" + re.escape(key.lower()) + r"(?![a-z0-9_])"),
+                "path_str": format_path(path),
+            }
+
+    def __contains__(self, path: Path) -> bool:
+        return tuple(path) in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def retrieve(self, user_message: str, limit: int = 40) -> List[Path]:
+        """사용자 메시지와 관련된 key 경로를 점수 순으로 반환합니다."""
+        message = user_message.lower()
+        msg_tokens = set(_tokenize(user_message))
+        scores: Dict[Path, float] = {}
+
+        # 1. 한글 설계 용어 별칭
+        for alias, patterns in KEY_ALIASES.items():
+            if alias in message:
+                for pattern in patterns:
+                    regex = re.compile(pattern)
+                    for path, entry in self.entries.items():
+                        if regex.search(entry["path_str"]):
+                            scores[path] = scores.get(path, 0.0) + 5.0
+
+        # 2. key 이름/설명 토큰 매칭 (숫자, 한 글자 토큰은 기어 번호와 혼동되므로 제외)
+        word_tokens = {t for t in msg_tokens if not t.isdigit() and len(t) > 1}
+        for path, entry in self.entries.items():
+            score = 3.0 * len(word_tokens & entry["key_tokens"])
+            score += 1.0 * len(word_tokens & entry["desc_tokens"])
+            # 한글은 조사가 붙으므로 부분 문자열로 비교 ("모듈로" ⊃ "모듈")
+            for token in entry["desc_tokens"]:
+                if len(token) >= 2 and not token.isascii() and token in message:
+                    score += 1.0
+            # key 이름 자체가 메시지에 등장 ("K_A", "z1", "Helix angle")
+            if entry["key_regex"].search(message):
+                score += 6.0
+            if score:
+                scores[path] = scores.get(path, 0.0) + score
+
+        if not scores:
+            # 매칭 결과가 없으면 기본 제원 섹션으로 대체
+            scores = {path: 1.0 for path in self.entries if path[0] == "Basic Data"}
+
+        ranked = sorted(scores, key=lambda p: scores[p], reverse=True)
+
+        # 같은 이름의 기어별 key (z1, z2, ...)는 함께 포함
+        selected: List[Path] = []
+        for path in ranked:
+            for sibling in self._by_stem.get((path[:-1], _stem(path[-1])), [path]):
+                if sibling not in selected:
+                    selected.append(sibling)
+            if len(selected) >= limit:
+                break
+
+        for path in PINNED_PATHS:
+            if path in self.entries and path not in selected:
+                selected.append(path)
+        return selected
+
+    def subset(self, paths: Iterable[Path], document: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        주어진 경로의 값과 $ 설명만 포함한 중첩 dict를 생성합니다.
+        document가 주어지면 인덱스 생성 시점의 값 대신 해당 문서의 현재 값을 사용합니다.
+        """
+        result: Dict[str, Any] = {}
+        for path in paths:
+            entry = self.entries.get(tuple(path))
+            if entry is None:
+                continue
+            node = result
+            for depth, key in enumerate(path[:-1]):
+                if key not in node:
+                    description = self.section_descriptions.get(path[:depth + 1])
+                    if description:
+                        node[f"${key}"] = description
+                    node[key] = {}
+                node = node[key]
+            node[path[-1]] = entry["value"] if document is None else _lookup(document, path, entry["value"])
+            if entry["description"]:
+                node[f"${path[-1]}"] = entry["description"]
+        return result
+
+    def build_context(self, user_message: str, limit: int = 40, document: Optional[Dict[str, Any]] = None) -> str:
+        """사용자 메시지에 대한 프롬프트용 부분 JSON 문자열을 반환합니다."""
+        subset = self.subset(self.retrieve(user_message, limit), document)
+        return json.dumps(subset, ensure_ascii=False, indent=1)
+
+    def patch_schema(self, paths: Iterable[Path]) -> Dict[str, Any]:
+        """
+        주어진 경로만 수정할 수 있는 patch의 JSON schema를 생성합니다. (structured output strict 모드용)
+        strict 모드는 모든 속성이 필수이므로 각 값은 null을 허용하고, null은 "변경 없음"을 의미합니다.
+        """
+        root: Dict[str, Any] = _object_schema()
+        for path in paths:
+            entry = self.entries.get(tuple(path))
+            if entry is None:
+                continue
+            node = root
+            for key in path[:-1]:
+                if key not in node["properties"]:
+                    node["properties"][key] = _object_schema()
+                    node["required"].append(key)
+                node = node["properties"][key]
+            if path[-1] not in node["properties"]:
+                node["required"].append(path[-1])
+            node["properties"][path[-1]] = _value_schema(entry["value"], entry["description"])
+        return root
+
+    def validate_patch(self, patch: Any) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        LLM이 반환한 patch를 key 인덱스로 검증합니다.
+        Args:
+            patch: LLM이 반환한 중첩 dict
+        Returns:
+            (인덱스에 존재하는 경로만 남긴 patch, 거부된 경로 목록)
+        """
+        accepted: Dict[str, Any] = {}
+        rejected: List[str] = []
+        if not isinstance(patch, dict):
+            return accepted, ["<root>"]
+        self._validate(patch, (), accepted, rejected)
+        return accepted, rejected
+
+    def _validate(self, obj: Dict[str, Any], prefix: Path, accepted: Dict[str, Any], rejected: List[str]):
+        for key, value in obj.items():
+            path = prefix + (key,)
+            if key.startswith("$"):
+                continue
+            entry = self.entries.get(path)
+            if entry is not None and not isinstance(value, dict):
+                accepted[key] = _coerce(entry["value"], value)
+            elif isinstance(value, dict) and path in self.sections:
+                child: Dict[str, Any] = {}
+                self._validate(value, path, child, rejected)
+                if child:
+                    accepted[key] = child
+            else:
+                rejected.append(format_path(path))
+
+
+def _lookup(document: Dict[str, Any], path: Path, default: Any) -> Any:
+    node: Any = document
+    for key in path:
+        if not isinstance(node, dict) or key not in node:
+            return default
+        node = node[key]
+    return node
+
+
+def _coerce(current: Any, value: Any) -> Any:
+    """기존 값의 타입에 맞춰 새 값을 변환합니다. (GD1은 수치를 문자열로 저장)"""
+    if isinstance(current, bool):
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "1")
+        return bool(value)
+    if isinstance(current, int) and not isinstance(value, bool):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return value
+    if isinstance(current, str) and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+def _object_schema() -> Dict[str, Any]:
+    return {"type": "object", "properties": {}, "required": [], "additionalProperties": False}
+
+
+def _value_schema(current: Any, description: Optional[str]) -> Dict[str, Any]:
+    """기존 값의 타입으로 leaf schema 생성 (GD1은 수치를 문자열로 저장하므로 문자열 값은 수치도 허용)"""
+    if isinstance(current, bool):
+        schema: Dict[str, Any] = {"type": ["boolean", "null"]}
+    elif isinstance(current, int):
+        schema = {"type": ["integer", "null"]}
+    elif isinstance(current, float):
+        schema = {"type": ["number", "null"]}
+    elif isinstance(current, dict):
+        schema = _object_schema()
+        for key, value in current.items():
+            if not key.startswith("$"):
+                schema["properties"][key] = _value_schema(value, None)
+                schema["required"].append(key)
+    elif isinstance(current, list):
+        item = _value_schema(current[0], None) if current else {"type": ["string", "number", "null"]}
+        schema = {"type": ["array", "null"], "items": item}
+    else:
+        schema = {"type": ["string", "number", "null"]}
+    if description:
+        schema["description"] = description
+    return schema
+
+
+def load_gear_index(json_path: str) -> GearKeyIndex:
+    """JSON 파일로부터 GearKeyIndex를 생성합니다."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        return GearKeyIndex(json.load(f))
@@ -1,93 +1,163 @@
-from openai import AsyncOpenAI, OpenAI
 from typing import List, Dict, Any, Optional, AsyncGenerator, Generator
 from pydantic import BaseModel
 
-import os
-from dotenv import load_dotenv
 import asyncio
+import hashlib
+import json
 
-load_dotenv()
+from .llm_cache import get_llm_cache
+from .providers import get_provider_router
+from .llm_batch import BatchJob, LocalBatchBackend, OpenAIBatchBackend
+from .tracing import start_span
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+def _use_cache(cache: Optional[bool], temperature: float):
+    """cache=None이면 결과가 결정적인 호출(temperature=0)만 캐시합니다."""
+    if cache is False or (cache is None and temperature != 0):
+        return None
+    return get_llm_cache()
 
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-sync_client = OpenAI(api_key=OPENAI_API_KEY)
+def _request_options(kind: str, response_format: Optional[Dict[str, Any]]):
+    """response_format이 있으면 요청 인자에 추가하고, 캐시 키도 형식별로 구분"""
+    if response_format is None:
+        return kind, {}
+    digest = hashlib.sha256(json.dumps(response_format, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return f"{kind}:{digest}", {"response_format": response_format}
 
 async def llm_call_async(
     prompt: List[Dict[str, str]],
     model: str = "gpt-4o-mini",
     temperature: float = 0.7,
-    stream: bool = False
+    stream: bool = False,
+    cache: Optional[bool] = None,
+    priority: int = 1,
+    response_format: Optional[Dict[str, Any]] = None
 ) -> AsyncGenerator[Any, None]:
-    """비동기 LLM 호출"""
+    """
+    비동기 LLM 호출 (캐시된 응답은 같은 타입의 객체/청크로 재생)
+    - 요청은 ProviderRouter가 model을 처리할 수 있는 가장 빠른 정상 공급자로 보냄 (LLMExecutor를 통해 실행)
+    """
+    kind, options = _request_options("stream" if stream else "completion", response_format)
+    llm_cache = _use_cache(cache, temperature)
+    # 제너레이터는 호출한 쪽 컨텍스트에서 실행되므로 현재 구간으로 설정하지 않고 직접 종료
+    trace = start_span("llm.request", model=model, stream=stream, priority=priority)
     try:
-        response = await client.chat.completions.create(
-            model=model,
-            messages=prompt,
-            temperature=temperature,
-            stream=stream
-        )
-        
-        if stream:
-            async for chunk in response:
-                yield chunk
-        else:
-            yield response
-    except Exception as e:
-        raise Exception(f"LLM 호출 중 오류 발생: {str(e)}")
+        router = get_provider_router()
+        # 캐시는 실제로 응답한 공급자/모델별로 구분 (조회는 지금 먼저 시도할 후보 기준)
+        # 유사도 캐시의 임베딩 요청과 SQLite I/O가 이벤트 루프를 막지 않도록 스레드에서 실행
+        cached = None
+        if llm_cache:
+            label = router.preferred(model, stream, **options).label
+            cached = await asyncio.to_thread(llm_cache.get, kind, label, temperature, prompt)
+        if cached is not None:
+            from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+            trace.set(cache_hit=True)
+            if stream:
+                for chunk in cached:
+                    yield ChatCompletionChunk.model_validate(chunk)
+            else:
+                yield ChatCompletion.model_validate(cached)
+            return
+
+        try:
+            served = []
+            if stream:
+                # 공급자 선택/전환은 첫 청크를 받을 때까지 진행됨
+                response = router.stream(model, prompt, temperature, priority=priority, trace_parent=trace,
+                                         on_route=served.append, **options)
+                chunks = []
+                try:
+                    async for chunk in response:
+                        if not chunks:
+                            trace.mark("response")
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            trace.mark("first_token")
+                        chunks.append(chunk.model_dump())
+                        yield chunk
+                finally:
+                    await response.aclose()
+                trace.set(chunks=len(chunks))
+                if llm_cache and served:
+                    await asyncio.to_thread(llm_cache.set, kind, served[0].label, temperature, prompt, chunks)
+            else:
+                response = await router.complete(model, prompt, temperature, priority=priority, trace_parent=trace,
+                                                 on_route=served.append, **options)
+                trace.mark("response")
+                if llm_cache:
+                    await asyncio.to_thread(llm_cache.set, kind, served[0].label, temperature, prompt,
+                                            response.model_dump())
+                yield response
+        except Exception as e:
+            raise Exception(f"LLM 호출 중 오류 발생: {str(e)}")
+    except BaseException as e:
+        trace.record_exception(e)
+        raise
+    finally:
+        trace.end()
 
 def llm_call(
     prompt: List[Dict[str, str]],
     model: str = "gpt-4o-mini",
-    temperature: float = 0.7
+    temperature: float = 0.7,
+    cache: Optional[bool] = None,
+    response_format: Optional[Dict[str, Any]] = None
 ) -> str:
     """동기 LLM 호출"""
-    try:
-        response = sync_client.chat.completions.create(
-            model=model,
-            messages=prompt,
-            temperature=temperature
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        raise Exception(f"LLM 호출 중 오류 발생: {str(e)}")
+    kind, options = _request_options("completion", response_format)
+    llm_cache = _use_cache(cache, temperature)
+    router = get_provider_router()
+    cached = llm_cache.get(kind, router.preferred(model, **options).label, temperature, prompt) if llm_cache else None
+    if cached is not None:
+        from openai.types.chat import ChatCompletion
+
+        return ChatCompletion.model_validate(cached).choices[0].message.content
 
-def llm_call(
-    prompt: str,
-    model: str = "gpt-4o-mini",
-    temperature: float = 0.7
-) -> str:
-    """동기 LLM 호출"""
     try:
-        response = sync_client.chat.completions.create(
-            model=model,
-            messages=prompt,
-            temperature=temperature
-        )
+        served = []
+        response = router.complete_sync(model, prompt, temperature, on_route=served.append, **options)
+        if llm_cache:
+            llm_cache.set(kind, served[0].label, temperature, prompt, response.model_dump())
         return response.choices[0].message.content
     except Exception as e:
         raise Exception(f"LLM 호출 중 오류 발생: {str(e)}")
 
+def _chunk_content(chunk) -> Optional[str]:
+    if hasattr(chunk, 'choices') and len(chunk.choices) > 0:
+        if hasattr(chunk.choices[0], 'delta') and hasattr(chunk.choices[0].delta, 'content'):
+            return chunk.choices[0].delta.content
+    return None
+
 def llm_call_stream(
     prompt: List[Dict[str, str]],
     model: str = "gpt-4o-mini",
-    temperature: float = 0.7
+    temperature: float = 0.7,
+    cache: Optional[bool] = None
 ) -> Generator[str, None, None]:
-    """동기적으로 스트리밍 응답을 처리하는 LLM 호출"""
+    """동기적으로 스트리밍 응답을 처리하는 LLM 호출 (캐시된 응답은 청크 단위로 재생)"""
+    llm_cache = _use_cache(cache, temperature)
+    router = get_provider_router()
+    cached = llm_cache.get("stream", router.preferred(model, True).label, temperature, prompt) if llm_cache else None
+    if cached is not None:
+        from openai.types.chat import ChatCompletionChunk
+
+        for chunk in cached:
+            content = _chunk_content(ChatCompletionChunk.model_validate(chunk))
+            if content:
+                yield content
+        return
+
     try:
-        response = sync_client.chat.completions.create(
-            model=model,
-            messages=prompt,
-            temperature=temperature,
-            stream=True
-        )
+        served = []
+        response = router.stream_sync(model, prompt, temperature, on_route=served.append)
         
+        chunks = []
         for chunk in response:
-            if hasattr(chunk, 'choices') and len(chunk.choices) > 0:
-                if hasattr(chunk.choices[0], 'delta') and hasattr(chunk.choices[0].delta, 'content'):
-                    content = chunk.choices[0].delta.content
-                    if content:
-                        yield content
+            chunks.append(chunk.model_dump())
+            content = _chunk_content(chunk)
+            if content:
+                yield content
+        if llm_cache and served:
+            llm_cache.set("stream", served[0].label, temperature, prompt, chunks)
     except Exception as e:
         raise Exception(f"LLM 호출 중 오류 발생: {str(e)}") 
     
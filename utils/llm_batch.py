@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# 배치 작업 디렉토리 (프로젝트 루트의 .cache/batches/<작업명>)
+DEFAULT_BATCH_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "batches"
+)
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# 재시도 대상 HTTP 상태 (요청 한도, 서버 오류) - 그 외 4xx는 같은 요청을 다시 보내도 실패
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _read_jsonl(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _result_content(result: Dict[str, Any]) -> Optional[str]:
+    """배치 결과 한 줄에서 응답 텍스트를 추출합니다."""
+    body = (result.get("response") or {}).get("body") or {}
+    choices = body.get("choices") or []
+    if not choices:
+        return None
+    return choices[0].get("message", {}).get("content")
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API (입력 파일 업로드 -> 배치 생성 -> 결과/오류 파일 다운로드)"""
+
+    def __init__(self, completion_window: str = "24h"):
+        self.completion_window = completion_window
+
+    def submit(self, input_path: str) -> str:
+        from .clients import get_sync_client
+
+        client = get_sync_client()
+        with open(input_path, "rb") as f:
+            input_file = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=CHAT_ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        from .clients import get_sync_client
+
+        return get_sync_client().batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Iterable[Dict[str, Any]]:
+        from .clients import get_sync_client
+
+        client = get_sync_client()
+        batch = client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+class LocalBatchBackend:
+    """
+    로컬 배치 백엔드 (테스트/개발용)
+    submit 시 요청을 스레드 풀에서 바로 실행하고, Batch API와 같은 형식의 결과를 돌려줌
+    Args:
+        call_fn: 요청 body(dict)를 받아 응답 텍스트를 반환하는 함수 (기본값: llm_call)
+    """
+
+    def __init__(self, call_fn: Optional[Callable[[Dict[str, Any]], str]] = None, max_workers: int = 8):
+        self.call_fn = call_fn or self._llm_call
+        self.max_workers = max_workers
+        self._batches: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _llm_call(body: Dict[str, Any]) -> str:
+        from .llm import llm_call
+
+        options = {k: v for k, v in body.items() if k in ("response_format",)}
+        return llm_call(body["messages"], model=body["model"], temperature=body.get("temperature", 0.7), **options)
+
+    def _run(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            content = self.call_fn(request["body"])
+        except Exception as e:
+            status = getattr(e, "status_code", 500)
+            return {"custom_id": request["custom_id"], "response": {"status_code": status, "body": {}},
+                    "error": {"message": str(e)}}
+        body = {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+        return {"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}, "error": None}
+
+    def submit(self, input_path: str) -> str:
+        requests = _read_jsonl(input_path)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(self._run, requests))
+        with self._lock:
+            batch_id = f"local-{len(self._batches) + 1}-{int(time.time())}"
+            self._batches[batch_id] = results
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        return "completed" if batch_id in self._batches else "failed"
+
+    def results(self, batch_id: str) -> Iterable[Dict[str, Any]]:
+        return list(self._batches.get(batch_id, []))
+
+
+class BatchJob:
+    """
+    대량 LLM 요청 배치 작업
+    - add()로 요청을 모아 JSONL로 저장하고, 백엔드에 제출한 뒤 완료될 때까지 polling
+    - 진행 상태(state.json)와 결과(results.jsonl)를 작업 디렉토리에 기록하므로 중단 후 run()을 다시 호출하면 이어서 진행
+    - 실패한 요청 중 재시도 가능한 것만 다시 제출 (max_attempts까지)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backend: Any = None,
+        directory: Optional[str] = None,
+        poll_interval: float = 30.0,
+        max_attempts: int = 3,
+    ):
+        self.name = name
+        self.backend = backend or OpenAIBatchBackend()
+        self.directory = directory or os.path.join(DEFAULT_BATCH_DIR, name)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        os.makedirs(self.directory, exist_ok=True)
+        self.requests_path = os.path.join(self.directory, "requests.jsonl")
+        self.results_path = os.path.join(self.directory, "results.jsonl")
+        self.state_path = os.path.join(self.directory, "state.json")
+        self.requests: Dict[str, Dict[str, Any]] = {r["custom_id"]: r for r in _read_jsonl(self.requests_path)}
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict[str, Any]:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"active_batch": None, "attempts": {}, "done": {}, "failed": {}}
+
+    def _checkpoint(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def add(self, custom_id: str, messages: List[Dict[str, str]], model: str = "gpt-4o-mini",
+            temperature: float = 0.7, **options: Any):
+        """요청을 추가합니다. (이미 추가된 custom_id는 무시)"""
+        if custom_id in self.requests:
+            return
+        request = {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": CHAT_ENDPOINT,
+            "body": {"model": model, "messages": messages, "temperature": temperature, **options},
+        }
+        self.requests[custom_id] = request
+        with open(self.requests_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+    def pending(self) -> List[str]:
+        """아직 성공하지 못했고 재시도 가능한 요청 ID"""
+        return [
+            custom_id for custom_id in self.requests
+            if custom_id not in self.state["done"]
+            and self.state["attempts"].get(custom_id, 0) < self.max_attempts
+            and not self.state["failed"].get(custom_id, {}).get("permanent")
+        ]
+
+    def _submit(self, custom_ids: List[str]) -> str:
+        attempt = max((self.state["attempts"].get(c, 0) for c in custom_ids), default=0) + 1
+        input_path = os.path.join(self.directory, f"input_{attempt}.jsonl")
+        with open(input_path, "w", encoding="utf-8") as f:
+            for custom_id in custom_ids:
+                f.write(json.dumps(self.requests[custom_id], ensure_ascii=False) + "\n")
+        batch_id = self.backend.submit(input_path)
+        for custom_id in custom_ids:
+            self.state["attempts"][custom_id] = self.state["attempts"].get(custom_id, 0) + 1
+        self.state["active_batch"] = {"id": batch_id, "custom_ids": custom_ids}
+        self._checkpoint()
+        print(f"[batch] {self.name}: {len(custom_ids)}건 제출 ({batch_id})")
+        return batch_id
+
+    def _collect(self, batch_id: str, custom_ids: List[str]):
+        received = set()
+        with open(self.results_path, "a", encoding="utf-8") as f:
+            for result in self.backend.results(batch_id):
+                custom_id = result.get("custom_id")
+                if custom_id not in self.requests:
+                    continue
+                received.add(custom_id)
+                status = (result.get("response") or {}).get("status_code", 500)
+                content = _result_content(result)
+                if status == 200 and content is not None:
+                    self.state["done"][custom_id] = content
+                    self.state["failed"].pop(custom_id, None)
+                    f.write(json.dumps({"custom_id": custom_id, "content": content}, ensure_ascii=False) + "\n")
+                else:
+                    self.state["failed"][custom_id] = {
+                        "status": status,
+                        "error": result.get("error"),
+                        "permanent": status not in RETRYABLE_STATUS,
+                    }
+        # 결과가 돌아오지 않은 요청(만료/취소된 배치)은 재시도 대상
+        for custom_id in custom_ids:
+            if custom_id not in received and custom_id not in self.state["done"]:
+                self.state["failed"][custom_id] = {"status": None, "error": "no result", "permanent": False}
+        self.state["active_batch"] = None
+        self._checkpoint()
+
+    def run(self) -> Dict[str, Optional[str]]:
+        """모든 요청이 성공하거나 재시도 횟수를 소진할 때까지 실행하고 results()를 반환합니다."""
+        while True:
+            active = self.state["active_batch"]
+            if active is None:
+                custom_ids = self.pending()
+                if not custom_ids:
+                    break
+                active = {"id": self._submit(custom_ids), "custom_ids": custom_ids}
+            # 진행 중이던 배치가 있으면 재제출하지 않고 이어서 polling
+            while True:
+                status = self.backend.status(active["id"])
+                if status in TERMINAL_STATUSES:
+                    break
+                time.sleep(self.poll_interval)
+            self._collect(active["id"], active["custom_ids"])
+            print(f"[batch] {self.name}: {status}, 성공 {len(self.state['done'])}/{len(self.requests)}, "
+                  f"실패 {len(self.state['failed'])}")
+        return self.results()
+
+    def results(self) -> Dict[str, Optional[str]]:
+        """custom_id -> 응답 텍스트 (실패한 요청은 None), 요청 추가 순서 유지"""
+        return {custom_id: self.state["done"].get(custom_id) for custom_id in self.requests}
+
+    def join(self, items: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """custom_id를 키로 하는 원본 데이터와 결과를 합칩니다."""
+        results = self.results()
+        return [
+            {"custom_id": custom_id, "item": item, "content": results.get(custom_id),
+             "error": self.state["failed"].get(custom_id)}
+            for custom_id, item in items.items()
+        ]
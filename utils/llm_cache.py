@@ -0,0 +1,220 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# 프로젝트 루트의 .cache 디렉토리에 저장 (LLM_CACHE_PATH로 변경 가능)
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "llm_cache.sqlite3"
+)
+
+
+def make_cache_key(kind: str, model: str, temperature: float, messages: Sequence[Dict[str, Any]]) -> str:
+    """(호출 종류, 모델, 온도, 메시지)의 해시 키"""
+    raw = json.dumps([kind, model, temperature, list(messages)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _namespace(kind: str, model: str, temperature: float, messages: Sequence[Dict[str, Any]]) -> str:
+    """유사도 검색 범위: 마지막 메시지를 제외한 대화 맥락이 같은 항목끼리만 비교"""
+    return make_cache_key(kind, model, temperature, messages[:-1])
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class LLMCache:
+    """
+    LLM 응답 캐시 (SQLite)
+    - 1단계: (종류, 모델, 온도, 메시지) 해시 키로 정확히 일치하는 응답 반환
+    - 2단계(선택): embed_fn이 주어지면 같은 대화 맥락에서 마지막 메시지의 임베딩 유사도로 검색
+    - TTL 만료 항목과 최대 개수/용량을 넘는 오래된 항목(LRU)을 자동 삭제
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: float = 7 * 24 * 3600,
+        max_entries: int = 10000,
+        max_bytes: int = 200 * 1024 * 1024,
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        similarity_threshold: float = 0.97,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "writes": 0}
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                namespace TEXT,
+                kind TEXT,
+                payload TEXT,
+                size INTEGER,
+                embedding BLOB,
+                created REAL,
+                accessed REAL,
+                expires REAL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_namespace ON entries(namespace)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)")
+        self._conn.commit()
+
+    def get(self, kind: str, model: str, temperature: float, messages: Sequence[Dict[str, Any]]) -> Optional[Any]:
+        """캐시된 응답(payload)을 반환합니다. 없으면 None"""
+        key = make_cache_key(kind, model, temperature, messages)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM entries WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.stats["hits"] += 1
+                return json.loads(row[0])
+
+        payload = self._semantic_get(kind, model, temperature, messages, now)
+        if payload is None:
+            with self._lock:
+                self.stats["misses"] += 1
+        return payload
+
+    def _semantic_get(self, kind, model, temperature, messages, now) -> Optional[Any]:
+        if self.embed_fn is None or not messages:
+            return None
+        query = self._embed(messages[-1].get("content"))
+        if query is None:
+            return None
+        namespace = _namespace(kind, model, temperature, messages)
+        best_key, best_score, best_payload = None, 0.0, None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, payload, embedding FROM entries WHERE namespace = ? AND expires > ? AND embedding IS NOT NULL",
+                (namespace, now),
+            ).fetchall()
+        for key, payload, blob in rows:
+            score = _cosine(query, array("f", blob))
+            if score > best_score:
+                best_key, best_score, best_payload = key, score, payload
+        if best_key is None or best_score < self.similarity_threshold:
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, best_key))
+            self._conn.commit()
+            self.stats["semantic_hits"] += 1
+        return json.loads(best_payload)
+
+    def _embed(self, text: Any) -> Optional[List[float]]:
+        if not isinstance(text, str) or not text:
+            return None
+        try:
+            return self.embed_fn(text)
+        except Exception as e:
+            print(f"Error in LLMCache embedding: {e}", file=sys.stderr)
+            return None
+
+    def set(self, kind: str, model: str, temperature: float, messages: Sequence[Dict[str, Any]], payload: Any):
+        """응답(payload, JSON 직렬화 가능)을 저장합니다."""
+        key = make_cache_key(kind, model, temperature, messages)
+        data = json.dumps(payload, ensure_ascii=False)
+        embedding = None
+        if self.embed_fn is not None and messages:
+            vector = self._embed(messages[-1].get("content"))
+            if vector is not None:
+                embedding = array("f", vector).tobytes()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    _namespace(kind, model, temperature, messages),
+                    kind,
+                    data,
+                    len(data.encode("utf-8")),
+                    embedding,
+                    now,
+                    now,
+                    now + self.ttl,
+                ),
+            )
+            self._evict(now)
+            self._conn.commit()
+            self.stats["writes"] += 1
+
+    def _evict(self, now: float):
+        """만료 항목 삭제 후, 개수/용량 제한을 넘으면 가장 오래 사용되지 않은 항목부터 삭제"""
+        self._conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        excess_count = max(0, count - self.max_entries)
+        excess_bytes = total - self.max_bytes
+        removed = 0
+        freed = 0
+        keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+            if removed >= excess_count and freed >= excess_bytes:
+                break
+            keys.append((key,))
+            removed += 1
+            freed += size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def _openai_embedding(text: str) -> List[float]:
+    """OpenAI 임베딩 (2단계 유사도 캐시용)"""
+    from .clients import get_sync_client
+
+    response = get_sync_client().embeddings.create(model=os.getenv("LLM_CACHE_EMBED_MODEL", "text-embedding-3-small"), input=text)
+    return response.data[0].embedding
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    프로세스 공용 캐시를 반환합니다. (최초 호출 시 생성)
+    환경 변수:
+        LLM_CACHE_DISABLED=1  캐시 비활성화 (None 반환)
+        LLM_CACHE_PATH        SQLite 파일 경로
+        LLM_CACHE_TTL         만료 시간(초)
+        LLM_CACHE_SEMANTIC=1  임베딩 유사도 캐시 사용
+    """
+    global _cache
+    if os.getenv("LLM_CACHE_DISABLED") == "1":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                ttl=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)),
+                embed_fn=_openai_embedding if os.getenv("LLM_CACHE_SEMANTIC") == "1" else None,
+            )
+        return _cache
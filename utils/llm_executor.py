@@ -0,0 +1,429 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# 모델별 기본 한도 (분당 요청 수, 분당 토큰 수) - 계정 tier에 맞게 configure()로 조정
+DEFAULT_LIMITS: Dict[str, Dict[str, float]] = {
+    "gpt-4o": {"rpm": 500, "tpm": 30000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+    "gpt-4.1": {"rpm": 500, "tpm": 30000},
+    "gpt-4.1-mini": {"rpm": 500, "tpm": 200000},
+    "o4-mini": {"rpm": 500, "tpm": 200000},
+    "default": {"rpm": 500, "tpm": 30000},
+}
+
+# 재시도 대상 오류 (openai 예외 클래스 이름 기준 - openai를 import하지 않고 판별)
+RETRYABLE_ERRORS = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+
+
+def estimate_tokens(messages: Sequence[Dict[str, Any]], max_output: int = 512) -> int:
+    """요청 토큰 수 대략 추정 (입력 문자 수 / 3 + 예상 출력)"""
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // 3 + max_output
+
+
+class TokenBucket:
+    """분당 rate만큼 채워지는 토큰 버킷 (스레드/이벤트 루프 공용)"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount: float) -> float:
+        """amount를 차감하고, 사용 가능해질 때까지 기다려야 하는 시간(초)을 반환"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = max(0.0, -self.tokens / self.rate) if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def block(self, seconds: float):
+        """429 응답 등으로 일정 시간 전체 요청을 멈춤"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self, amount: float = 1):
+        wait = self._reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, amount: float = 1):
+        wait = self._reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class _PriorityGate:
+    """동시 실행 수 제한 + 우선순위 대기열 (priority 값이 작을수록 먼저 실행)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: List = []
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: int):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 자리를 받은 직후 취소되면 다음 대기자에게 넘김
+                self.release()
+            else:
+                self._waiters = [w for w in self._waiters if w[2] is not future]
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)     # active 수는 그대로 넘겨줌
+                return
+        self.active -= 1
+
+
+class _GatedStream:
+    """스트림을 감싸서 끝나거나(소진/오류) 닫힐 때 동시 실행 자리를 반납"""
+
+    def __init__(self, stream: Any, release: Callable[[], None], loop: asyncio.AbstractEventLoop):
+        self._stream = stream
+        self._iterator = None
+        self._release = release
+        self._loop = loop
+        self._done = False
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            self._release()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iterator is None:
+            self._iterator = self._stream.__aiter__()
+        try:
+            return await self._iterator.__anext__()
+        except BaseException:
+            # StopAsyncIteration 포함 (정상 종료/오류/취소 모두 자리 반납)
+            self._finish()
+            raise
+
+    async def aclose(self):
+        self._finish()
+        close = getattr(self._stream, "aclose", None) or getattr(self._stream, "close", None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+
+    close = aclose
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+    def __del__(self):
+        # 닫지 않고 버린 스트림: 루프 스레드에서 자리 반납
+        if not self._done:
+            self._done = True
+            try:
+                self._loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                pass
+
+
+class LLMExecutor:
+    """
+    LLM 호출 실행기
+    - 모델별 토큰 버킷(분당 요청/토큰)으로 요청 진입을 조절하고
+    - 이벤트 루프별 동시 실행 수를 제한하며 우선순위 순으로 실행
+    - 429/타임아웃/5xx는 지터가 포함된 지수 백오프로 재시도 (Retry-After 우선)
+    - hedge=True인 요청은 지연 시간이 평소 p95를 넘으면 같은 요청을 하나 더 보내 먼저 끝난 결과 사용
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        limits: Optional[Dict[str, Dict[str, float]]] = None,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        hedge_after: Optional[float] = None,
+        hedge_min_samples: int = 20,
+    ):
+        self.max_concurrency = max_concurrency
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.hedge_min_samples = hedge_min_samples
+        self._request_buckets: Dict[str, TokenBucket] = {}
+        self._token_buckets: Dict[str, TokenBucket] = {}
+        self._gates: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _PriorityGate]" = weakref.WeakKeyDictionary()
+        self._latencies: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "in_flight": 0,
+        }
+
+    # ---- 설정 ----
+    def configure(self, model: str, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        """모델별 한도를 변경합니다."""
+        limit = dict(self.limits.get(model, self.limits["default"]))
+        if rpm:
+            limit["rpm"] = rpm
+        if tpm:
+            limit["tpm"] = tpm
+        with self._lock:
+            self.limits[model] = limit
+            self._request_buckets.pop(model, None)
+            self._token_buckets.pop(model, None)
+
+    def _buckets(self, model: str):
+        with self._lock:
+            if model not in self._request_buckets:
+                limit = self.limits.get(model, self.limits["default"])
+                self._request_buckets[model] = TokenBucket(limit["rpm"])
+                self._token_buckets[model] = TokenBucket(limit["tpm"])
+            return self._request_buckets[model], self._token_buckets[model]
+
+    def _gate(self) -> _PriorityGate:
+        loop = asyncio.get_running_loop()
+        gate = self._gates.get(loop)
+        if gate is None:
+            gate = self._gates[loop] = _PriorityGate(self.max_concurrency)
+        return gate
+
+    # ---- 통계 ----
+    def _count(self, name: str, delta: int = 1):
+        with self._lock:
+            self._stats[name] += delta
+
+    def _record_latency(self, model: str, seconds: float):
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=200)).append(seconds)
+
+    def _percentile(self, model: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies.get(model, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def metrics(self) -> Dict[str, Any]:
+        """실행 통계와 모델별 지연 시간(p50/p95, 초)을 반환합니다."""
+        with self._lock:
+            stats = dict(self._stats)
+            models = list(self._latencies)
+        stats["queued"] = sum(g.queued for g in list(self._gates.values()))
+        stats["latency"] = {
+            m: {"p50": self._percentile(m, 0.5), "p95": self._percentile(m, 0.95)} for m in models
+        }
+        return stats
+
+    # ---- 재시도 ----
+    def _retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """재시도 가능한 오류면 대기 시간(초), 아니면 None"""
+        status = getattr(error, "status_code", None)
+        if type(error).__name__ not in RETRYABLE_ERRORS and not (status == 429 or (status or 0) >= 500):
+            return None
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        retry_after = headers.get("retry-after") if hasattr(headers, "get") else None
+        if retry_after:
+            try:
+                return min(self.max_delay, float(retry_after))
+            except ValueError:
+                pass
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _on_retry(self, model: str, error: BaseException, delay: float):
+        self._count("retries")
+        if type(error).__name__ == "RateLimitError" or getattr(error, "status_code", None) == 429:
+            self._count("rate_limited")
+            # 같은 모델의 다른 요청도 함께 멈춤
+            self._buckets(model)[0].block(delay)
+
+    # ---- 실행 ----
+    async def _admit(self, model: str, tokens: int):
+        request_bucket, token_bucket = self._buckets(model)
+        await request_bucket.acquire(1)
+        await token_bucket.acquire(tokens)
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], model: str, tokens: int, hedge: bool) -> T:
+        await self._admit(model, tokens)
+        start = time.perf_counter()
+        threshold = self.hedge_after
+        if threshold is None and hedge:
+            with self._lock:
+                enough = len(self._latencies.get(model, ())) >= self.hedge_min_samples
+            threshold = self._percentile(model, 0.95) if enough else None
+        if not hedge or threshold is None:
+            result = await fn()
+            self._record_latency(model, time.perf_counter() - start)
+            return result
+
+        primary = asyncio.ensure_future(fn())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=threshold)
+            if done:
+                result = primary.result()
+                self._record_latency(model, time.perf_counter() - start)
+                return result
+
+            # 꼬리 지연: 같은 요청을 하나 더 보내고 먼저 끝난 결과 사용
+            self._count("hedged")
+            await self._admit(model, tokens)
+            backup = asyncio.ensure_future(fn())
+            tasks.append(backup)
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self._count("hedge_wins")
+                        self._record_latency(model, time.perf_counter() - start)
+                        return task.result()
+            # 둘 다 실패하면 원래 요청의 오류 전달
+            return primary.result()
+        finally:
+            # 호출한 쪽이 취소된 경우를 포함해 남은 요청은 모두 취소
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def submit(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        model: str = "default",
+        priority: int = 1,
+        tokens: int = 1000,
+        hedge: bool = False,
+        max_retries: Optional[int] = None,
+        stream: bool = False,
+    ) -> T:
+        """
+        LLM 호출을 실행합니다.
+        Args:
+            fn: 호출할 때마다 새 요청을 만드는 코루틴 함수 (재시도/hedge 시 여러 번 호출될 수 있음)
+            model: 한도와 지연 통계를 적용할 모델명
+            priority: 작을수록 먼저 실행 (사용자 대면 요청 0, 백그라운드 작업 2 등)
+            tokens: 토큰 버킷에서 차감할 예상 토큰 수
+            hedge: 꼬리 지연 시 중복 요청 허용 여부 (멱등한 비스트리밍 호출만)
+            max_retries: 이 요청의 재시도 횟수 (None이면 실행기 기본값, 다른 공급자로 넘길 수 있으면 0)
+            stream: fn이 스트림을 반환하는지 여부. True이면 스트림이 끝나거나 닫힐 때까지 동시 실행 자리를 유지
+        """
+        max_retries = self.max_retries if max_retries is None else max_retries
+        self._count("submitted")
+        gate = self._gate()
+        await gate.acquire(priority)
+        self._count("in_flight")
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._count("in_flight", -1)
+                gate.release()
+
+        try:
+            attempt = 0
+            while True:
+                try:
+                    result = await self._attempt(fn, model, tokens, hedge)
+                    self._count("completed")
+                    if stream:
+                        # 자리는 스트림이 끝나거나 닫힐 때 반납
+                        result = _GatedStream(result, release, asyncio.get_running_loop())
+                        released = None
+                    return result
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt)
+                    if delay is None or attempt >= max_retries:
+                        self._count("failed")
+                        raise
+                    self._on_retry(model, e, delay)
+                    attempt += 1
+                    await asyncio.sleep(delay)
+        finally:
+            if released is False:
+                release()
+
+    def run_sync(self, fn: Callable[[], T], model: str = "default", tokens: int = 1000,
+                 max_retries: Optional[int] = None) -> T:
+        """동기 호출용: 토큰 버킷과 재시도만 적용 (동시성 제한/hedge 없음)"""
+        max_retries = self.max_retries if max_retries is None else max_retries
+        self._count("submitted")
+        request_bucket, token_bucket = self._buckets(model)
+        attempt = 0
+        while True:
+            request_bucket.acquire_sync(1)
+            token_bucket.acquire_sync(tokens)
+            start = time.perf_counter()
+            try:
+                result = fn()
+                self._record_latency(model, time.perf_counter() - start)
+                self._count("completed")
+                return result
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None or attempt >= max_retries:
+                    self._count("failed")
+                    raise
+                self._on_retry(model, e, delay)
+                attempt += 1
+                time.sleep(delay)
+
+
+_executor: Optional[LLMExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_llm_executor() -> LLMExecutor:
+    """프로세스 공용 실행기 (LLM_MAX_CONCURRENCY로 이벤트 루프별 동시 실행 수 설정)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = LLMExecutor(max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")))
+        return _executor
@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def as_completed_indexed(aws: Iterable[Awaitable[T]]) -> AsyncIterator[Tuple[int, T]]:
+    """
+    완료되는 순서대로 (입력 인덱스, 결과)를 반환합니다.
+    하나라도 예외가 발생하거나 소비자가 중간에 멈추면 남은 작업은 취소됩니다.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    index = {task: i for i, task in enumerate(tasks)}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=index.__getitem__):
+                yield index[task], task.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def map_as_completed(fn: Callable[[R], Awaitable[T]], items: Iterable[R]) -> AsyncIterator[Tuple[int, T]]:
+    """fn(item)을 동시에 실행하고 완료 순서대로 (입력 인덱스, 결과)를 반환합니다."""
+    async for i, result in as_completed_indexed(fn(item) for item in items):
+        yield i, result
+
+
+async def map_ordered(fn: Callable[[R], Awaitable[T]], items: Iterable[R]) -> List[T]:
+    """fn(item)을 동시에 실행하고 결과를 입력 순서대로 반환합니다."""
+    items = list(items)
+    results: List[Any] = [None] * len(items)
+    async for i, result in map_as_completed(fn, items):
+        results[i] = result
+    return results
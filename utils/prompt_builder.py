@@ -0,0 +1,161 @@
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+# 프롬프트 앞부분이 요청마다 같을수록 제공자 측 prefix 캐시 적중률이 높아짐
+# 섹션 배치 순서: system(고정 지침) -> user(고정 참조 데이터 -> 요청별 데이터 -> 사용자 요청)
+STABILITY_ORDER = {"static": 0, "session": 1, "request": 2}
+ROLE_ORDER = {"system": 0, "user": 1}
+
+_encoders: Dict[str, Any] = {}
+
+
+def _encoder(model: str):
+    """tiktoken 인코더 (설치되어 있지 않으면 None)"""
+    if model not in _encoders:
+        try:
+            import tiktoken
+        except ImportError:
+            _encoders[model] = None
+        else:
+            try:
+                _encoders[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encoders[model] = tiktoken.get_encoding("o200k_base")
+    return _encoders[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """토큰 수를 계산합니다. tiktoken이 없으면 문자 종류별 근사치를 사용합니다."""
+    encoder = _encoder(model)
+    if encoder is not None:
+        return len(encoder.encode(text))
+    # 근사: 영문/숫자/기호는 약 4자당 1토큰, 한글 등 비ASCII 문자는 1자당 약 1토큰
+    non_ascii = len(re.findall(r"[^\x00-\x7f]", text))
+    return (len(text) - non_ascii) // 4 + non_ascii + 1
+
+
+def tokenizer_name(model: str = "gpt-4o-mini") -> str:
+    return "tiktoken" if _encoder(model) is not None else "heuristic"
+
+
+@dataclass
+class Section:
+    """
+    프롬프트 구성 단위
+    Args:
+        name: 토큰 보고서에 표시될 이름
+        content: 내용
+        role: 메시지 역할 ("system" | "user")
+        stability: 내용이 바뀌는 주기 ("static" | "session" | "request") - 배치 순서 결정
+        priority: 예산 초과 시 낮은 값부터 줄이거나 제외 (required=True인 섹션은 제외하지 않음)
+        shrink: 허용 토큰 수를 받아 줄인 내용을 반환하는 함수 (없으면 통째로 제외)
+    """
+    name: str
+    content: str
+    role: str = "user"
+    stability: str = "request"
+    priority: int = 0
+    required: bool = False
+    shrink: Optional[Callable[[int], str]] = None
+    tokens: int = 0
+    order: int = 0
+
+
+@dataclass
+class BuiltPrompt:
+    messages: List[Dict[str, str]]
+    report: Dict[str, Any] = field(default_factory=dict)
+
+
+class PromptBuilder:
+    """
+    메시지 순서 정규화 + 토큰 예산을 적용하는 프롬프트 조립기
+    - 역할/안정성 순서로 섹션을 배치하여 호출 간 공통 prefix를 최대화
+    - 같은 역할의 연속 섹션은 하나의 메시지로 합침
+    - 예산(budget - reserve_output)을 넘으면 우선순위가 낮은 섹션부터 축소/제외
+    """
+
+    def __init__(self, model: str = "gpt-4o-mini", budget: Optional[int] = None, reserve_output: int = 1024):
+        self.model = model
+        self.budget = budget
+        self.reserve_output = reserve_output
+        self.sections: List[Section] = []
+
+    def add(self, name: str, content: str, role: str = "user", stability: str = "request", priority: int = 0,
+            required: bool = False, shrink: Optional[Callable[[int], str]] = None) -> "PromptBuilder":
+        self.sections.append(Section(name, content, role, stability, priority, required, shrink,
+                                     order=len(self.sections)))
+        return self
+
+    def system(self, name: str, content: str, **kwargs) -> "PromptBuilder":
+        """고정 지침 (항상 포함, 가장 앞에 배치)"""
+        kwargs.setdefault("stability", "static")
+        kwargs.setdefault("required", True)
+        return self.add(name, content, role="system", **kwargs)
+
+    def _fit(self, sections: List[Section]) -> List[str]:
+        limit = self.budget - self.reserve_output
+        total = sum(s.tokens for s in sections)
+        trimmed = []
+        for section in sorted(sections, key=lambda s: (s.priority, -s.order)):
+            if total <= limit:
+                break
+            if section.required:
+                continue
+            allowed = section.tokens - (total - limit)
+            if section.shrink is not None and allowed > 0:
+                section.content = section.shrink(allowed)
+                tokens = count_tokens(section.content, self.model)
+                total -= section.tokens - tokens
+                section.tokens = tokens
+                trimmed.append(f"{section.name} (축소)")
+            else:
+                total -= section.tokens
+                section.tokens = 0
+                section.content = ""
+                trimmed.append(section.name)
+        return trimmed
+
+    def build(self) -> BuiltPrompt:
+        sections = sorted(
+            self.sections,
+            key=lambda s: (ROLE_ORDER.get(s.role, 1), STABILITY_ORDER.get(s.stability, 2), s.order),
+        )
+        for section in sections:
+            section.tokens = count_tokens(section.content, self.model)
+        trimmed = self._fit(sections) if self.budget else []
+
+        messages: List[Dict[str, str]] = []
+        for section in sections:
+            if not section.content:
+                continue
+            if messages and messages[-1]["role"] == section.role:
+                messages[-1]["content"] += "\n\n" + section.content
+            else:
+                messages.append({"role": section.role, "content": section.content})
+
+        # 메시지 구분 토큰 근사 (메시지당 약 4토큰 + 응답 시작 3토큰)
+        prompt_tokens = sum(count_tokens(m["content"], self.model) + 4 for m in messages) + 3
+        static_tokens = sum(s.tokens for s in sections if s.stability == "static")
+        report = {
+            "model": self.model,
+            "tokenizer": tokenizer_name(self.model),
+            "prompt_tokens": prompt_tokens,
+            "static_prefix_tokens": static_tokens,
+            "budget": self.budget,
+            "sections": {s.name: s.tokens for s in sections},
+            "trimmed": trimmed,
+        }
+        return BuiltPrompt(messages, report)
+
+
+def log_prompt_report(label: str, report: Dict[str, Any]):
+    """프롬프트 토큰 보고 (MCP stdio 서버에서도 쓸 수 있도록 stderr로 출력)"""
+    trimmed = f", 제외/축소: {report['trimmed']}" if report["trimmed"] else ""
+    print(
+        f"[prompt] {label}: {report['prompt_tokens']} tokens "
+        f"(고정 prefix {report['static_prefix_tokens']}, {report['tokenizer']}){trimmed}",
+        file=sys.stderr,
+    )
@@ -0,0 +1,569 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from .clients import get_async_client, get_sync_client, provider_api_key
+from .llm_executor import estimate_tokens, get_llm_executor
+from .tracing import Span, span
+
+# 공급자별 지원 기능 (각 공급자의 OpenAI 호환 API 기준)
+PROVIDER_CAPABILITIES: Dict[str, Set[str]] = {
+    "openai": {"stream", "tools", "json_schema"},
+    "google": {"stream", "tools", "json_schema"},
+    "anthropic": {"stream", "tools"},
+}
+
+# 요청한 모델 이름 -> 같은 요청을 처리할 수 있는 (공급자, 모델) 후보 (첫 번째가 기본값)
+# LLM_PROVIDERS로 켠 공급자 중 API 키가 설정된 공급자만 후보로 사용하며 (기본: openai만),
+# LLM_ROUTES 환경 변수(JSON)로 모델별 후보를 덮어쓸 수 있음
+DEFAULT_ROUTES: Dict[str, List[Tuple[str, str]]] = {
+    "gpt-4o-mini": [("openai", "gpt-4o-mini"), ("google", "gemini-2.0-flash"), ("anthropic", "claude-3-5-haiku-latest")],
+    "gpt-4.1-mini": [("openai", "gpt-4.1-mini"), ("google", "gemini-2.0-flash"), ("anthropic", "claude-3-5-haiku-latest")],
+    "gpt-4o": [("openai", "gpt-4o"), ("google", "gemini-2.5-pro"), ("anthropic", "claude-sonnet-4-0")],
+    "gpt-4.1": [("openai", "gpt-4.1"), ("google", "gemini-2.5-pro"), ("anthropic", "claude-sonnet-4-0")],
+}
+
+
+def required_capabilities(stream: bool, options: Dict[str, Any]) -> Set[str]:
+    """요청 인자로부터 필요한 기능을 구합니다."""
+    required = set()
+    if stream:
+        required.add("stream")
+    if options.get("tools"):
+        required.add("tools")
+    response_format = options.get("response_format")
+    if isinstance(response_format, dict) and response_format.get("type") == "json_schema":
+        required.add("json_schema")
+    return required
+
+
+# ---- 공급자 ----
+
+class Provider(ABC):
+    """LLM 공급자 (요청 인자와 응답 객체는 OpenAI chat completions 형식)"""
+
+    name = "provider"
+    capabilities: Set[str] = set()
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def complete(self, model: str, messages: List[Dict[str, Any]], temperature: float, **options):
+        """ChatCompletion을 반환합니다."""
+        pass
+
+    @abstractmethod
+    async def stream(self, model: str, messages: List[Dict[str, Any]], temperature: float, **options) -> AsyncIterator[Any]:
+        """응답 청크의 비동기 iterator를 반환합니다. (연결까지만 기다림)"""
+        pass
+
+    @abstractmethod
+    def complete_sync(self, model: str, messages: List[Dict[str, Any]], temperature: float, **options):
+        """complete의 동기 버전"""
+        pass
+
+    @abstractmethod
+    def stream_sync(self, model: str, messages: List[Dict[str, Any]], temperature: float, **options) -> Iterator[Any]:
+        """stream의 동기 버전 (응답 청크의 iterator)"""
+        pass
+
+
+class OpenAICompatibleProvider(Provider):
+    """OpenAI 호환 API 공급자 (OpenAI, Anthropic, Google). 공용 연결 풀 클라이언트 사용"""
+
+    def __init__(self, name: str, capabilities: Optional[Iterable[str]] = None):
+        self.name = name
+        self.capabilities = set(capabilities if capabilities is not None else PROVIDER_CAPABILITIES.get(name, {"stream"}))
+
+    def available(self) -> bool:
+        return bool(provider_api_key(self.name))
+
+    async def complete(self, model, messages, temperature, **options):
+        return await get_async_client(model, self.name).chat.completions.create(
+            model=model, messages=messages, temperature=temperature, **options
+        )
+
+    async def stream(self, model, messages, temperature, **options):
+        return await get_async_client(model, self.name).chat.completions.create(
+            model=model, messages=messages, temperature=temperature, stream=True, **options
+        )
+
+    def complete_sync(self, model, messages, temperature, **options):
+        return get_sync_client(model, self.name).chat.completions.create(
+            model=model, messages=messages, temperature=temperature, **options
+        )
+
+    def stream_sync(self, model, messages, temperature, **options):
+        return get_sync_client(model, self.name).chat.completions.create(
+            model=model, messages=messages, temperature=temperature, stream=True, **options
+        )
+
+
+# ---- 라우팅 ----
+
+@dataclass(frozen=True)
+class Candidate:
+    provider: str
+    model: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+    @property
+    def label(self) -> str:
+        """한도/캐시에 사용하는 이름 (OpenAI 모델은 기존과 같이 모델명만 사용)"""
+        return self.model if self.provider == "openai" else self.key
+
+
+@dataclass
+class RouteStats:
+    """후보별 실시간 통계 (EWMA)"""
+    latency: Optional[float] = None     # 비스트리밍 전체 응답 시간(초)
+    ttft: Optional[float] = None        # 스트리밍 첫 청크까지 시간(초)
+    error_rate: float = 0.0
+    samples: int = 0                    # 비스트리밍 요청 수
+    stream_samples: int = 0             # 스트리밍 요청 수
+    failures: int = 0                   # 연속 실패 횟수
+    cooldown_until: float = 0.0
+
+
+async def _close_stream(stream: Any):
+    close = getattr(stream, "aclose", None) or getattr(stream, "close", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
+    except Exception:
+        pass
+
+
+class ProviderRouter:
+    """
+    여러 공급자/모델 중에서 요청마다 가장 빠른 정상 후보로 보내는 라우터
+    - 후보별 지연 시간(비스트리밍: 전체, 스트리밍: 첫 청크)과 오류율을 EWMA로 추적
+    - 요청에 필요한 기능(스트리밍, tools, json_schema)을 지원하는 후보만 사용
+    - 연속 실패한 후보는 cooldown 동안 제외 (실패가 이어지면 cooldown을 두 배씩 늘림)
+    - 실패하면 다음 후보로 전환하고, 평소 지연의 hedge_factor배를 넘기면 다음 후보에 같은 요청을 보내 먼저 끝난 결과 사용
+      (스트리밍은 첫 청크를 받기 전까지만 전환/hedge)
+    - 요청 자체는 LLMExecutor를 거치므로 공급자/모델별 한도와 우선순위가 그대로 적용됨
+    """
+
+    def __init__(
+        self,
+        providers: Iterable[Provider],
+        routes: Optional[Dict[str, List[Tuple[str, str]]]] = None,
+        alpha: float = 0.3,
+        error_penalty: float = 4.0,
+        failure_threshold: int = 3,
+        cooldown: float = 15.0,
+        max_cooldown: float = 300.0,
+        hedge_factor: float = 2.0,
+        hedge_min: float = 0.5,
+        explore: float = 0.05,
+        seed: Optional[int] = None,
+    ):
+        self.providers: Dict[str, Provider] = {p.name: p for p in providers}
+        self.routes: Dict[str, List[Candidate]] = {}
+        for model, candidates in (routes or {}).items():
+            self.set_route(model, candidates)
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.hedge_factor = hedge_factor
+        self.hedge_min = hedge_min
+        self.explore = explore
+        self._random = random.Random(seed)
+        self._stats: Dict[Candidate, RouteStats] = {}
+        self._counters = {"requests": 0, "failovers": 0, "hedged": 0, "hedge_wins": 0}
+        self._lock = threading.Lock()
+
+    # ---- 설정 ----
+    def set_route(self, model: str, candidates: Iterable[Union[Candidate, Tuple[str, str], List[str]]]):
+        """model 요청에 사용할 후보 목록을 지정합니다. (앞쪽일수록 통계가 없을 때 우선)"""
+        self.routes[model] = [c if isinstance(c, Candidate) else Candidate(*c) for c in candidates]
+
+    def _route(self, model: str) -> List[Candidate]:
+        if model in self.routes:
+            return self.routes[model]
+        # 라우팅 표에 없는 모델은 이름 그대로 처리할 수 있는 첫 공급자로 (기본 OpenAI)
+        provider = "openai" if "openai" in self.providers else next(iter(self.providers))
+        return [Candidate(provider, model)]
+
+    # ---- 통계 ----
+    def _stat(self, candidate: Candidate) -> RouteStats:
+        stat = self._stats.get(candidate)
+        if stat is None:
+            stat = self._stats[candidate] = RouteStats()
+        return stat
+
+    def record(self, candidate: Candidate, seconds: Optional[float], ok: bool, stream: bool = False):
+        """요청 결과를 통계에 반영합니다. (seconds가 None이면 오류율만 갱신)"""
+        with self._lock:
+            stat = self._stat(candidate)
+            if stream:
+                stat.stream_samples += 1
+            else:
+                stat.samples += 1
+            stat.error_rate += self.alpha * ((0.0 if ok else 1.0) - stat.error_rate)
+            if ok:
+                stat.failures = 0
+                stat.cooldown_until = 0.0
+                if seconds is not None:
+                    self._observe(stat, seconds, stream)
+            else:
+                stat.failures += 1
+                if stat.failures >= self.failure_threshold:
+                    backoff = self.cooldown * (2 ** (stat.failures - self.failure_threshold))
+                    stat.cooldown_until = time.monotonic() + min(self.max_cooldown, backoff)
+
+    def _observe(self, stat: RouteStats, seconds: float, stream: bool):
+        field_name = "ttft" if stream else "latency"
+        previous = getattr(stat, field_name)
+        setattr(stat, field_name, seconds if previous is None else previous + self.alpha * (seconds - previous))
+
+    def record_cancelled(self, candidate: Candidate, seconds: float, stream: bool = False):
+        """hedge에서 져서 취소된 요청: 실제 지연은 최소 seconds이므로 평소보다 느렸으면 지연 통계에 반영"""
+        with self._lock:
+            stat = self._stat(candidate)
+            current = stat.ttft if stream else stat.latency
+            if current is not None and seconds > current:
+                self._observe(stat, seconds, stream)
+
+    def _score(self, candidate: Candidate, stream: bool) -> float:
+        stat = self._stats.get(candidate)
+        value = None if stat is None else (stat.ttft if stream else stat.latency)
+        if value is None:
+            # 이 방식(스트리밍/비스트리밍)으로 시도한 적 없는 후보는 먼저 한 번 측정하고, 실패만 한 후보는 뒤로
+            tried = 0 if stat is None else (stat.stream_samples if stream else stat.samples)
+            return 0.0 if tried == 0 else float("inf")
+        return value * (1 + self.error_penalty * stat.error_rate)
+
+    def _hedge_after(self, candidate: Candidate, stream: bool) -> Optional[float]:
+        with self._lock:
+            stat = self._stats.get(candidate)
+            value = None if stat is None else (stat.ttft if stream else stat.latency)
+        if value is None:
+            return None
+        return max(self.hedge_min, value * self.hedge_factor)
+
+    def candidates(self, model: str, required: Set[str] = frozenset(), stream: bool = False) -> List[Candidate]:
+        """필요 기능을 지원하는 후보를 시도 순서대로 반환합니다. (cooldown 중인 후보는 맨 뒤)"""
+        route = self._route(model)
+        usable = [
+            c for c in route
+            if c.provider in self.providers
+            and required <= self.providers[c.provider].capabilities
+            and self.providers[c.provider].available()
+        ]
+        if not usable:
+            raise RuntimeError(f"'{model}' 요청을 처리할 수 있는 공급자가 없습니다. (필요 기능: {sorted(required)})")
+        now = time.monotonic()
+        with self._lock:
+            order = {c: i for i, c in enumerate(route)}
+            healthy = [c for c in usable if self._stat(c).cooldown_until <= now]
+            cooling = sorted((c for c in usable if c not in healthy), key=lambda c: self._stats[c].cooldown_until)
+            healthy.sort(key=lambda c: (self._score(c, stream), order[c]))
+        # 가끔 다른 후보를 먼저 시도하여 지연 통계를 최신으로 유지
+        if len(healthy) > 1 and self._random.random() < self.explore:
+            healthy.insert(0, healthy.pop(self._random.randrange(1, len(healthy))))
+        return healthy + cooling
+
+    def preferred(self, model: str, stream: bool = False, **options) -> Candidate:
+        """지금 요청하면 먼저 시도할 후보 (캐시 조회 키 등에 사용)"""
+        return self.candidates(model, required_capabilities(stream, options), stream=stream)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """후보별 통계와 전환/hedge 횟수를 반환합니다."""
+        now = time.monotonic()
+        with self._lock:
+            routes = {
+                c.key: {
+                    "latency": s.latency,
+                    "ttft": s.ttft,
+                    "error_rate": round(s.error_rate, 4),
+                    "samples": s.samples,
+                    "stream_samples": s.stream_samples,
+                    "cooling_down": s.cooldown_until > now,
+                }
+                for c, s in self._stats.items()
+            }
+            return {"routes": routes, **self._counters}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    # ---- 실행 ----
+    @staticmethod
+    def _routed(candidate: Candidate, trace_parent: Optional[Span], on_route: Optional[Callable[[Candidate], None]]):
+        if trace_parent is not None:
+            trace_parent.set(provider=candidate.provider, routed_model=candidate.model)
+        if on_route is not None:
+            on_route(candidate)
+
+    async def _race(self, candidates: List[Candidate], attempt, stream: bool, hedge: bool):
+        """
+        candidates 순서대로 attempt(candidate, last)를 실행합니다.
+        실패하면 다음 후보로 넘어가고, hedge이면 지연이 길어질 때 다음 후보를 함께 실행해 먼저 성공한 결과 사용
+        """
+        pending = list(candidates)
+        running: Dict[asyncio.Future, Candidate] = {}
+        hedged: Set[asyncio.Future] = set()
+        last_error: Optional[BaseException] = None
+
+        def launch(is_hedge: bool = False):
+            candidate = pending.pop(0)
+            task = asyncio.ensure_future(attempt(candidate, not pending))
+            running[task] = candidate
+            if is_hedge:
+                hedged.add(task)
+
+        self._count("requests")
+        launch()
+        try:
+            while running:
+                timeout = None
+                if hedge and pending and len(running) == 1:
+                    timeout = self._hedge_after(next(iter(running.values())), stream)
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._count("hedged")
+                    launch(is_hedge=True)
+                    continue
+                for task in done:
+                    running.pop(task)
+                    if task.exception() is None:
+                        if task in hedged:
+                            self._count("hedge_wins")
+                        return task.result()
+                    last_error = task.exception()
+                if not running and pending:
+                    self._count("failovers")
+                    launch()
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def complete(self, model: str, messages: List[Dict[str, Any]], temperature: float = 0.7,
+                       priority: int = 1, hedge: bool = True, trace_parent: Optional[Span] = None,
+                       on_route: Optional[Callable[[Candidate], None]] = None, **options):
+        """비스트리밍 요청 (ChatCompletion 반환). on_route: 실제로 응답한 후보를 전달받는 콜백"""
+        candidates = self.candidates(model, required_capabilities(False, options))
+        tokens = estimate_tokens(messages)
+        executor = get_llm_executor()
+
+        async def attempt(candidate: Candidate, last: bool):
+            provider = self.providers[candidate.provider]
+            with span("llm.attempt", parent=trace_parent, provider=candidate.provider, model=candidate.model):
+                start = time.perf_counter()
+                try:
+                    result = await executor.submit(
+                        lambda: provider.complete(candidate.model, messages, temperature, **options),
+                        model=candidate.label,
+                        priority=priority,
+                        tokens=tokens,
+                        # 후보가 하나뿐이면 같은 공급자로 hedge, 남은 후보가 있으면 재시도 대신 전환
+                        hedge=hedge and len(candidates) == 1,
+                        max_retries=None if last else 0,
+                    )
+                except asyncio.CancelledError:
+                    self.record_cancelled(candidate, time.perf_counter() - start)
+                    raise
+                except Exception:
+                    self.record(candidate, None, False)
+                    raise
+                self.record(candidate, time.perf_counter() - start, True)
+                return candidate, result
+
+        candidate, result = await self._race(candidates, attempt, stream=False, hedge=hedge)
+        self._routed(candidate, trace_parent, on_route)
+        return result
+
+    async def stream(self, model: str, messages: List[Dict[str, Any]], temperature: float = 0.7,
+                     priority: int = 1, hedge: bool = True, trace_parent: Optional[Span] = None,
+                     on_route: Optional[Callable[[Candidate], None]] = None, **options):
+        """스트리밍 요청 (ChatCompletionChunk 비동기 제너레이터). 첫 청크를 받기 전까지만 전환/hedge"""
+        candidates = self.candidates(model, required_capabilities(True, options), stream=True)
+        tokens = estimate_tokens(messages)
+        executor = get_llm_executor()
+
+        async def attempt(candidate: Candidate, last: bool):
+            provider = self.providers[candidate.provider]
+            with span("llm.attempt", parent=trace_parent, provider=candidate.provider, model=candidate.model,
+                      stream=True):
+                start = time.perf_counter()
+                response = None
+                try:
+                    response = await executor.submit(
+                        lambda: provider.stream(candidate.model, messages, temperature, **options),
+                        model=candidate.label,
+                        priority=priority,
+                        tokens=tokens,
+                        max_retries=None if last else 0,
+                        stream=True,
+                    )
+                    iterator = response.__aiter__()
+                    try:
+                        first = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        first = None
+                except asyncio.CancelledError:
+                    # hedge에서 진 요청: 열린 HTTP 스트림을 닫음
+                    self.record_cancelled(candidate, time.perf_counter() - start, stream=True)
+                    if response is not None:
+                        await _close_stream(response)
+                    raise
+                except Exception:
+                    if response is not None:
+                        await _close_stream(response)
+                    self.record(candidate, None, False, stream=True)
+                    raise
+                self.record(candidate, time.perf_counter() - start, True, stream=True)
+                return candidate, response, iterator, first
+
+        candidate, response, iterator, first = await self._race(candidates, attempt, stream=True, hedge=hedge)
+        self._routed(candidate, trace_parent, on_route)
+        try:
+            if first is not None:
+                yield first
+            async for chunk in iterator:
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            raise
+        except Exception:
+            # 스트림 도중 끊김은 오류율에만 반영 (이미 보낸 청크가 있어 전환하지 않음)
+            self.record(candidate, None, False, stream=True)
+            raise
+        finally:
+            await _close_stream(response)
+
+    def complete_sync(self, model: str, messages: List[Dict[str, Any]], temperature: float = 0.7,
+                      on_route: Optional[Callable[[Candidate], None]] = None, **options):
+        """동기 비스트리밍 요청 (실패하면 다음 후보로 전환, hedge 없음)"""
+        candidates = self.candidates(model, required_capabilities(False, options))
+        tokens = estimate_tokens(messages)
+        executor = get_llm_executor()
+        self._count("requests")
+        last_error: Optional[BaseException] = None
+        for index, candidate in enumerate(candidates):
+            provider = self.providers[candidate.provider]
+            last = index == len(candidates) - 1
+            with span("llm.attempt", provider=candidate.provider, model=candidate.model):
+                start = time.perf_counter()
+                try:
+                    result = executor.run_sync(
+                        lambda: provider.complete_sync(candidate.model, messages, temperature, **options),
+                        model=candidate.label,
+                        tokens=tokens,
+                        max_retries=None if last else 0,
+                    )
+                except Exception as e:
+                    self.record(candidate, None, False)
+                    last_error = e
+                    if not last:
+                        self._count("failovers")
+                    continue
+                self.record(candidate, time.perf_counter() - start, True)
+                self._routed(candidate, None, on_route)
+                return result
+        raise last_error
+
+    def stream_sync(self, model: str, messages: List[Dict[str, Any]], temperature: float = 0.7,
+                    on_route: Optional[Callable[[Candidate], None]] = None, **options):
+        """동기 스트리밍 요청 (첫 청크를 받기 전까지만 다음 후보로 전환)"""
+        candidates = self.candidates(model, required_capabilities(True, options), stream=True)
+        tokens = estimate_tokens(messages)
+        executor = get_llm_executor()
+        self._count("requests")
+        last_error: Optional[BaseException] = None
+        for index, candidate in enumerate(candidates):
+            provider = self.providers[candidate.provider]
+            last = index == len(candidates) - 1
+            start = time.perf_counter()
+            response = None
+            try:
+                response = executor.run_sync(
+                    lambda: provider.stream_sync(candidate.model, messages, temperature, **options),
+                    model=candidate.label,
+                    tokens=tokens,
+                    max_retries=None if last else 0,
+                )
+                iterator = iter(response)
+                first = next(iterator, None)
+            except Exception as e:
+                if response is not None and hasattr(response, "close"):
+                    response.close()
+                self.record(candidate, None, False, stream=True)
+                last_error = e
+                if not last:
+                    self._count("failovers")
+                continue
+            self.record(candidate, time.perf_counter() - start, True, stream=True)
+            self._routed(candidate, None, on_route)
+            try:
+                if first is not None:
+                    yield first
+                for chunk in iterator:
+                    yield chunk
+            except GeneratorExit:
+                raise
+            except Exception:
+                self.record(candidate, None, False, stream=True)
+                raise
+            finally:
+                if hasattr(response, "close"):
+                    response.close()
+            return
+        raise last_error
+
+
+def _load_routes() -> Dict[str, List[Tuple[str, str]]]:
+    routes = {model: list(candidates) for model, candidates in DEFAULT_ROUTES.items()}
+    override = os.getenv("LLM_ROUTES")
+    if override:
+        for model, candidates in json.loads(override).items():
+            routes[model] = [tuple(c) for c in candidates]
+    return routes
+
+
+_router: Optional[ProviderRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_provider_router() -> ProviderRouter:
+    """
+    프로세스 공용 라우터
+    - LLM_PROVIDERS: 사용할 공급자 목록 (쉼표 구분, 기본: openai만 사용)
+      다른 공급자로 넘기려면 명시적으로 지정 (예: "openai,google,anthropic", API 키가 있는 공급자만 사용)
+    - LLM_ROUTES: 모델별 후보 목록 JSON. 예: {"gpt-4o-mini": [["openai", "gpt-4o-mini"], ["google", "gemini-2.0-flash"]]}
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            names = [n.strip() for n in os.getenv("LLM_PROVIDERS", "openai").split(",") if n.strip()]
+            _router = ProviderRouter(
+                [OpenAICompatibleProvider(name) for name in names],
+                routes=_load_routes(),
+                hedge_factor=float(os.getenv("LLM_HEDGE_FACTOR", "2.0")),
+            )
+        return _router
+
+
+def set_provider_router(router: Optional[ProviderRouter]):
+    """공용 라우터를 교체합니다. (예: 테스트용 공급자로 구성한 라우터, None이면 다음 호출 때 다시 생성)"""
+    global _router
+    with _router_lock:
+        _router = router
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 라우팅 결정 로그 (프로젝트 루트의 .cache, ROUTER_LOG_PATH로 변경 가능)
+DEFAULT_LOG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "router_decisions.jsonl"
+)
+
+DEFAULT_MODELS = ("gpt-4o-mini", "gpt-4o")
+
+
+def normalize_prompt(text: str) -> str:
+    """대소문자, 공백, 문장부호 차이를 무시하도록 프롬프트를 정규화합니다."""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def _prompt_key(text: str) -> str:
+    return hashlib.sha256(normalize_prompt(text).encode("utf-8")).hexdigest()
+
+
+def _features(text: str) -> List[str]:
+    """단어 토큰 + 한글 2글자 조각 + 길이 구간 (조사/어미가 붙어도 같은 특징이 나오도록)"""
+    normalized = normalize_prompt(text)
+    words = normalized.split()
+    features = [f"w:{w}" for w in words]
+    for w in words:
+        if re.fullmatch(r"[가-힣]+", w) and len(w) > 2:
+            features.extend(f"c:{w[i:i + 2]}" for i in range(len(w) - 1))
+    features.append(f"len:{min(len(normalized) // 50, 10)}")
+    return features
+
+
+def _feature_ids(text: str) -> List[str]:
+    """특징을 해시한 값 (결정 로그에 프롬프트 원문/단어가 남지 않도록 학습/예측 모두 해시값 사용)"""
+    return [hashlib.blake2b(f.encode("utf-8"), digest_size=8).hexdigest() for f in _features(text)]
+
+
+class NaiveBayesRouter:
+    """라우팅 결정 로그로 학습하는 다항 나이브 베이즈 분류기 (증분 학습)"""
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.class_counts: Counter = Counter()
+        self.feature_counts: Dict[str, Counter] = {}
+        self.feature_totals: Counter = Counter()
+        self.vocabulary: set = set()
+
+    @property
+    def samples(self) -> int:
+        return sum(self.class_counts.values())
+
+    def learn(self, features: List[str], label: str):
+        """특징 목록(_feature_ids)과 라벨을 학습합니다."""
+        self.class_counts[label] += 1
+        counts = self.feature_counts.setdefault(label, Counter())
+        counts.update(features)
+        self.feature_totals[label] += len(features)
+        self.vocabulary.update(features)
+
+    def predict(self, features: List[str]) -> Tuple[Optional[str], float]:
+        """(가장 가능성 높은 라벨, 사후 확률)을 반환합니다. 학습 데이터가 없으면 (None, 0.0)"""
+        if not self.class_counts:
+            return None, 0.0
+        total = self.samples
+        vocab = len(self.vocabulary) + 1
+        scores = {}
+        for label, count in self.class_counts.items():
+            counts = self.feature_counts[label]
+            denominator = self.feature_totals[label] + self.alpha * vocab
+            score = math.log(count / total)
+            for feature in features:
+                score += math.log((counts[feature] + self.alpha) / denominator)
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        # log-sum-exp로 사후 확률 계산
+        peak = scores[best]
+        normalizer = sum(math.exp(s - peak) for s in scores.values())
+        return best, 1.0 / normalizer
+
+
+class ModelRouter:
+    """
+    모델 라우터
+    - 1단계: 정규화한 프롬프트가 이전에 라우팅된 적이 있으면 그 결정을 그대로 사용
+    - 2단계: 결정 로그로 학습한 분류기의 확신도가 threshold 이상이면 사용
+      (두 모델 이상이 각각 min_class_samples번 이상 선택된 뒤부터. 한쪽 라벨만 있으면 사후 확률이 항상 1이므로)
+    - 그 외에는 LLM 라우터(fallback)를 호출하고 결과를 로그에 남겨 이후 학습에 반영
+    - 분류기로 판단할 수 있어도 audit_rate 비율은 LLM 라우터에 물어 로그가 한쪽 라벨로 굳지 않도록 함
+    - 로그에는 프롬프트 원문 대신 정규화한 프롬프트의 해시와 해시한 특징만 저장
+    """
+
+    def __init__(
+        self,
+        models: Sequence[str] = DEFAULT_MODELS,
+        default: Optional[str] = None,
+        log_path: Optional[str] = DEFAULT_LOG_PATH,
+        threshold: float = 0.9,
+        min_samples: int = 30,
+        min_class_samples: int = 5,
+        audit_rate: float = 0.05,
+        cache_size: int = 5000,
+    ):
+        self.models = tuple(models)
+        self.default = default or self.models[0]
+        self.log_path = log_path
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.min_class_samples = min_class_samples
+        self.audit_rate = audit_rate
+        self.cache_size = cache_size
+        self.classifier = NaiveBayesRouter()
+        self.stats = {"cache": 0, "classifier": 0, "llm": 0}
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.log_path or not os.path.exists(self.log_path):
+            return
+        records = []
+        legacy = False
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "prompt" in record:
+                    # 예전 형식(프롬프트 원문) -> 해시 형식으로 변환하여 다시 저장
+                    legacy = True
+                    record = self._log_record(record["prompt"], record.get("model"))
+                records.append(record)
+                if record.get("model") in self.models:
+                    self._remember(record["key"], record["features"], record["model"])
+        if legacy:
+            tmp_path = self.log_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+            os.replace(tmp_path, self.log_path)
+
+    @staticmethod
+    def _log_record(prompt: str, model: Optional[str]) -> Dict[str, object]:
+        return {"key": _prompt_key(prompt), "features": _feature_ids(prompt), "model": model}
+
+    def _remember(self, key: str, features: List[str], model: str):
+        self._cache[key] = model
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        self.classifier.learn(features, model)
+
+    def _classifier_ready(self) -> bool:
+        """분류기를 믿을 만큼 두 개 이상의 라벨이 충분히 쌓였는지 확인합니다."""
+        counts = self.classifier.class_counts
+        return (
+            self.classifier.samples >= self.min_samples
+            and len(counts) >= 2
+            and min(counts.values()) >= self.min_class_samples
+        )
+
+    def parse_model(self, text: str) -> str:
+        """LLM 라우터 응답에서 모델명을 추출합니다. (알 수 없는 응답이면 기본 모델)"""
+        text = text.strip().strip("`'\"").lower()
+        # 긴 이름부터 비교 ('gpt-4o-mini'가 'gpt-4o'로 잘못 매칭되지 않도록)
+        for model in sorted(self.models, key=len, reverse=True):
+            if model.lower() in text:
+                return model
+        return self.default
+
+    def predict(self, prompt: str) -> Tuple[Optional[str], str]:
+        """로컬 판단만으로 (모델, 근거)를 반환합니다. 확신할 수 없으면 (None, "llm")"""
+        with self._lock:
+            model = self._cache.get(_prompt_key(prompt))
+            if model is not None:
+                self._cache.move_to_end(_prompt_key(prompt))
+                self.stats["cache"] += 1
+                return model, "cache"
+            if self._classifier_ready() and random.random() >= self.audit_rate:
+                model, confidence = self.classifier.predict(_feature_ids(prompt))
+                if model is not None and confidence >= self.threshold:
+                    self.stats["classifier"] += 1
+                    return model, "classifier"
+        return None, "llm"
+
+    def record(self, prompt: str, model: str):
+        """LLM 라우팅 결과를 캐시/분류기/로그에 반영합니다."""
+        record = self._log_record(prompt, model)
+        with self._lock:
+            self.stats["llm"] += 1
+            self._remember(record["key"], record["features"], model)
+            if self.log_path:
+                os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def route(self, prompt: str, fallback: Callable[[], str]) -> Tuple[str, str]:
+        """
+        사용할 모델을 결정합니다.
+        Args:
+            prompt: 사용자 프롬프트
+            fallback: 로컬 판단이 불확실할 때 호출할 LLM 라우터 (모델명 텍스트 반환)
+        Returns:
+            (모델명, 근거: "cache" | "classifier" | "llm")
+        """
+        model, source = self.predict(prompt)
+        if model is None:
+            model = self.parse_model(fallback())
+            self.record(prompt, model)
+        return model, source
+
+    async def route_async(self, prompt: str, fallback: Callable[[], Awaitable[str]]) -> Tuple[str, str]:
+        """route의 비동기 버전"""
+        model, source = self.predict(prompt)
+        if model is None:
+            model = self.parse_model(await fallback())
+            self.record(prompt, model)
+        return model, source
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """
+    프로세스 공용 라우터를 반환합니다. (최초 호출 시 결정 로그로 학습)
+    환경 변수:
+        ROUTER_LOG_PATH         결정 로그(JSONL) 경로
+        ROUTER_THRESHOLD        분류기 결과를 사용할 최소 확신도
+        ROUTER_MIN_SAMPLES      분류기를 사용하기 위한 최소 학습 샘플 수
+        ROUTER_MIN_CLASS_SAMPLES  분류기를 사용하기 위한 모델별 최소 학습 샘플 수
+        ROUTER_AUDIT_RATE       분류기로 판단할 수 있어도 LLM 라우터에 묻는 비율
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter(
+                log_path=os.getenv("ROUTER_LOG_PATH", DEFAULT_LOG_PATH),
+                threshold=float(os.getenv("ROUTER_THRESHOLD", 0.9)),
+                min_samples=int(os.getenv("ROUTER_MIN_SAMPLES", 30)),
+                min_class_samples=int(os.getenv("ROUTER_MIN_CLASS_SAMPLES", 5)),
+                audit_rate=float(os.getenv("ROUTER_AUDIT_RATE", 0.05)),
+            )
+        return _router
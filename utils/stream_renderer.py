@@ -0,0 +1,128 @@
+import re
+import time
+from typing import Any, List
+
+_FENCE = re.compile(r"^\s*(```|~~~)", re.MULTILINE)
+_LIST_ITEM = re.compile(r"^\s*([-*+]|\d+[.)])(\s|$)")
+# 참조형 링크 정의 ([id]: url)
+_LINK_DEFINITION = re.compile(r"^ {0,3}\[[^\]]+\]:[ \t]*\S.*$", re.MULTILINE)
+
+
+def _safe_boundary(text: str) -> int:
+    """
+    text 안에서 완성된 블록이 끝나는 마지막 위치(빈 줄 다음 블록의 시작)를 반환합니다. 없으면 0
+    - 코드 블럭(```)이나 수식 블럭($$) 내부의 빈 줄은 경계로 보지 않음
+    - 빈 줄 다음 줄이 들여쓰기되어 있거나(목록 항목의 이어지는 문단, 들여쓴 코드 블럭)
+      목록 안에서 다음 항목이 이어지면 경계로 보지 않음 (따로 그리면 번호가 다시 시작되거나 코드 블럭으로 바뀜)
+    - 다음 줄이 아직 수신 중이면 블록 종류를 알 수 없으므로 경계로 보지 않음
+    """
+    boundary = 0
+    in_code = False
+    in_math = False
+    in_list = False
+    after_blank = False
+    position = 0
+    for line in text.splitlines(keepends=True):
+        start, position = position, position + len(line)
+        if in_code:
+            if _FENCE.match(line):
+                in_code = False
+            continue
+        if in_math:
+            if line.count("$$") % 2 == 1:
+                in_math = False
+            continue
+        if not line.strip():
+            after_blank = True
+            continue
+        if not line.endswith("\n"):
+            break
+        item = _LIST_ITEM.match(line) is not None
+        if after_blank and line[0] not in " \t" and not (in_list and item):
+            boundary = start
+            in_list = item
+        elif item:
+            in_list = True
+        after_blank = False
+        if _FENCE.match(line):
+            in_code = True
+        elif line.count("$$") % 2 == 1:
+            in_math = True
+    return boundary
+
+
+class StreamRenderer:
+    """
+    스트리밍 응답을 일정 간격으로 모아서 표시하는 렌더러 (Streamlit 컨테이너용)
+    - 청크는 버퍼에 쌓아 두고 interval(초)마다 또는 max_pending 글자가 쌓이면 한 번만 다시 그림
+    - 완성된 블록(코드/수식 블럭 밖의 빈 줄까지)은 별도 요소로 확정하고, 이후에는 마지막 블록(tail)만 다시 그림
+      -> 응답이 길어져도 매 갱신 비용은 tail 길이에 비례
+    - 참조형 링크 정의([id]: url)는 종료 시 확정된 모든 요소에 덧붙여 다시 그림 (요소마다 따로 렌더링되므로)
+    """
+
+    def __init__(self, container: Any, interval: float = 0.05, max_pending: int = 2000, cursor: str = "▌"):
+        self.container = container
+        self.interval = interval
+        self.max_pending = max_pending
+        self.cursor = cursor
+        self._blocks: List[str] = []
+        self._elements: List[Any] = []
+        self._tail: List[str] = []
+        self._pending = 0
+        self._last_render = 0.0
+        self._placeholder = container.empty()
+
+    @property
+    def text(self) -> str:
+        """지금까지 받은 전체 응답"""
+        return "".join(self._blocks) + "".join(self._tail)
+
+    def feed(self, chunk: str):
+        if not chunk:
+            return
+        self._tail.append(chunk)
+        self._pending += len(chunk)
+        if self._pending >= self.max_pending or time.monotonic() - self._last_render >= self.interval:
+            self.flush()
+
+    def feed_many(self, chunks: List[str]):
+        """여러 청크를 한 번에 추가하고 필요하면 한 번만 다시 그림"""
+        for chunk in chunks:
+            if chunk:
+                self._tail.append(chunk)
+                self._pending += len(chunk)
+        if self._pending and (self._pending >= self.max_pending
+                              or time.monotonic() - self._last_render >= self.interval):
+            self.flush()
+
+    def flush(self, final: bool = False):
+        tail = "".join(self._tail)
+        boundary = len(tail) if final else _safe_boundary(tail)
+        if boundary:
+            # 완성된 블록을 현재 요소에 확정하고 남은 부분은 새 요소에 표시
+            block, tail = tail[:boundary], tail[boundary:]
+            self._placeholder.markdown(block)
+            self._blocks.append(block)
+            self._elements.append(self._placeholder)
+            if tail or not final:
+                self._placeholder = self.container.empty()
+        self._tail = [tail] if tail else []
+        if tail:
+            self._placeholder.markdown(tail if final else tail + self.cursor)
+        self._pending = 0
+        self._last_render = time.monotonic()
+        if final:
+            self._apply_link_definitions()
+
+    def _apply_link_definitions(self):
+        definitions = _LINK_DEFINITION.findall(self.text)
+        if not definitions or len(self._elements) < 2:
+            return
+        suffix = "\n\n" + "\n".join(definitions)
+        for element, block in zip(self._elements, self._blocks):
+            element.markdown(block + suffix)
+
+    def close(self) -> str:
+        """남은 내용을 커서 없이 표시하고 전체 응답을 반환합니다."""
+        self.flush(final=True)
+        return self.text
@@ -0,0 +1,37 @@
+import json
+from typing import Any, Dict
+
+
+def json_schema_format(name: str, schema: Dict[str, Any], strict: bool = True) -> Dict[str, Any]:
+    """chat.completions의 response_format (json_schema 제약 출력)"""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": strict, "schema": schema}}
+
+
+def parse_structured(completion: Any) -> Any:
+    """
+    json_schema 제약 출력 응답(ChatCompletion)의 JSON을 파싱합니다.
+    거절, 최대 길이에서 잘린 응답, JSON이 아닌 응답은 빈 값으로 대신하지 않고 ValueError를 발생시킴
+    """
+    choice = completion.choices[0]
+    refusal = getattr(choice.message, "refusal", None)
+    if refusal:
+        raise ValueError(f"모델이 응답을 거절했습니다: {refusal}")
+    if choice.finish_reason == "length":
+        raise ValueError("응답이 최대 길이에서 잘렸습니다.")
+    try:
+        return json.loads(choice.message.content or "")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON 응답을 파싱할 수 없습니다: {e}") from e
+
+
+def drop_nulls(value: Any) -> Any:
+    """null 값과 비어 있는 객체를 제거합니다. (strict schema에서 null은 '변경 없음')"""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            item = drop_nulls(item)
+            if item is None or item == {}:
+                continue
+            result[key] = item
+        return result
+    return value
@@ -0,0 +1,450 @@
+import asyncio
+import contextvars
+import functools
+import json
+import math
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+# 프로젝트 루트의 .cache 디렉토리에 저장 (TRACE_PATH로 변경, TRACE_EXPORTER=sqlite|jsonl|off)
+DEFAULT_TRACE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "traces.sqlite3"
+)
+
+_current: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("trace_span", default=None)
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class Span:
+    """
+    실행 구간 1개
+    - attributes: 모델, 도구 이름 등 부가 정보
+    - events: 구간 시작 기준 경과 시간(ms). 예: first_token (첫 토큰까지 걸린 시간)
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "attributes", "events",
+                 "duration_ms", "status", "error", "_t0")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id()
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.attributes = attributes
+        self.events: Dict[str, float] = {}
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self._t0 = time.perf_counter()
+
+    def set(self, **attributes: Any) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def mark(self, event: str):
+        """이벤트 시각을 기록합니다. 같은 이벤트는 처음 한 번만 기록"""
+        if event not in self.events:
+            self.events[event] = round((time.perf_counter() - self._t0) * 1000, 3)
+
+    def record_exception(self, error: BaseException):
+        if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            self.status = "cancelled"
+        else:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"[:500]
+
+    def end(self):
+        """구간을 종료하고 exporter로 전달합니다. (두 번째 호출부터는 무시)"""
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = round((time.perf_counter() - self._t0) * 1000, 3)
+        exporter = get_exporter()
+        if exporter is not None:
+            exporter.export(self.to_dict())
+
+    def context(self) -> Dict[str, str]:
+        """다른 프로세스(MCP 서버 등)로 전달할 trace 컨텍스트"""
+        return {"trace_id": self.trace_id, "span_id": self.span_id}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "events": self.events,
+            "pid": os.getpid(),
+        }
+
+
+Parent = Union[Span, Dict[str, str], None]
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_context() -> Optional[Dict[str, str]]:
+    """현재 구간의 trace 컨텍스트 (없으면 None)"""
+    span_ = _current.get()
+    return span_.context() if span_ is not None else None
+
+
+def start_span(name: str, parent: Parent = None, **attributes: Any) -> Span:
+    """
+    구간을 시작합니다. (현재 구간으로 설정하지 않음, end()를 직접 호출)
+    - parent: Span 또는 다른 프로세스에서 전달받은 컨텍스트 dict. 없으면 현재 구간
+    """
+    if parent is None:
+        parent = _current.get()
+    if isinstance(parent, Span):
+        return Span(name, parent.trace_id, parent.span_id, attributes)
+    if isinstance(parent, dict) and parent.get("trace_id"):
+        return Span(name, parent["trace_id"], parent.get("span_id"), attributes)
+    return Span(name, _new_id(), None, attributes)
+
+
+@contextmanager
+def span(name: str, parent: Parent = None, **attributes: Any) -> Iterator[Span]:
+    """구간을 시작하고 블록 안에서 현재 구간으로 설정합니다. (하위 구간/태스크/디스패처 작업으로 전파)"""
+    span_ = start_span(name, parent, **attributes)
+    token = _current.set(span_)
+    try:
+        yield span_
+    except BaseException as e:
+        span_.record_exception(e)
+        raise
+    finally:
+        _current.reset(token)
+        span_.end()
+
+
+def traced(name: Optional[str] = None, **attributes: Any):
+    """함수 실행 전체를 구간으로 기록하는 데코레이터 (동기/비동기 함수 모두 지원)"""
+
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class SpanExporter(ABC):
+    """
+    종료된 구간을 백그라운드 스레드에서 모아서 기록하는 exporter 기본 클래스
+    - export()는 큐에 넣기만 하므로 이벤트 루프/스트리밍 경로를 막지 않음
+    """
+
+    def __init__(self, path: str, batch_size: int = 256):
+        self.path = path
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def export(self, record: Dict[str, Any]):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(record)
+
+    def _run(self):
+        self.open()
+        while True:
+            record = self._queue.get()
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            flush_marks = [r for r in batch if r is None]
+            records = [r for r in batch if r is not None]
+            try:
+                if records:
+                    self.write(records)
+            except Exception as e:
+                print(f"[trace] 기록 실패: {e}", file=sys.stderr)
+            for _ in flush_marks:
+                self._queue.task_done()
+            for _ in records:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0):
+        """큐에 남은 구간을 모두 기록할 때까지 기다립니다."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def open(self):
+        """기록 스레드가 시작될 때 한 번 호출 (필요한 exporter만 재정의)"""
+        pass
+
+    @abstractmethod
+    def write(self, records: List[Dict[str, Any]]):
+        """구간 묶음을 기록합니다. (기록 스레드에서 호출)"""
+        pass
+
+
+class JSONLExporter(SpanExporter):
+    """구간을 JSON Lines 파일에 추가"""
+
+    def write(self, records: List[Dict[str, Any]]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records))
+
+
+class SQLiteExporter(SpanExporter):
+    """
+    구간을 SQLite에 저장 (여러 프로세스가 같은 파일에 기록 가능)
+    - max_age(초)보다 오래된 구간과 최근 max_rows개를 넘는 구간은 prune_interval마다 삭제 (0이면 제한 없음)
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, max_age: float = 3 * 24 * 3600,
+                 max_rows: int = 200_000, prune_interval: float = 60.0):
+        super().__init__(path, batch_size)
+        self.max_age = max_age
+        self.max_rows = max_rows
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+
+    def open(self):
+        self._conn = sqlite3.connect(self.path, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS spans (
+                trace_id TEXT,
+                span_id TEXT PRIMARY KEY,
+                parent_id TEXT,
+                name TEXT,
+                start REAL,
+                duration_ms REAL,
+                status TEXT,
+                error TEXT,
+                attributes TEXT,
+                events TEXT,
+                pid INTEGER
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_trace ON spans(trace_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_start ON spans(start)")
+        self._conn.commit()
+
+    def write(self, records: List[Dict[str, Any]]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (r["trace_id"], r["span_id"], r["parent_id"], r["name"], r["start"], r["duration_ms"],
+                 r["status"], r["error"], json.dumps(r["attributes"], ensure_ascii=False, default=str),
+                 json.dumps(r["events"]), r["pid"])
+                for r in records
+            ],
+        )
+        self._conn.commit()
+        if time.monotonic() - self._last_prune >= self.prune_interval:
+            self.prune()
+
+    def prune(self):
+        """보관 기간/개수를 넘는 구간을 삭제합니다."""
+        self._last_prune = time.monotonic()
+        if self.max_age:
+            self._conn.execute("DELETE FROM spans WHERE start < ?", (time.time() - self.max_age,))
+        if self.max_rows:
+            self._conn.execute(
+                "DELETE FROM spans WHERE start < "
+                "(SELECT start FROM spans ORDER BY start DESC LIMIT 1 OFFSET ?)",
+                (self.max_rows - 1,),
+            )
+        self._conn.commit()
+
+
+_exporter: Optional[SpanExporter] = None
+_exporter_ready = False
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> Optional[SpanExporter]:
+    """
+    환경 변수 설정에 따른 프로세스 공용 exporter (TRACE_EXPORTER=off이면 None)
+    - SQLite 보관 기간/개수: TRACE_RETENTION_HOURS (기본 72), TRACE_MAX_ROWS (기본 200000)
+    """
+    global _exporter, _exporter_ready
+    if _exporter_ready:
+        return _exporter
+    with _exporter_lock:
+        if not _exporter_ready:
+            kind = os.getenv("TRACE_EXPORTER", "sqlite").lower()
+            path = os.getenv("TRACE_PATH")
+            if kind == "jsonl":
+                _exporter = JSONLExporter(path or os.path.splitext(DEFAULT_TRACE_PATH)[0] + ".jsonl")
+            elif kind == "sqlite":
+                _exporter = SQLiteExporter(
+                    path or DEFAULT_TRACE_PATH,
+                    max_age=float(os.getenv("TRACE_RETENTION_HOURS", "72")) * 3600,
+                    max_rows=int(os.getenv("TRACE_MAX_ROWS", "200000")),
+                )
+            if _exporter is not None:
+                import atexit
+                atexit.register(_exporter.flush)
+            _exporter_ready = True
+    return _exporter
+
+
+def set_exporter(exporter: Optional[SpanExporter]):
+    """exporter를 직접 지정합니다. (None이면 기록하지 않음)"""
+    global _exporter, _exporter_ready
+    with _exporter_lock:
+        _exporter = exporter
+        _exporter_ready = True
+
+
+# ---- 분석 ----
+
+def read_spans(path: Optional[str] = None, since: Optional[float] = None) -> List[Dict[str, Any]]:
+    """저장된 구간을 읽습니다. since: 이 시각(epoch) 이후에 시작한 구간만"""
+    path = path or (get_exporter().path if get_exporter() else DEFAULT_TRACE_PATH)
+    since = since or 0.0
+    if not os.path.exists(path):
+        return []
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            spans = [json.loads(line) for line in f if line.strip()]
+        return [s for s in spans if s["start"] >= since]
+
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT trace_id, span_id, parent_id, name, start, duration_ms, status, error, attributes, events "
+            "FROM spans WHERE start >= ? ORDER BY start", (since,)
+        ).fetchall()
+    finally:
+        conn.close()
+    keys = ("trace_id", "span_id", "parent_id", "name", "start", "duration_ms", "status", "error")
+    spans = []
+    for row in rows:
+        record = dict(zip(keys, row[:8]))
+        record["attributes"] = json.loads(row[8] or "{}")
+        record["events"] = json.loads(row[9] or "{}")
+        spans.append(record)
+    return spans
+
+
+def _percentile(values: List[float], q: float) -> float:
+    # nearest-rank 방식
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def summarize(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """구간 이름별(이벤트는 '이름@이벤트') 횟수, 오류 수, p50/p95/최대 시간(ms)"""
+    groups: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for s in spans:
+        groups.setdefault(s["name"], []).append(s["duration_ms"] or 0.0)
+        if s["status"] == "error":
+            errors[s["name"]] = errors.get(s["name"], 0) + 1
+        for event, offset in (s.get("events") or {}).items():
+            groups.setdefault(f"{s['name']}@{event}", []).append(offset)
+    return {
+        name: {
+            "count": len(values),
+            "errors": errors.get(name, 0),
+            "p50_ms": round(_percentile(values, 0.5), 1),
+            "p95_ms": round(_percentile(values, 0.95), 1),
+            "max_ms": round(max(values), 1),
+            "total_ms": round(sum(values), 1),
+        }
+        for name, values in sorted(groups.items())
+    }
+
+
+def format_trace(spans: List[Dict[str, Any]], trace_id: str) -> str:
+    """trace 1개의 구간 트리 (시작 시각 순, 들여쓰기로 부모-자식 표시)"""
+    members = [s for s in spans if s["trace_id"] == trace_id]
+    ids = {s["span_id"] for s in members}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for s in members:
+        parent = s["parent_id"] if s["parent_id"] in ids else None
+        children.setdefault(parent, []).append(s)
+    if not members:
+        return ""
+    origin = min(s["start"] for s in members)
+    lines = []
+
+    def walk(parent: Optional[str], depth: int):
+        for s in sorted(children.get(parent, []), key=lambda x: x["start"]):
+            offset = (s["start"] - origin) * 1000
+            events = " ".join(f"{k}={v:.0f}ms" for k, v in (s.get("events") or {}).items())
+            attrs = " ".join(f"{k}={v}" for k, v in (s.get("attributes") or {}).items())
+            status = "" if s["status"] == "ok" else f" [{s['status']}]"
+            lines.append(f"{'  ' * depth}{s['name']}{status}  +{offset:.0f}ms  {s['duration_ms'] or 0:.0f}ms  {events}  {attrs}".rstrip())
+            walk(s["span_id"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def report(path: Optional[str] = None, since: Optional[float] = None, slowest: int = 3) -> str:
+    """구간별 지연 통계와 가장 느린 trace의 구간 트리를 텍스트로 반환합니다."""
+    spans = read_spans(path, since)
+    if not spans:
+        return "기록된 구간이 없습니다."
+    lines = [f"{'구간':<40} {'횟수':>6} {'오류':>5} {'p50':>10} {'p95':>10} {'최대':>10}"]
+    for name, stat in summarize(spans).items():
+        lines.append(
+            f"{name:<40} {stat['count']:>6} {stat['errors']:>5} "
+            f"{stat['p50_ms']:>8.1f}ms {stat['p95_ms']:>8.1f}ms {stat['max_ms']:>8.1f}ms"
+        )
+    roots = sorted((s for s in spans if s["parent_id"] is None), key=lambda s: s["duration_ms"] or 0, reverse=True)
+    for root in roots[:slowest]:
+        lines.append("")
+        lines.append(f"# trace {root['trace_id']} ({root['duration_ms'] or 0:.0f}ms)")
+        lines.append(format_trace(spans, root["trace_id"]))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="로컬 trace 요약 리포트")
+    parser.add_argument("path", nargs="?", default=None, help="trace 파일 (.sqlite3 또는 .jsonl)")
+    parser.add_argument("--since", type=float, default=24 * 3600, help="최근 N초 동안의 구간만 (기본 24시간)")
+    parser.add_argument("--slowest", type=int, default=3, help="구간 트리를 출력할 느린 trace 수")
+    args = parser.parse_args()
+    print(report(args.path, time.time() - args.since if args.since else None, args.slowest))
@@ -1,39 +1,31 @@
-from openai import AsyncOpenAI, OpenAI
 from typing import List
 import asyncio
+import contextlib
 import json
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-OPENAI_API_KEY=os.getenv("OPENAI_API_KEY")
-
-client = AsyncOpenAI(
-    api_key=OPENAI_API_KEY,
-)
-sync_client = OpenAI(
-    api_key=OPENAI_API_KEY,
-)
+from utils.providers import get_provider_router
+from utils.parallel import as_completed_indexed, map_as_completed, map_ordered
+from utils.router import get_model_router
 
 def llm_call(promt: list[str], model: str = "gpt-4o-mini", temperature: float = 0.7) -> str:
     # messages = [promt]
     # messages.append({"role": "user", "content": promt})
-    chat_completion = sync_client.chat.completions.create(
-        model=model,
-        temperature=temperature,
-        messages=promt,
-    )
+    chat_completion = get_provider_router().complete_sync(model, promt, temperature)
     return chat_completion.choices[0].message.content
 
-async def llm_call_async(promt: list[str], model: str = "gpt-4o-mini", temperature: float = 0.7) -> str:
-    chat_completion = await client.chat.completions.create(
-        model=model,
-        temperature=temperature,
-        messages=promt,
-    )
+async def llm_call_async(promt: list[str], model: str = "gpt-4o-mini", temperature: float = 0.7, priority: int = 1) -> str:
+    chat_completion = await get_provider_router().complete(model, promt, temperature, priority=priority)
     return chat_completion.choices[0].message.content
 
+async def llm_call_stream_async(promt: list[str], model: str = "gpt-4o-mini", temperature: float = 0.7, priority: int = 1):
+    """비동기 스트리밍 호출: 생성되는 텍스트 조각을 순서대로 반환 (중간에 닫으면 HTTP 스트림도 닫힘)"""
+    stream = get_provider_router().stream(model, promt, temperature, priority=priority)
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await stream.aclose()
+
 # 1. Prompt chaining
 def prompt_chain_workflow(initial_input: list[str]) -> List[str]:
     response_chain = []
@@ -77,8 +69,9 @@ def run_router_workflow(initial_input : list[str]):
     모델명만 단답형으로 응답하세요
     """
 
+    # 이전 결정 캐시/로컬 분류기로 먼저 판단하고, 확신이 없을 때만 LLM 라우터 호출
     input_promt = [{"role": "user", "content": router_prompt}]
-    selected_model = llm_call(input_promt)
+    selected_model, _ = get_model_router().route(user_prompt, lambda: llm_call(input_promt, temperature=0))
     response_chain.append("Selected model: " + selected_model)
 
     response = llm_call([initial_input[-1]], model = selected_model)
@@ -99,11 +92,11 @@ async def run_Parallelization(initial_input : list[str]):
         promt=[{"role": "user", "content": prompt['user_prompt']}], 
         model=prompt['model']) for prompt in parallel_prompt_details]
     
-    responses = []
+    # 완료 순서대로 받되, 원래 인덱스 위치에 저장하여 응답 번호와 모델이 어긋나지 않게 함
+    responses = [None] * len(tasks)
     
-    for task in asyncio.as_completed(tasks):
-        result = await task
-        responses.append(result)
+    async for i, result in as_completed_indexed(tasks):
+        responses[i] = result
     
     aggregator_prompt = ("다음은 여러 개의 AI 모델이 사용자 질문에 대해 생성한 응답입니다.\n"
                          "당신의 역할은 이 응답들을 모두 종합하여 최종 답변을 제공하는 것입니다.\n"
@@ -117,21 +110,19 @@ async def run_Parallelization(initial_input : list[str]):
         aggregator_prompt += f"\n{responses[i]}"
     
     sum_promt = [{"role": "user", "content": aggregator_prompt}]
-    final_response = await llm_call_async(sum_promt, model="gpt-4o")
+    final_response = await llm_call_async(sum_promt, model="gpt-4o", priority=0)
     responses.append(f"최종 답변: {final_response}")
 
     return responses
 
 # 4. Orchestrator
 async def run_llm_parallel(prompt_list : list[str]):
-    tasks = [llm_call_async(promt=[{"role": "user", "content": prompt}]) for prompt in prompt_list]
-    responses = []
+    """프롬프트들을 동시에 호출하고 응답을 입력 순서대로 반환"""
+    return await map_ordered(lambda prompt: llm_call_async(promt=[{"role": "user", "content": prompt}]), prompt_list)
 
-    for task in asyncio.as_completed(tasks):
-        result = await task
-        responses.append(result)
-    
-    return responses
+def run_llm_parallel_as_completed(prompt_list : list[str]):
+    """프롬프트들을 동시에 호출하고 완료되는 순서대로 (입력 인덱스, 응답)을 반환하는 비동기 이터레이터"""
+    return map_as_completed(lambda prompt: llm_call_async(promt=[{"role": "user", "content": prompt}]), prompt_list)
 
 def get_orchestrator_prompt(user_query):
     return f"""
@@ -169,22 +160,7 @@ def get_worker_prompt(user_query, sub_question, description):
     하위 질문을 철저히 다루는 포괄적이고 상세한 응답을 해주세요
     """
 
-async def orchestrate_task(initial_input : list[str]):
-    user_query = initial_input[-1]["content"]    
-    # 1단계 : 사용자 질문 기반으로 여러 질문 도출
-    orchestrator_prompt = get_orchestrator_prompt(user_query)
-    input_promt = [{"role": "user", "content": orchestrator_prompt}]
-    orchestrator_response = llm_call(input_promt, model="gpt-4o")
-     
-    response_json = json.loads(orchestrator_response.replace('```json', '').replace('```', ''))   
-    analysis = response_json.get("analysis", "")
-    sub_tasks = response_json.get("subtasks", [])
-
-    # 2단계 : 각 하위질문에 대한 LLM 호출
-    worker_prompts = [get_worker_prompt(user_query, task["sub_question"], task["description"]) for task in sub_tasks]     
-    worker_responses = await run_llm_parallel(worker_prompts)
-        
-    # 3단계 : 하위질문 응답 종합 및 LLM 호출
+def get_aggregator_prompt(user_query, sections):
     aggregator_prompt = f"""아래는 사용자의 원래 질문에 대해서 하위 질문을 나누고 응답한 결과입니다.
     아래 질문 및 응답내용을 포함한 최종 응답을 제공해주세요.
     ## 요청사항
@@ -194,53 +170,161 @@ async def orchestrate_task(initial_input : list[str]):
 
     하위 질문 및 응답:
     """
-    
-    for i in range(len(sub_tasks)):
-        aggregator_prompt += f"\n{i+1}. 하위 질문: {sub_tasks[i]['sub_question']}\n"
-        aggregator_prompt += f"\n   응답: {worker_responses[i]}\n"
-        
-    final_response = llm_call(promt=[{"role": "user", "content": aggregator_prompt}], model="gpt-4o")
-    
-    return final_response
+    return aggregator_prompt + "".join(sections)
+
+# 단계별 제한 시간(초): planner/worker는 전체 응답, aggregator는 첫 토큰과 전체 스트림
+ORCHESTRATOR_TIMEOUTS = {
+    "planner": 60.0,
+    "worker": 90.0,
+    "first_token": 30.0,
+    "aggregator": 180.0,
+}
+
+async def _stream_with_timeout(agen, first_token_timeout: float, total_timeout: float):
+    """첫 토큰과 전체 스트림에 제한 시간을 적용. 초과/취소 시 원본 스트림을 닫음"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + total_timeout
+    first = True
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            timeout = min(remaining, first_token_timeout) if first else remaining
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                token = await asyncio.wait_for(agen.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+            first = False
+            yield token
+    finally:
+        await agen.aclose()
+
+async def _plan_subtasks(user_query, timeout):
+    """1단계 (planner): 사용자 질문을 하위 질문으로 분해"""
+    input_promt = [{"role": "user", "content": get_orchestrator_prompt(user_query)}]
+    orchestrator_response = await asyncio.wait_for(
+        llm_call_async(input_promt, model="gpt-4o", priority=0), timeout)
+    response_json = json.loads(orchestrator_response.replace('```json', '').replace('```', ''))
+    return response_json.get("analysis", ""), response_json.get("subtasks", [])
+
+async def _run_worker(user_query, task, timeout):
+    """2단계 (worker): 하위 질문 하나에 응답. 제한 시간을 넘으면 해당 하위 질문만 생략"""
+    worker_prompt = get_worker_prompt(user_query, task["sub_question"], task["description"])
+    try:
+        return await asyncio.wait_for(
+            llm_call_async(promt=[{"role": "user", "content": worker_prompt}]), timeout)
+    except asyncio.TimeoutError:
+        return "(응답 시간 초과로 이 하위 질문에 대한 응답을 받지 못했습니다)"
+
+async def orchestrate_task_stream(initial_input : list[str], timeouts: dict = None):
+    """
+    planner → 병렬 worker → 스트리밍 aggregator 순으로 실행하고 최종 응답을 토큰 단위로 반환
+    - 모든 단계가 비동기로 실행되어 이벤트 루프를 막지 않음
+    - 단계별 제한 시간 적용 (ORCHESTRATOR_TIMEOUTS), 호출자가 취소하면 진행 중인 요청도 모두 취소
+    """
+    timeouts = {**ORCHESTRATOR_TIMEOUTS, **(timeouts or {})}
+    user_query = initial_input[-1]["content"]
+
+    # 1단계 : 사용자 질문 기반으로 여러 질문 도출
+    analysis, sub_tasks = await _plan_subtasks(user_query, timeouts["planner"])
+
+    # 2단계 : 각 하위질문에 대한 LLM 호출 (완료되는 대로 원래 하위 질문 위치에 응답 섹션 작성)
+    sections = [None] * len(sub_tasks)
+    async for i, worker_response in map_as_completed(
+            lambda task: _run_worker(user_query, task, timeouts["worker"]), sub_tasks):
+        sections[i] = (f"\n{i+1}. 하위 질문: {sub_tasks[i]['sub_question']}\n"
+                       f"\n   응답: {worker_response}\n")
+
+    # 3단계 : 하위질문 응답 종합 (스트리밍)
+    aggregator_prompt = get_aggregator_prompt(user_query, sections)
+    tokens = llm_call_stream_async([{"role": "user", "content": aggregator_prompt}], model="gpt-4o", priority=0)
+    async for token in _stream_with_timeout(tokens, timeouts["first_token"], timeouts["aggregator"]):
+        yield token
+
+async def orchestrate_task(initial_input : list[str], timeouts: dict = None):
+    """orchestrate_task_stream의 전체 응답을 모아서 반환"""
+    return "".join([token async for token in orchestrate_task_stream(initial_input, timeouts)])
 
 # 5. Evaluator optimizer
-def loop_workflow(initial_input, evaluator_prompt, max_retries=5) -> str:
-    """평가자가 생성된 요약을 통과할 때까지 최대 max_retries번 반복."""
-    user_query = initial_input[-1]["content"]    
-
-    retries = 0
-    while retries < max_retries:
-        print(f"\n========== 📝 요약 프롬프트 (시도 {retries + 1}/{max_retries}) ==========\n")
-        print(user_query)
-        
-        summary = llm_call(user_query, model="gpt-4o-mini")
-        print(f"\n========== 📝 요약 결과 (시도 {retries + 1}/{max_retries}) ==========\n")
-        print(summary)
-        
-        final_evaluator_prompt = evaluator_prompt + summary
-        evaluation_result = llm_call(final_evaluator_prompt, model="gpt-4o").strip()
-
-        print(f"\n========== 🔍 평가 프롬프트 (시도 {retries + 1}/{max_retries}) ==========\n")
-        print(final_evaluator_prompt)
-
-        print(f"\n========== 🔍 평가 결과 (시도 {retries + 1}/{max_retries}) ==========\n")
-        print(evaluation_result)
-
-        if "평가결과 = PASS" in evaluation_result:
-            print("\n✅ 통과! 최종 요약이 승인되었습니다.\n")
-            return summary
-        
-        retries += 1
-        print(f"\n🔄 재시도 필요... ({retries}/{max_retries})\n")
-
-        # If max retries reached, return last attempt
-        if retries >= max_retries:
-            print("❌ 최대 재시도 횟수 도달. 마지막 요약을 반환합니다.")
-            return summary  # Returning the last attempted summary, even if it's not perfect.
-
-        # Updating the user_query for the next attempt with full history
-        user_query += f"{retries}차 요약 결과:\n\n{summary}\n"
-        user_query += f"{retries}차 요약 피드백:\n\n{evaluation_result}\n\n"
+PASS_MARKER = "평가결과 = PASS"
+
+def _feedback_digest(previous: str, evaluations: list[str], max_chars: int = 800) -> str:
+    """평가 결과에서 판정 줄을 제외한 피드백만 중복 없이 모아 최근 것 위주로 max_chars 이내로 압축"""
+    lines = []
+    for text in [previous, *evaluations]:
+        for line in text.splitlines():
+            line = line.strip(" -•*\t")
+            if line and not line.startswith("평가결과") and line not in lines:
+                lines.append(line)
+    digest = []
+    length = 0
+    for line in reversed(lines):
+        length += len(line) + 3
+        if length > max_chars:
+            break
+        digest.append(f"- {line}")
+    return "\n".join(reversed(digest))
+
+async def _generate_and_evaluate(prompt: str, evaluator_prompt: str):
+    summary = await llm_call_async([{"role": "user", "content": prompt}], model="gpt-4o-mini")
+    evaluation = await llm_call_async(
+        [{"role": "user", "content": evaluator_prompt + summary}], model="gpt-4o", temperature=0)
+    return summary, evaluation.strip()
+
+async def _try_generate_and_evaluate(prompt: str, evaluator_prompt: str):
+    """후보 1개의 생성/평가 (실패하면 예외를 결과로 반환하여 같은 라운드의 다른 후보는 계속 진행)"""
+    try:
+        return await _generate_and_evaluate(prompt, evaluator_prompt)
+    except Exception as e:
+        return e
+
+async def loop_workflow_async(initial_input, evaluator_prompt, max_rounds=3, candidates=1, digest_chars=800) -> str:
+    """
+    라운드마다 후보 요약 candidates개를 동시에 생성/평가하고, 처음 PASS한 후보를 바로 반환.
+    남은 후보 요청은 취소하며, 다음 라운드에는 전체 이력 대신 압축된 피드백 요약만 전달.
+    candidates를 늘리면 라운드 수는 줄지만 호출 수는 최대 max_rounds * candidates * 2로 늘어남.
+    """
+    user_query = initial_input[-1]["content"]
+    digest = ""
+    summary = ""
+    last_error = None
+
+    for round_index in range(1, max_rounds + 1):
+        prompt = user_query
+        if digest:
+            prompt += f"\n\n이전 요약에 대한 피드백 (반영하여 작성하세요):\n{digest}"
+
+        evaluations = []
+        async with contextlib.aclosing(
+                map_as_completed(lambda _: _try_generate_and_evaluate(prompt, evaluator_prompt), range(candidates))) as results:
+            async for i, result in results:
+                if isinstance(result, Exception):
+                    print(f"\n⚠️ 후보 {i + 1} 생성/평가 실패 (라운드 {round_index}/{max_rounds}): {result}\n")
+                    last_error = result
+                    continue
+                candidate, evaluation = result
+                print(f"\n========== 🔍 평가 결과 (라운드 {round_index}/{max_rounds}, 후보 {i + 1}) ==========\n")
+                print(evaluation)
+                if PASS_MARKER in evaluation:
+                    print("\n✅ 통과! 최종 요약이 승인되었습니다.\n")
+                    return candidate
+                if not evaluations:
+                    # PASS가 없으면 마지막 라운드에서 가장 먼저 평가된 후보를 반환
+                    summary = candidate
+                evaluations.append(evaluation)
+
+        digest = _feedback_digest(digest, evaluations, digest_chars)
+        print(f"\n🔄 재시도 필요... ({round_index}/{max_rounds})\n")
+
+    if not summary and last_error is not None:
+        raise last_error
+    print("❌ 최대 재시도 횟수 도달. 마지막 요약을 반환합니다.")
+    return summary
+
+def loop_workflow(initial_input, evaluator_prompt, max_retries=5, candidates=1) -> str:
+    """평가자가 생성된 요약을 통과할 때까지 최대 max_retries 라운드 반복 (loop_workflow_async의 동기 버전)."""
+    return asyncio.run(loop_workflow_async(initial_input, evaluator_prompt, max_rounds=max_retries, candidates=candidates))
 
 
 if __name__ == "__main__":